@@ -0,0 +1,296 @@
+"""Priority lanes and per-user fair sharing of the Gemini capacity of a worker."""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+
+# Highest priority first
+LANES = (INTERACTIVE, BATCH, BACKGROUND)
+
+
+@dataclass
+class _Waiter:
+    user: str
+    future: "asyncio.Future[None]"
+    enqueued_at: float
+
+
+@dataclass
+class _Lane:
+    name: str
+    weight: float
+    max_concurrency: int
+    running: int = 0
+    granted: int = 0
+    # Weighted fair queuing: the lane (and, inside it, the user) with the lowest virtual time goes next
+    virtual_time: float = 0.0
+    queues: Dict[str, Deque[_Waiter]] = field(default_factory=dict)
+    user_virtual_times: Dict[str, float] = field(default_factory=dict)
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=settings.AI_METRICS_WINDOW))
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def has_room(self) -> bool:
+        return self.running < self.max_concurrency
+
+
+class Admission:
+    """An admitted AI request; released once, when the request (or its async job) is done."""
+
+    def __init__(self, scheduler: "AIScheduler"):
+        self._scheduler = scheduler
+        self._released = False
+        # Set when an ?async=true job takes the admission over from its request
+        self.handed_off = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler.admitted -= 1
+
+
+class AIScheduler:
+    """
+    Hands out the AI call slots of a worker.
+
+    Every request waits in a lane (interactive, batch, background). A free
+    slot goes to the lane with waiters, room under its concurrency cap and
+    the lowest virtual time; each grant advances a lane by 1 / weight, so
+    under contention lanes share the slots in proportion to their weights
+    and a lane that was idle does not get to catch up. Inside a lane, users
+    (fund + client) are served the same way with equal weights: one user
+    queueing 30 bills takes turns with everyone else instead of going first.
+
+    Slots are held for the whole request, including streamed answers.
+
+    In front of the lanes, admission control bounds the AI requests a worker
+    holds at all (running, queued, or running as async jobs) to
+    max_admitted: beyond that, requests are refused before their body is
+    read instead of piling up until they time out.
+    """
+
+    def __init__(self, max_concurrency: int, lanes: Dict[str, Dict[str, float]], max_admitted: int = 32):
+        """
+        Initialize scheduler.
+
+        Args:
+            max_concurrency: Slots shared by every lane
+            lanes: Lane name -> {"weight": ..., "max_concurrency": ...}
+            max_admitted: AI requests held at once, including queued ones
+        """
+        self.max_concurrency = max_concurrency
+        self.max_admitted = max_admitted
+        self.admitted = 0
+        self.rejected = 0
+        self.lanes = {
+            name: _Lane(name=name, weight=config["weight"], max_concurrency=int(config["max_concurrency"]))
+            for name, config in lanes.items()
+        }
+        self.running = 0
+
+    def try_admit(self) -> Optional[Admission]:
+        """
+        Admit a new AI request if the worker has room for it.
+
+        Returns:
+            Admission to release when the request is done, or None when the worker is full
+        """
+        if self.admitted >= self.max_admitted:
+            self.rejected += 1
+            return None
+        self.admitted += 1
+        return Admission(self)
+
+    @asynccontextmanager
+    async def slot(self, lane: str, user: str) -> AsyncIterator[None]:
+        """
+        Wait for a slot in a lane and hold it for the block.
+
+        Args:
+            lane: INTERACTIVE, BATCH or BACKGROUND
+            user: Fair-share key of the requester
+
+        Yields:
+            Once the slot is granted
+        """
+        await self._acquire(self.lanes[lane], user)
+        try:
+            yield
+        finally:
+            self._release(self.lanes[lane])
+
+    async def _acquire(self, lane: _Lane, user: str) -> None:
+        waiter = _Waiter(user=user, future=asyncio.get_running_loop().create_future(), enqueued_at=time.perf_counter())
+        if not lane.queues:
+            # Back from idle: start level with the lanes that kept working
+            lane.virtual_time = max(lane.virtual_time, self._min_virtual_time())
+        if user not in lane.queues:
+            lane.user_virtual_times[user] = max(lane.user_virtual_times.get(user, 0.0), self._min_user_virtual_time(lane))
+            lane.queues[user] = deque()
+        lane.queues[user].append(waiter)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the request went away: hand the slot on
+                self._release(lane)
+            else:
+                self._remove(lane, waiter)
+            raise
+
+    def _release(self, lane: _Lane) -> None:
+        lane.running -= 1
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrency:
+            ready = [lane for lane in self.lanes.values() if lane.queues and lane.has_room]
+            if not ready:
+                return
+            # Ties go to the higher-priority lane
+            lane = min(ready, key=lambda lane: (lane.virtual_time, LANES.index(lane.name) if lane.name in LANES else len(LANES)))
+            user = min(lane.queues, key=lambda user: lane.user_virtual_times[user])
+            waiter = lane.queues[user].popleft()
+            if not lane.queues[user]:
+                del lane.queues[user]
+            if waiter.future.done():
+                continue
+
+            lane.virtual_time += 1 / lane.weight
+            lane.user_virtual_times[user] += 1
+            lane.running += 1
+            lane.granted += 1
+            self.running += 1
+            lane.waits.append(time.perf_counter() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+        self._forget_idle_users()
+
+    def _remove(self, lane: _Lane, waiter: _Waiter) -> None:
+        queue = lane.queues.get(waiter.user)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del lane.queues[waiter.user]
+
+    def _min_virtual_time(self) -> float:
+        busy = [lane.virtual_time for lane in self.lanes.values() if lane.queues]
+        return min(busy) if busy else 0.0
+
+    def _min_user_virtual_time(self, lane: _Lane) -> float:
+        waiting = [lane.user_virtual_times[user] for user in lane.queues]
+        return min(waiting) if waiting else max(lane.user_virtual_times.values(), default=0.0)
+
+    def _forget_idle_users(self) -> None:
+        # Keep the per-user state bounded: users with nothing queued restart level with the others anyway
+        for lane in self.lanes.values():
+            if len(lane.user_virtual_times) > len(lane.queues) + 1000:
+                lane.user_virtual_times = {user: lane.user_virtual_times[user] for user in lane.queues}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth, running requests and wait times per lane.
+
+        Returns:
+            Dict with the worker totals and one entry per lane
+        """
+        lanes: List[Dict[str, Any]] = []
+        for lane in self.lanes.values():
+            waits = sorted(lane.waits)
+            lanes.append({
+                "lane": lane.name,
+                "weight": lane.weight,
+                "max_concurrency": lane.max_concurrency,
+                "running": lane.running,
+                "queue_depth": lane.depth,
+                "waiting_users": len(lane.queues),
+                "granted": lane.granted,
+                "wait_p50_ms": _percentile_ms(waits, 0.5),
+                "wait_p95_ms": _percentile_ms(waits, 0.95),
+                "wait_max_ms": _percentile_ms(waits, 1.0),
+            })
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "max_admitted": self.max_admitted,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "lanes": lanes,
+        }
+
+
+def _percentile_ms(values: List[float], fraction: float) -> Optional[int]:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000)
+
+
+# Global instance shared by every AI endpoint of the worker (one event loop)
+ai_scheduler = AIScheduler(
+    settings.AI_MAX_CONCURRENCY,
+    {
+        INTERACTIVE: {"weight": settings.AI_LANE_INTERACTIVE_WEIGHT, "max_concurrency": settings.AI_LANE_INTERACTIVE_CONCURRENCY},
+        BATCH: {"weight": settings.AI_LANE_BATCH_WEIGHT, "max_concurrency": settings.AI_LANE_BATCH_CONCURRENCY},
+        BACKGROUND: {"weight": settings.AI_LANE_BACKGROUND_WEIGHT, "max_concurrency": settings.AI_LANE_BACKGROUND_CONCURRENCY},
+    },
+    max_admitted=settings.AI_MAX_ADMITTED_REQUESTS,
+)
+
+
+async def admit_ai_requests(request: Request, call_next):
+    """
+    Middleware: refuse AI requests with 503 + Retry-After while the worker is full.
+
+    Runs before the body is read, so refused uploads cost nothing. The
+    admission is stored in request.state.ai_admission and released when the
+    response has been sent (streamed answers included), unless an async job
+    took it over.
+    """
+    if request.method != "POST" or not request.url.path.startswith(settings.AI_PATH_PREFIXES):
+        return await call_next(request)
+
+    admission = ai_scheduler.try_admit()
+    if admission is None:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "AI service is busy, please retry shortly"},
+            headers={"Retry-After": str(settings.AI_RETRY_AFTER_SECONDS)},
+        )
+
+    request.state.ai_admission = admission
+    try:
+        response = await call_next(request)
+    except BaseException:
+        admission.release()
+        raise
+
+    body = response.body_iterator
+
+    async def release_when_sent():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            if not admission.handed_off:
+                admission.release()
+
+    response.body_iterator = release_when_sent()
+    return response
@@ -0,0 +1,67 @@
+"""Conditional GET (ETag / If-None-Match) support for read endpoints."""
+import hashlib
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+
+from app.core.config import settings
+from app.core.table_versions import table_versions
+from app.core.tenancy import get_current_fund_id
+
+# Versions restart at 0 with the process, so tags from a previous run must never match
+BOOT_ID = uuid.uuid4().hex
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def conditional_get(*tables: str, per_month: bool = False) -> Callable[[Request, Response], None]:
+    """
+    Build a dependency that makes a GET endpoint answer conditional requests.
+
+    The strong ETag is derived from the request path and query, the current
+    fund and the change versions of the tables the endpoint reads. When the client's If-None-Match
+    matches, a 304 is returned before the endpoint touches the database.
+
+    Tags also roll over every ETAG_REVALIDATE_SECONDS so that writes made outside
+    the API (e.g. SQL edits of fee schedules) become visible eventually.
+
+    Args:
+        tables: Tables whose content the response depends on
+        per_month: Set when the response also depends on the current month
+
+    Returns:
+        FastAPI dependency
+    """
+    def dependency(request: Request, response: Response) -> None:
+        parts = [
+            BOOT_ID,
+            request.url.path,
+            "&".join(sorted(request.url.query.split("&"))),
+            str(get_current_fund_id()),
+            repr(table_versions.snapshot(tables)),
+        ]
+        if settings.ETAG_REVALIDATE_SECONDS > 0:
+            parts.append(str(int(time.time()) // settings.ETAG_REVALIDATE_SECONDS))
+        if per_month:
+            parts.append(datetime.now().strftime("%Y-%m"))
+
+        etag = '"' + hashlib.sha1("|".join(parts).encode()).hexdigest() + '"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "private, no-cache",
+        }
+
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+
+    return dependency
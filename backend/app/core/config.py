@@ -20,6 +20,118 @@ class Settings:
     # Google AI settings
     GOOGLE_API_KEY: Optional[str] = os.environ.get("GOOGLE_API_KEY")
     
+    # Gemini model tiers, cheapest first, as model:latency_slo_seconds. A request starts on the first
+    # tier and moves to the next one when the call fails or exceeds its SLO, or when the answer fails
+    # validation or its confidence (mean token probability, 0-1) is below AI_MIN_CONFIDENCE
+    AI_CHAT_MODEL_TIERS: str = os.environ.get("AI_CHAT_MODEL_TIERS", "gemini-2.5-flash-lite:6,gemini-2.5-flash:15")
+    AI_IMAGE_MODEL_TIERS: str = os.environ.get("AI_IMAGE_MODEL_TIERS", "gemini-2.5-flash:15,gemini-3-flash-preview:40")
+    AI_MIN_CONFIDENCE: float = float(os.environ.get("AI_MIN_CONFIDENCE", "0.5"))
+    # Latest calls per tier the latency percentiles are computed from
+    AI_METRICS_WINDOW: int = int(os.environ.get("AI_METRICS_WINDOW", "500"))
+    
+    # AI call slots per worker, shared by priority lanes (interactive chat, batch receipts, background jobs);
+    # each lane has a concurrency cap and gets free slots in proportion to its weight
+    AI_MAX_CONCURRENCY: int = int(os.environ.get("AI_MAX_CONCURRENCY", "8"))
+    AI_LANE_INTERACTIVE_CONCURRENCY: int = int(os.environ.get("AI_LANE_INTERACTIVE_CONCURRENCY", "8"))
+    AI_LANE_INTERACTIVE_WEIGHT: float = float(os.environ.get("AI_LANE_INTERACTIVE_WEIGHT", "6"))
+    AI_LANE_BATCH_CONCURRENCY: int = int(os.environ.get("AI_LANE_BATCH_CONCURRENCY", "4"))
+    AI_LANE_BATCH_WEIGHT: float = float(os.environ.get("AI_LANE_BATCH_WEIGHT", "2"))
+    AI_LANE_BACKGROUND_CONCURRENCY: int = int(os.environ.get("AI_LANE_BACKGROUND_CONCURRENCY", "2"))
+    AI_LANE_BACKGROUND_WEIGHT: float = float(os.environ.get("AI_LANE_BACKGROUND_WEIGHT", "1"))
+    # AI requests a worker accepts at once (running, queued or running as ?async=true jobs); more get 503 + Retry-After
+    AI_MAX_ADMITTED_REQUESTS: int = int(os.environ.get("AI_MAX_ADMITTED_REQUESTS", "32"))
+    AI_RETRY_AFTER_SECONDS: int = int(os.environ.get("AI_RETRY_AFTER_SECONDS", "5"))
+    AI_PATH_PREFIXES: tuple = ("/api/chat", "/api/ai/")
+    
+    # Image preprocessing settings (applied before sending bills to Gemini)
+    IMAGE_PREPROCESS_ENABLED: bool = os.environ.get("IMAGE_PREPROCESS_ENABLED", "True").lower() == "true"
+    IMAGE_MAX_EDGE: int = int(os.environ.get("IMAGE_MAX_EDGE", "1600"))
+    IMAGE_OUTPUT_FORMAT: str = os.environ.get("IMAGE_OUTPUT_FORMAT", "JPEG").upper()
+    IMAGE_QUALITY: int = int(os.environ.get("IMAGE_QUALITY", "80"))
+    # auto: convert to grayscale only when the photo is already near-monochrome
+    IMAGE_GRAYSCALE: str = os.environ.get("IMAGE_GRAYSCALE", "auto").lower()
+    IMAGE_GRAYSCALE_MAX_SATURATION: int = int(os.environ.get("IMAGE_GRAYSCALE_MAX_SATURATION", "24"))
+    IMAGE_PREPROCESS_WORKERS: int = int(os.environ.get("IMAGE_PREPROCESS_WORKERS", "2"))
+    
+    # Funds (tenants): requests without X-Fund-Id use the default fund
+    DEFAULT_FUND_ID: int = int(os.environ.get("DEFAULT_FUND_ID", "1"))
+    # Funds whose in-memory caches are kept at once; each cache below is sized per fund
+    FUND_CACHE_MAX_FUNDS: int = int(os.environ.get("FUND_CACHE_MAX_FUNDS", "1000"))
+    FUND_DIRECTORY_TTL_SECONDS: int = int(os.environ.get("FUND_DIRECTORY_TTL_SECONDS", "300"))
+    
+    # Cache invalidation between worker processes: local (single process), unix (workers on one machine) or redis
+    INVALIDATION_BACKEND: str = os.environ.get("INVALIDATION_BACKEND", "local").lower()
+    INVALIDATION_SOCKET_DIR: str = os.environ.get("INVALIDATION_SOCKET_DIR", "/tmp/fund-invalidation")
+    INVALIDATION_REDIS_URL: str = os.environ.get("INVALIDATION_REDIS_URL", "redis://localhost:6379/0")
+    INVALIDATION_CHANNEL: str = os.environ.get("INVALIDATION_CHANNEL", "fund-invalidation")
+    # Worker processes, as read by uvicorn and gunicorn; more than one needs the unix or redis backend
+    WEB_CONCURRENCY: int = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    
+    # Read-through query cache of rarely changing tables (TTL per table, entries per table and fund)
+    QUERY_CACHE_ENABLED: bool = os.environ.get("QUERY_CACHE_ENABLED", "True").lower() == "true"
+    QUERY_CACHE_MAX_ENTRIES: int = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "64"))
+    QUERY_CACHE_USERS_TTL_SECONDS: int = int(os.environ.get("QUERY_CACHE_USERS_TTL_SECONDS", "300"))
+    QUERY_CACHE_FEE_SCHEDULES_TTL_SECONDS: int = int(os.environ.get("QUERY_CACHE_FEE_SCHEDULES_TTL_SECONDS", "600"))
+    
+    # Bulk writes and multi-gets: rows per insert/upsert/update request, ids per in_ filter (URL length)
+    BULK_CHUNK_SIZE: int = int(os.environ.get("BULK_CHUNK_SIZE", "500"))
+    BULK_ID_CHUNK_SIZE: int = int(os.environ.get("BULK_ID_CHUNK_SIZE", "200"))
+    
+    # Payments (image, webhook, statement import) are committed by the commit_ledger_payments function (sql/ledger_unit_of_work.sql).
+    # Opt-in for databases where it cannot be installed: sequential writes undone on failure, NOT all or nothing
+    LEDGER_COMMIT_SEQUENTIAL: bool = os.environ.get("LEDGER_COMMIT_SEQUENTIAL", "False").lower() == "true"
+    
+    # User directory cache (users attached to transactions/debts in memory)
+    USER_DIRECTORY_TTL_SECONDS: int = int(os.environ.get("USER_DIRECTORY_TTL_SECONDS", "300"))
+    
+    # Chat answer cache (entries per fund)
+    CHAT_CACHE_ENABLED: bool = os.environ.get("CHAT_CACHE_ENABLED", "True").lower() == "true"
+    CHAT_CACHE_TTL_SECONDS: int = int(os.environ.get("CHAT_CACHE_TTL_SECONDS", "3600"))
+    CHAT_CACHE_MAX_ENTRIES: int = int(os.environ.get("CHAT_CACHE_MAX_ENTRIES", "128"))
+    
+    # Conditional GET: ETags also change at least this often (0 = only on writes)
+    ETAG_REVALIDATE_SECONDS: int = int(os.environ.get("ETAG_REVALIDATE_SECONDS", "300"))
+    
+    # Change feed (/api/events)
+    EVENTS_BUFFER_SIZE: int = int(os.environ.get("EVENTS_BUFFER_SIZE", "64"))
+    EVENTS_MAX_SUBSCRIBERS: int = int(os.environ.get("EVENTS_MAX_SUBSCRIBERS", "1000"))
+    EVENTS_HEARTBEAT_SECONDS: int = int(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+    EVENTS_RETRY_MS: int = int(os.environ.get("EVENTS_RETRY_MS", "5000"))
+    
+    # PayOS webhook events stuck in PROCESSING longer than this are replayable
+    PAYMENT_EVENT_STUCK_SECONDS: int = int(os.environ.get("PAYMENT_EVENT_STUCK_SECONDS", "300"))
+    
+    # Bank statement import
+    IMPORT_MAX_BYTES: int = int(os.environ.get("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+    IMPORT_BATCH_SIZE: int = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+    # A member payment already booked (webhook, image) within this many days of a statement line is the same payment
+    IMPORT_DEDUPE_WINDOW_DAYS: int = int(os.environ.get("IMPORT_DEDUPE_WINDOW_DAYS", "3"))
+    # Minimum similarity (0-1) for a sender name to be matched to a member
+    NAME_MATCH_MIN_SCORE: float = float(os.environ.get("NAME_MATCH_MIN_SCORE", "0.85"))
+    
+    # Reconciliation of PENDING payments against statement lines
+    RECONCILE_DATE_WINDOW_DAYS: int = int(os.environ.get("RECONCILE_DATE_WINDOW_DAYS", "3"))
+    
+    # Monthly analytics: closed months are cached until a backdated write (0 = no expiry), months kept per fund
+    ANALYTICS_CLOSED_MONTH_TTL_SECONDS: int = int(os.environ.get("ANALYTICS_CLOSED_MONTH_TTL_SECONDS", "0"))
+    ANALYTICS_CACHE_MAX_MONTHS: int = int(os.environ.get("ANALYTICS_CACHE_MAX_MONTHS", "240"))
+    
+    # Food expense rollups are reloaded from the database at least this often
+    FOOD_ROLLUP_TTL_SECONDS: int = int(os.environ.get("FOOD_ROLLUP_TTL_SECONDS", "3600"))
+    
+    # Background jobs for progress polling: memory (one worker) or table (sql/jobs.sql, shared by every worker)
+    JOBS_BACKEND: str = os.environ.get("JOBS_BACKEND", "memory").lower()
+    # Jobs kept in memory; table jobs are deleted once untouched for JOBS_RETENTION_SECONDS
+    JOBS_MAX_RETAINED: int = int(os.environ.get("JOBS_MAX_RETAINED", "200"))
+    JOBS_RETENTION_SECONDS: int = int(os.environ.get("JOBS_RETENTION_SECONDS", str(7 * 24 * 3600)))
+    # Least time between two progress writes of a table job (final states are always written)
+    JOBS_PROGRESS_INTERVAL_SECONDS: float = float(os.environ.get("JOBS_PROGRESS_INTERVAL_SECONDS", "1"))
+    
+    # Upload limits for image endpoints
+    MAX_UPLOAD_BYTES: int = int(os.environ.get("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE: int = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+    UPLOAD_LIMITED_PATH_PREFIX: str = "/api/ai/"
+    
     # CORS settings
     CORS_ORIGINS: list[str] = os.environ.get("CORS_ORIGINS", "*").split(",")
     
@@ -42,6 +154,18 @@ class Settings:
             raise ValueError(
                 f"Missing required environment variables: {', '.join(missing)}"
             )
+        
+        if cls.WEB_CONCURRENCY > 1 and cls.INVALIDATION_BACKEND == "local":
+            raise ValueError(
+                f"WEB_CONCURRENCY={cls.WEB_CONCURRENCY} needs INVALIDATION_BACKEND=unix or redis: "
+                "with local, each worker keeps serving cached data the others changed"
+            )
+        
+        if cls.WEB_CONCURRENCY > 1 and cls.JOBS_BACKEND == "memory":
+            raise ValueError(
+                f"WEB_CONCURRENCY={cls.WEB_CONCURRENCY} needs JOBS_BACKEND=table (sql/jobs.sql): "
+                "with memory, polling a job on another worker answers 404"
+            )
 
 
 # Global settings instance
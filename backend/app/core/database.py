@@ -1,6 +1,8 @@
 """Database configuration and client."""
+from typing import Any, Dict, List, Union
 from supabase import create_client, Client
 from app.core.config import settings
+from app.core.tenancy import get_current_fund_id
 
 # Prefer service role key for backend (bypasses RLS), fallback to anon key
 key: str = settings.SUPABASE_SERVICE_ROLE_KEY or settings.SUPABASE_KEY
@@ -20,4 +22,87 @@ def get_supabase_client() -> Client:
     Returns:
         Supabase client
     """
-    return supabase
\ No newline at end of file
+    return supabase
+
+# Tables with a fund_id column; every other table (e.g. funds) is shared
+FUND_SCOPED_TABLES = frozenset({
+    "users",
+    "transactions",
+    "transaction_entries",
+    "debts",
+    "member_fee_schedules",
+    "payment_events",
+    "balance_snapshots",
+})
+
+
+class FundScopedTable:
+    """
+    Query builder of a fund-scoped table.
+
+    Reads, updates and deletes are filtered on the current fund; inserted
+    and upserted rows are stamped with it. The fund is read when the query
+    is started, so long-lived services follow the fund of each request.
+
+    An upsert that updates on conflict must match rows on fund_id too:
+    matched on id alone, it would move another fund's row into this one.
+    """
+
+    def __init__(self, builder: Any, fund_id: int):
+        self._builder = builder
+        self._fund_id = fund_id
+
+    def select(self, *columns: str, **kwargs: Any) -> Any:
+        return self._builder.select(*columns, **kwargs).eq("fund_id", self._fund_id)
+
+    def update(self, data: Dict[str, Any], **kwargs: Any) -> Any:
+        return self._builder.update(data, **kwargs).eq("fund_id", self._fund_id)
+
+    def delete(self, **kwargs: Any) -> Any:
+        return self._builder.delete(**kwargs).eq("fund_id", self._fund_id)
+
+    def insert(self, data: Union[Dict[str, Any], List[Dict[str, Any]]], **kwargs: Any) -> Any:
+        return self._builder.insert(self._stamp(data), **kwargs)
+
+    def upsert(self, data: Union[Dict[str, Any], List[Dict[str, Any]]], **kwargs: Any) -> Any:
+        conflict_columns = [column.strip() for column in (kwargs.get("on_conflict") or "id").split(",")]
+        if "fund_id" not in conflict_columns and not kwargs.get("ignore_duplicates"):
+            raise ValueError(
+                "upsert on a fund-scoped table must include fund_id in on_conflict "
+                "(or use update with an id filter)"
+            )
+        return self._builder.upsert(self._stamp(data), **kwargs)
+
+    def _stamp(self, data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+        if isinstance(data, list):
+            return [{**row, "fund_id": self._fund_id} for row in data]
+        return {**data, "fund_id": self._fund_id}
+
+
+class FundScopedClient:
+    """Supabase client whose fund-scoped tables only see the current fund."""
+
+    def __init__(self, client: Client):
+        self._client = client
+
+    def table(self, table_name: str) -> Any:
+        builder = self._client.table(table_name)
+        if table_name in FUND_SCOPED_TABLES:
+            return FundScopedTable(builder, get_current_fund_id())
+        return builder
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+fund_client = FundScopedClient(supabase)
+
+
+def get_fund_client() -> FundScopedClient:
+    """
+    Get the Supabase client scoped to the current fund.
+    
+    Returns:
+        Fund-scoped client
+    """
+    return fund_client
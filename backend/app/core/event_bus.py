@@ -0,0 +1,153 @@
+"""Fan-out of change notifications to the SSE subscribers of every worker."""
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.core.tenancy import get_current_fund_id
+
+
+logger = logging.getLogger(__name__)
+
+# Put in a subscriber's queue when it is disconnected for being too slow
+DROPPED = None
+
+# Invalidation bus channel relaying events to the other workers
+EVENTS_CHANNEL = "events"
+
+
+class Subscriber:
+    """A single connected client of one fund with its own bounded buffer."""
+
+    def __init__(self, buffer_size: int, fund_id: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.fund_id = fund_id
+        self.dropped = False
+
+
+class EventBroker:
+    """
+    Publish compact change events to every connected subscriber of the fund
+    the change was made in, on this worker and, through the invalidation
+    bus, on the others (a write lands on one worker, its subscribers are
+    spread over all of them).
+
+    Each subscriber owns a bounded queue. Publishing never blocks: a
+    subscriber whose buffer is full is dropped (it receives a final
+    `DROPPED` marker and is expected to reconnect and refetch), so one slow
+    client cannot hold memory or slow down the others.
+    """
+
+    def __init__(self, buffer_size: int = 64, max_subscribers: int = 1000):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sequence = itertools.count(1)
+        self.dropped_count = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Optional[Subscriber]:
+        """
+        Register a new subscriber of the current fund. Must be called from the event loop.
+
+        Returns:
+            Subscriber, or None when the subscriber limit is reached
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(self.buffer_size, get_current_fund_id())
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event_type: str, **data: Any) -> None:
+        """
+        Publish an event to the subscribers of the current fund on every worker. Safe to call from any thread.
+
+        Args:
+            event_type: Event name, e.g. "transaction.created"
+            data: Compact event payload (ids, status, months)
+        """
+        event = {
+            "id": next(self._sequence),
+            "type": event_type,
+            "fund_id": get_current_fund_id(),
+            "ts": int(time.time()),
+            "data": data,
+        }
+        self.receive(event)
+        invalidation_bus.broadcast(EVENTS_CHANNEL, event)
+
+    def receive(self, event: Dict[str, Any]) -> None:
+        """
+        Hand an event to the local subscribers of its fund. Safe to call from any thread.
+
+        Args:
+            event: Event built by publish(), here or on another worker
+        """
+        if not self._subscribers or self._loop is None:
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            self._dispatch(event)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        for subscriber in list(self._subscribers):
+            if subscriber.fund_id != event["fund_id"]:
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        self.dropped_count += 1
+
+        # Free the buffer and leave only the drop marker
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(DROPPED)
+        logger.info("[EVENTS] Dropped slow subscriber (%d still connected)", len(self._subscribers))
+
+
+# Global broker shared by the services and the /api/events endpoint
+event_broker = EventBroker(
+    buffer_size=settings.EVENTS_BUFFER_SIZE,
+    max_subscribers=settings.EVENTS_MAX_SUBSCRIBERS,
+)
+
+
+def publish_event(event_type: str, **data: Any) -> None:
+    """Publish a change event on the global broker."""
+    event_broker.publish(event_type, **data)
+
+
+def _on_remote_event(event: Dict[str, Any]) -> None:
+    event_broker.receive(event)
+
+
+invalidation_bus.subscribe_channel(EVENTS_CHANNEL, _on_remote_event)
+
+
+def months_of(dates: Iterable[Optional[str]]) -> List[str]:
+    """Distinct months (YYYY-MM) of dates or months, for event payloads."""
+    return sorted({value[:7] for value in dates if value})
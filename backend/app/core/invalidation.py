@@ -0,0 +1,309 @@
+"""Cache invalidation bus shared by every worker process of a deployment."""
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.tenancy import get_current_fund_id, use_fund
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Invalidation:
+    """
+    Something changed in a fund.
+
+    names are tables (or derived data such as "ledger_months"); keys narrow
+    the change down when the subscriber can use it (e.g. the months touched),
+    None means everything under those names. remote is True when the
+    change was made by another process.
+    """
+    fund_id: int
+    names: Tuple[str, ...]
+    keys: Optional[Tuple[str, ...]] = None
+    remote: bool = False
+
+
+class InProcessBackend:
+    """Single-process deployments: nothing to forward."""
+
+    name = "local"
+
+    def start(self, on_message: Callable[[Dict[str, Any]], None]) -> None:
+        pass
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class UnixSocketBackend:
+    """
+    Workers on one machine, no external service.
+
+    Every process binds a Unix datagram socket in a shared directory and
+    publishing sends one datagram to every other socket found there.
+    Sockets of dead processes refuse the datagram and are removed. Sends
+    never block a write: when a receiver's buffer is full the message is
+    dropped (and logged), and that worker's caches catch up at their TTL.
+    """
+
+    name = "unix"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path: Optional[str] = None
+        self._socket: Optional[socket.socket] = None
+
+    def start(self, on_message: Callable[[Dict[str, Any]], None]) -> None:
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+        threading.Thread(target=self._listen, args=(self._socket, on_message), name="invalidation-unix", daemon=True).start()
+        logger.info("Invalidation bus listening on %s", self.path)
+
+    def _listen(self, sock: socket.socket, on_message: Callable[[Dict[str, Any]], None]) -> None:
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                return
+            try:
+                on_message(json.loads(data))
+            except ValueError:
+                logger.warning("Invalidation bus: ignored malformed datagram")
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        if self._socket is None:
+            return
+        data = json.dumps(message).encode()
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".sock") or entry.path == self.path:
+                continue
+            try:
+                self._socket.sendto(data, socket.MSG_DONTWAIT, entry.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Process is gone
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+            except OSError as e:
+                logger.warning("Invalidation bus: dropped message to %s: %s", entry.name, e)
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+class RedisBackend:
+    """
+    Workers on several machines, through Redis (or any server speaking its
+    pub/sub protocol). Requires the optional `redis` package.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str):
+        self.url = url
+        self.channel = channel
+        self._client = None
+
+    def start(self, on_message: Callable[[Dict[str, Any]], None]) -> None:
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("INVALIDATION_BACKEND=redis requires the redis package (pip install redis)") from e
+        self._client = redis.Redis.from_url(self.url)
+        threading.Thread(target=self._listen, args=(on_message,), name="invalidation-redis", daemon=True).start()
+        logger.info("Invalidation bus subscribed to %s on %s", self.channel, self.url)
+
+    def _listen(self, on_message: Callable[[Dict[str, Any]], None]) -> None:
+        while self._client is not None:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    on_message(json.loads(item["data"]))
+            except Exception as e:
+                # Messages published while disconnected are lost: caches catch up at their TTL
+                logger.warning("Invalidation bus: Redis subscription lost, reconnecting: %s", e)
+                time.sleep(1)
+
+    def publish(self, message: Dict[str, Any]) -> None:
+        if self._client is None:
+            return
+        try:
+            self._client.publish(self.channel, json.dumps(message))
+        except Exception as e:
+            logger.warning("Invalidation bus: failed to publish to Redis: %s", e)
+
+    def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+
+class InvalidationBus:
+    """
+    Fan out invalidations to the caches of this process and of every other worker.
+
+    Services publish after each write; caches subscribe a callback at import
+    time. Callbacks run synchronously for local writes and on the backend's
+    listener thread for remote ones, inside the fund the change belongs to,
+    so fund-partitioned caches resolve the right partition.
+
+    The backend starts on first use in each process (also after a fork).
+    """
+
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.id = uuid.uuid4().hex
+        self._subscribers: List[Callable[[Invalidation], None]] = []
+        self._channels: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._started_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.received = 0
+
+    def subscribe(self, callback: Callable[[Invalidation], None]) -> None:
+        """
+        Register a cache callback.
+
+        Args:
+            callback: Called with every local and remote Invalidation
+        """
+        self._subscribers.append(callback)
+
+    def publish(self, *names: str, keys: Optional[Iterable[str]] = None) -> None:
+        """
+        Announce a change of the current fund to every process.
+
+        Args:
+            names: Changed tables (or derived data)
+            keys: Narrower keys under those names; None means everything
+        """
+        invalidation = Invalidation(
+            fund_id=get_current_fund_id(),
+            names=tuple(names),
+            keys=None if keys is None else tuple(keys),
+        )
+        self._deliver(invalidation)
+        self._ensure_started()
+        self.backend.publish({
+            "origin": self.id,
+            "fund_id": invalidation.fund_id,
+            "names": list(invalidation.names),
+            "keys": None if invalidation.keys is None else list(invalidation.keys),
+        })
+
+    def subscribe_channel(self, channel: str, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Register a callback for messages broadcast by other processes on a channel.
+
+        Args:
+            channel: Channel name, e.g. "events"
+            callback: Called on the listener thread with each payload
+        """
+        self._channels.setdefault(channel, []).append(callback)
+
+    def broadcast(self, channel: str, payload: Dict[str, Any]) -> None:
+        """
+        Send a JSON payload to the other processes, through the same backend as invalidations.
+
+        The calling process is not notified: it handles its own payload.
+
+        Args:
+            channel: Channel name
+            payload: JSON-serializable message
+        """
+        self._ensure_started()
+        self.backend.publish({"origin": self.id, "channel": channel, "payload": payload})
+
+    def start(self) -> None:
+        """Start listening for remote invalidations now instead of on first publish."""
+        self._ensure_started()
+        if self.backend.name == "local" and multiprocessing.parent_process() is not None:
+            # uvicorn --workers (and --reload) run the app in child processes; WEB_CONCURRENCY>1 is refused at startup
+            logger.warning(
+                "Invalidation bus: INVALIDATION_BACKEND=local in a worker process; if other workers run "
+                "alongside it, their caches will serve stale data (use unix or redis)"
+            )
+
+    def _ensure_started(self) -> None:
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid != os.getpid():
+                self.backend.start(self._receive)
+                self._started_pid = os.getpid()
+                atexit.register(self.backend.close)
+
+    def _receive(self, message: Dict[str, Any]) -> None:
+        if message.get("origin") == self.id:
+            return
+        if "channel" in message:
+            for callback in self._channels.get(message["channel"], ()):
+                try:
+                    callback(message["payload"])
+                except Exception as e:
+                    logger.error("Callback of channel %s failed: %s", message["channel"], e, exc_info=True)
+            return
+        self.received += 1
+        keys = message.get("keys")
+        invalidation = Invalidation(
+            fund_id=message["fund_id"],
+            names=tuple(message.get("names") or ()),
+            keys=None if keys is None else tuple(keys),
+            remote=True,
+        )
+        with use_fund(invalidation.fund_id):
+            self._deliver(invalidation)
+
+    def _deliver(self, invalidation: Invalidation) -> None:
+        for callback in self._subscribers:
+            try:
+                callback(invalidation)
+            except Exception as e:
+                logger.error("Invalidation callback failed for %s: %s", invalidation, e, exc_info=True)
+
+
+def create_backend(name: str) -> Any:
+    """
+    Build the backend named by INVALIDATION_BACKEND.
+
+    Args:
+        name: local, unix or redis
+
+    Returns:
+        Backend instance
+    """
+    if name == "unix":
+        return UnixSocketBackend(settings.INVALIDATION_SOCKET_DIR)
+    if name == "redis":
+        return RedisBackend(settings.INVALIDATION_REDIS_URL, settings.INVALIDATION_CHANNEL)
+    if name != "local":
+        raise ValueError(f"Unknown INVALIDATION_BACKEND: {name}")
+    return InProcessBackend()
+
+
+# Global instance shared by every service and cache in the process
+invalidation_bus = InvalidationBus(create_backend(settings.INVALIDATION_BACKEND))
@@ -0,0 +1,197 @@
+"""Registry of background jobs and their progress."""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core import database
+from app.core.config import settings
+from app.core.tenancy import get_current_fund_id
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryJobStore:
+    """
+    Jobs in process memory: lost on restart and not shared between workers.
+
+    Only the most recent max_jobs are kept.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_jobs: int = 200):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def insert(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = {**job, "progress": dict(job["progress"])}
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {**job, "progress": dict(job["progress"])} if job else None
+
+    def update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+
+class TableJobStore:
+    """
+    Jobs in the jobs table (sql/jobs.sql), so any worker can answer a poll.
+
+    Jobs untouched for retention_seconds are deleted when a new job is created.
+    """
+
+    name = "table"
+
+    def __init__(self, retention_seconds: int):
+        self.retention_seconds = retention_seconds
+
+    def insert(self, job: Dict[str, Any]) -> None:
+        database.supabase.table("jobs").delete().lt("updated_at", job["created_at"] - self.retention_seconds).execute()
+        database.supabase.table("jobs").insert(jsonable_encoder(job)).execute()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = database.supabase.table("jobs").select("*").eq("id", job_id).limit(1).execute().data
+        return rows[0] if rows else None
+
+    def update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        database.supabase.table("jobs").update(jsonable_encoder(fields)).eq("id", job_id).execute()
+
+
+class JobRegistry:
+    """
+    Track long-running jobs (imports, rebuilds...) so clients can poll them by id.
+
+    The store decides where jobs live (MemoryJobStore or TableJobStore).
+    Progress is merged here, in the worker running the job, and written at
+    most every progress_interval seconds; status changes are always written.
+
+    Status flow: PENDING -> RUNNING -> COMPLETED or FAILED.
+    """
+
+    def __init__(self, store: Any, progress_interval: float = 0.0):
+        self.store = store
+        self.progress_interval = progress_interval
+        # Progress of the jobs running in this process, and when it was last written
+        self._progress: Dict[str, Dict[str, Any]] = {}
+        self._written_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, **params: Any) -> Dict[str, Any]:
+        """
+        Register a new job.
+
+        Args:
+            kind: Job type, e.g. "bank_statement_import"
+            **params: Parameters echoed back to clients
+
+        Returns:
+            Snapshot of the job
+        """
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "fund_id": get_current_fund_id(),
+            "status": "PENDING",
+            "params": params,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.store.insert(job)
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def start(self, job_id: str) -> None:
+        self._update(job_id, status="RUNNING")
+
+    def progress(self, job_id: str, **progress: Any) -> None:
+        """Merge counters into the job progress."""
+        now = time.time()
+        with self._lock:
+            merged = self._progress.setdefault(job_id, {})
+            merged.update(progress)
+            if now - self._written_at.get(job_id, 0.0) < self.progress_interval:
+                return
+            self._written_at[job_id] = now
+            snapshot = dict(merged)
+        try:
+            self.store.update(job_id, {"progress": snapshot, "updated_at": now})
+        except Exception as e:
+            # Progress is informative only: never fail the job over it
+            logger.warning("Failed to save progress of job %s: %s", job_id, e)
+
+    def reporter(self, job_id: Optional[str]) -> Callable[..., None]:
+        """
+        Get a progress callback for a job; a no-op when job_id is None (e.g. CLI runs).
+
+        Args:
+            job_id: Job ID or None
+
+        Returns:
+            Callable taking progress counters as keyword arguments
+        """
+        if not job_id:
+            return lambda **progress: None
+        return lambda **progress: self.progress(job_id, **progress)
+
+    def complete(self, job_id: str, result: Any = None) -> None:
+        self._finish(job_id, status="COMPLETED", result=result)
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._finish(job_id, status="FAILED", error=error)
+
+    def _finish(self, job_id: str, **fields: Any) -> None:
+        # Final progress goes out with the final status, however recent the last write
+        with self._lock:
+            progress = self._progress.pop(job_id, None)
+            self._written_at.pop(job_id, None)
+        if progress is not None:
+            fields["progress"] = progress
+        self._update(job_id, **fields)
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        self.store.update(job_id, {**fields, "updated_at": time.time()})
+
+
+def create_store(name: str) -> Any:
+    """
+    Build the job store named by JOBS_BACKEND.
+
+    Args:
+        name: memory or table
+
+    Returns:
+        Store instance
+    """
+    if name == "table":
+        return TableJobStore(settings.JOBS_RETENTION_SECONDS)
+    if name != "memory":
+        raise ValueError(f"Unknown JOBS_BACKEND: {name}")
+    return MemoryJobStore(max_jobs=settings.JOBS_MAX_RETAINED)
+
+
+# Global instance
+job_registry = JobRegistry(
+    create_store(settings.JOBS_BACKEND),
+    progress_interval=settings.JOBS_PROGRESS_INTERVAL_SECONDS if settings.JOBS_BACKEND == "table" else 0.0,
+)
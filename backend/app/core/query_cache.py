@@ -0,0 +1,123 @@
+"""Read-through cache of query results for rarely changing tables."""
+import copy
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.table_versions import table_versions
+from app.core.tenancy import FundLocal
+
+
+T = TypeVar("T")
+
+
+def _normalize(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((str(name), _normalize(item)) for name, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted((_normalize(item) for item in value), key=repr))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    return value
+
+
+def query_key(operation: str, **parts: Any) -> Tuple[Hashable, ...]:
+    """
+    Build a cache key from what defines a query.
+
+    Keyword order does not matter, dict filters are sorted and sets (e.g.
+    the values of an in_ filter) are order-insensitive.
+
+    Args:
+        operation: Query name, e.g. "get_all"
+        **parts: Columns, filters, order, range...
+
+    Returns:
+        Hashable key
+    """
+    return (operation,) + tuple(sorted((name, _normalize(value)) for name, value in parts.items()))
+
+
+class QueryCache:
+    """
+    Query results per fund and table, each table with its own TTL and size.
+
+    An entry remembers the table version it was read at and is only served
+    while the version is unchanged; every write through BaseService (in this
+    worker or, through the invalidation bus, in another) bumps it. Results
+    are copied in and out so callers can modify them freely.
+    """
+
+    def __init__(self, max_funds: int = 1000):
+        self._tables: FundLocal[Dict[str, TTLCache]] = FundLocal(dict, max_funds=max_funds)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def get_or_load(self, table: str, key: Hashable, load: Callable[[], T], ttl: float, max_entries: int) -> T:
+        """
+        Get a cached result or load and cache it.
+
+        Args:
+            table: Table the result is read from
+            key: Normalized query key (see query_key)
+            load: Runs the query
+            ttl: Seconds an entry may be served
+            max_entries: Entries kept for this table (per fund)
+
+        Returns:
+            Copy of the result
+        """
+        if not settings.QUERY_CACHE_ENABLED:
+            return load()
+
+        tables = self._tables.current()
+        with self._lock:
+            cache = tables.get(table)
+            if cache is None:
+                cache = tables[table] = TTLCache(max_entries=max_entries, ttl=ttl)
+
+        # Read the version before the query: a write racing with it makes the entry stale at once
+        version = table_versions.get(table)
+        cached = cache.get(key)
+        if cached is not None and cached[0] == version:
+            self._count(table, "hits")
+            return copy.deepcopy(cached[1])
+
+        self._count(table, "misses")
+        result = load()
+        cache.set(key, (version, copy.deepcopy(result)))
+        return result
+
+    def _count(self, table: str, counter: str) -> None:
+        with self._lock:
+            self._counters[table][counter] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get hit ratio and size per table, summed over funds.
+
+        Returns:
+            Dict of table -> hits, misses, hit_ratio, entries, evictions and funds
+        """
+        partitions = self._tables.partitions()
+        with self._lock:
+            counters = {table: dict(values) for table, values in self._counters.items()}
+
+        report: Dict[str, Dict[str, Any]] = {}
+        for table, values in counters.items():
+            caches = [tables[table] for tables in partitions.values() if table in tables]
+            lookups = values["hits"] + values["misses"]
+            report[table] = {
+                **values,
+                "hit_ratio": round(values["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": sum(len(cache) for cache in caches),
+                "evictions": sum(cache.evictions for cache in caches),
+                "funds": len(caches),
+            }
+        return report
+
+
+# Global instance shared by every service in the process
+query_cache = QueryCache(max_funds=settings.FUND_CACHE_MAX_FUNDS)
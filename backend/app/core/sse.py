@@ -0,0 +1,34 @@
+"""Server-Sent Events helpers."""
+import json
+from typing import Any, Optional
+
+# Headers that keep proxies (nginx, Cloudflare) from buffering the stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse(data: Any, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    """
+    Encode a single Server-Sent Events frame.
+    
+    Args:
+        data: Payload, serialized as compact JSON unless it is already a string
+        event: Optional event name
+        event_id: Optional event id (used by clients for Last-Event-ID)
+        
+    Returns:
+        SSE frame terminated by a blank line
+    """
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    for line in payload.splitlines() or [""]:
+        lines.append(f"data: {line}")
+    return "\n".join(lines) + "\n\n"
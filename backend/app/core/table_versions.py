@@ -0,0 +1,54 @@
+"""Per-table change counters used to invalidate derived data."""
+import threading
+from typing import Dict, Iterable, Tuple
+
+from app.core.invalidation import invalidation_bus
+from app.core.tenancy import get_current_fund_id
+
+
+class TableVersions:
+    """
+    Monotonic version counter per table of each fund.
+    
+    Every write made through the services bumps the counter of the table it
+    touched in the current fund, so anything derived from a table (cached
+    answers, query results) can tell whether it is stale by comparing
+    version snapshots. Counters are a few integers per fund and are never
+    evicted, so a version can never go back and match a stale snapshot.
+    """
+
+    def __init__(self):
+        self._versions: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, table: str) -> int:
+        return self._versions.get((get_current_fund_id(), table), 0)
+
+    def bump(self, *tables: str) -> None:
+        """
+        Record a write to one or more tables of the current fund.
+        
+        Args:
+            tables: Table names
+        """
+        fund_id = get_current_fund_id()
+        with self._lock:
+            for table in tables:
+                self._versions[(fund_id, table)] = self._versions.get((fund_id, table), 0) + 1
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        """
+        Get the current versions of several tables of the current fund.
+        
+        Args:
+            tables: Table names
+            
+        Returns:
+            Sorted tuple of (table, version) pairs, comparable with ==
+        """
+        return tuple((table, self.get(table)) for table in sorted(set(tables)))
+
+
+# Global instance shared by every service in the process, bumped by every local or remote write
+table_versions = TableVersions()
+invalidation_bus.subscribe(lambda invalidation: table_versions.bump(*invalidation.names))
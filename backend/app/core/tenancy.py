@@ -0,0 +1,119 @@
+"""Current fund (tenant) of a request and per-fund partitioning of in-process state."""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+from app.core.config import settings
+
+
+FUND_HEADER = "X-Fund-Id"
+FUND_QUERY_PARAM = "fund_id"
+
+# Set per request by the fund middleware, per run by the CLI jobs
+current_fund_id: ContextVar[int] = ContextVar("current_fund_id", default=settings.DEFAULT_FUND_ID)
+
+T = TypeVar("T")
+
+
+def get_current_fund_id() -> int:
+    """Get the fund the current request (or job) works on."""
+    return current_fund_id.get()
+
+
+@contextmanager
+def use_fund(fund_id: int) -> Iterator[int]:
+    """
+    Run a block on behalf of a fund.
+
+    Args:
+        fund_id: Fund ID
+
+    Yields:
+        The fund ID
+    """
+    token = current_fund_id.set(fund_id)
+    try:
+        yield fund_id
+    finally:
+        current_fund_id.reset(token)
+
+
+def run_in_fund(fund_id: int, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call func on behalf of a fund (for background tasks and worker threads)."""
+    with use_fund(fund_id):
+        return func(*args, **kwargs)
+
+
+class FundLocal(Generic[T]):
+    """
+    One instance of T per fund, created on first use, like threading.local for funds.
+
+    Attribute access is forwarded to the instance of the current fund, so a
+    module-level FundLocal is used exactly like the single-fund global it
+    replaces. Every fund gets its own instance, hence its own size limits:
+    a busy fund only ever evicts its own entries. At most max_funds
+    instances are kept; the least recently used fund is dropped as a whole
+    (and rebuilt on its next request).
+    """
+
+    def __init__(self, factory: Callable[[], T], max_funds: int = 1000):
+        """
+        Initialize partitions.
+
+        Args:
+            factory: Builds the instance of a fund
+            max_funds: Maximum number of funds kept in memory
+        """
+        self._factory = factory
+        self._max_funds = max_funds
+        self._instances: "OrderedDict[int, T]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fund_evictions = 0
+
+    def current(self) -> T:
+        """Get (or create) the instance of the current fund."""
+        return self.for_fund(get_current_fund_id())
+
+    def for_fund(self, fund_id: int) -> T:
+        """
+        Get (or create) the instance of a fund.
+
+        Args:
+            fund_id: Fund ID
+
+        Returns:
+            Instance of the fund
+        """
+        with self._lock:
+            instance = self._instances.get(fund_id)
+            if instance is None:
+                instance = self._instances[fund_id] = self._factory()
+                while len(self._instances) > self._max_funds:
+                    self._instances.popitem(last=False)
+                    self.fund_evictions += 1
+            else:
+                self._instances.move_to_end(fund_id)
+            return instance
+
+    def peek(self, fund_id: int) -> Optional[T]:
+        """Get the instance of a fund if it is held, without creating it."""
+        with self._lock:
+            return self._instances.get(fund_id)
+
+    def discard(self, fund_id: int) -> None:
+        """Drop the instance of a fund."""
+        with self._lock:
+            self._instances.pop(fund_id, None)
+
+    def partitions(self) -> Dict[int, T]:
+        """Snapshot of the instances currently held, by fund ID."""
+        with self._lock:
+            return dict(self._instances)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.current(), name)
+
+    def __len__(self) -> int:
+        return len(self.current())
@@ -0,0 +1,36 @@
+"""Text normalization helpers."""
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def strip_diacritics(text: str) -> str:
+    """
+    Remove Vietnamese (and other) diacritics.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Text without combining marks, with đ/Đ folded to d/D
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return stripped.replace("đ", "d").replace("Đ", "D")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for comparisons and cache keys.
+    
+    Folds diacritics and case and collapses whitespace, so
+    "  Đóng quỹ   THÁNG này " and "dong quy thang nay" are equal.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Normalized text
+    """
+    return _WHITESPACE_RE.sub(" ", strip_diacritics(text or "").lower()).strip()
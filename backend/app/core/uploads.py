@@ -0,0 +1,241 @@
+"""Bounded, streaming ingest for uploaded files."""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+
+
+# Declared content types we accept, mapped to the canonical detected type
+DECLARED_IMAGE_TYPES = {
+    "image/jpeg": "image/jpeg",
+    "image/jpg": "image/jpeg",
+    "image/pjpeg": "image/jpeg",
+    "image/png": "image/png",
+    "image/webp": "image/webp",
+    "image/heic": "image/heic",
+    "image/heif": "image/heic",
+}
+
+IMAGE_SUFFIXES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/heic": ".heic",
+}
+
+HEIC_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1"}
+
+# Bytes needed to recognise every supported signature
+SIGNATURE_LENGTH = 12
+
+
+@dataclass
+class StoredUpload:
+    """An upload that has been streamed to a temporary file."""
+    path: str
+    filename: Optional[str]
+    mime_type: str
+    size: int
+    sha256: str
+
+
+def detect_image_type(header: bytes) -> Optional[str]:
+    """
+    Detect an image type from its leading bytes.
+
+    Args:
+        header: First bytes of the file (at least SIGNATURE_LENGTH when available)
+
+    Returns:
+        Canonical mime type, or None if the format is not supported
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[4:8] == b"ftyp" and header[8:12] in HEIC_BRANDS:
+        return "image/heic"
+    return None
+
+
+def _too_large() -> HTTPException:
+    limit_mb = settings.MAX_UPLOAD_BYTES / (1024 * 1024)
+    return HTTPException(status_code=413, detail=f"Ảnh vượt quá dung lượng cho phép ({limit_mb:.1f} MB)")
+
+
+async def save_upload_bounded(
+    file: UploadFile,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Stream an uploaded image to a temporary file in fixed-size chunks.
+
+    The file is rejected as soon as it exceeds max_bytes, or when its magic
+    bytes are not a supported image / do not match the declared content type.
+    The SHA-256 digest is computed while streaming, so memory stays bounded
+    by chunk_size regardless of the upload size.
+
+    Args:
+        file: Uploaded file
+        max_bytes: Hard size cap (defaults to settings.MAX_UPLOAD_BYTES)
+        chunk_size: Read size per chunk (defaults to settings.UPLOAD_CHUNK_SIZE)
+
+    Returns:
+        StoredUpload; the caller owns (and must delete) StoredUpload.path
+
+    Raises:
+        HTTPException: 413 if too large, 415 if not a supported image, 400 if empty
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+
+    # Starlette already knows the size of a parsed multipart file
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large()
+
+    declared_type = (file.content_type or "").split(";")[0].strip().lower()
+    if declared_type.startswith("image/") and declared_type not in DECLARED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Định dạng ảnh không được hỗ trợ: {declared_type}")
+
+    digest = hashlib.sha256()
+    header = b""
+    mime_type = None
+    size = 0
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        with temp_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large()
+
+                if mime_type is None:
+                    header += chunk[:SIGNATURE_LENGTH - len(header)]
+                    if len(header) >= SIGNATURE_LENGTH:
+                        mime_type = _check_signature(header, declared_type)
+
+                digest.update(chunk)
+                temp_file.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File ảnh rỗng")
+        if mime_type is None:
+            mime_type = _check_signature(header, declared_type)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+
+    # Give the file a suffix matching its real type so downstream tools detect it
+    path = temp_file.name + IMAGE_SUFFIXES[mime_type]
+    os.replace(temp_file.name, path)
+
+    return StoredUpload(
+        path=path,
+        filename=file.filename,
+        mime_type=mime_type,
+        size=size,
+        sha256=digest.hexdigest(),
+    )
+
+
+async def save_file_bounded(
+    file: UploadFile,
+    max_bytes: int,
+    suffix: str = "",
+    chunk_size: Optional[int] = None,
+) -> StoredUpload:
+    """
+    Stream any uploaded file (e.g. a CSV statement) to a temporary file in fixed-size chunks.
+
+    Args:
+        file: Uploaded file
+        max_bytes: Hard size cap
+        suffix: Suffix of the temporary file
+        chunk_size: Read size per chunk (defaults to settings.UPLOAD_CHUNK_SIZE)
+
+    Returns:
+        StoredUpload; the caller owns (and must delete) StoredUpload.path
+
+    Raises:
+        HTTPException: 413 if too large, 400 if empty
+    """
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"File vượt quá dung lượng cho phép ({max_bytes / (1024 * 1024):.1f} MB)"
+    )
+    if file.size is not None and file.size > max_bytes:
+        raise too_large
+
+    digest = hashlib.sha256()
+    size = 0
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with temp_file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise too_large
+                digest.update(chunk)
+                temp_file.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File rỗng")
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+
+    return StoredUpload(
+        path=temp_file.name,
+        filename=file.filename,
+        mime_type=(file.content_type or "application/octet-stream").split(";")[0].strip().lower(),
+        size=size,
+        sha256=digest.hexdigest(),
+    )
+
+
+def _check_signature(header: bytes, declared_type: str) -> str:
+    detected_type = detect_image_type(header)
+    if not detected_type:
+        raise HTTPException(status_code=415, detail="File tải lên không phải là ảnh hợp lệ (JPEG, PNG, WebP, HEIC)")
+
+    expected_type = DECLARED_IMAGE_TYPES.get(declared_type)
+    if expected_type and expected_type != detected_type:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Nội dung file ({detected_type}) không khớp với content-type khai báo ({declared_type})"
+        )
+    return detected_type
+
+
+async def reject_oversized_uploads(request: Request, call_next):
+    """
+    Middleware: refuse image uploads whose Content-Length is already over the cap.
+
+    Runs before the multipart body is parsed, so oversized requests are
+    rejected without being spooled. Chunked requests without a
+    Content-Length are still capped by save_upload_bounded.
+    """
+    if request.method == "POST" and request.url.path.startswith(settings.UPLOAD_LIMITED_PATH_PREFIX):
+        content_length = request.headers.get("content-length")
+        # Allow some room for multipart boundaries and headers
+        if content_length and content_length.isdigit() and int(content_length) > settings.MAX_UPLOAD_BYTES + 64 * 1024:
+            error = _too_large()
+            return JSONResponse(status_code=error.status_code, content={"detail": error.detail})
+    return await call_next(request)
@@ -0,0 +1,39 @@
+"""
+Import a bank statement CSV (or Excel saved as CSV).
+
+Usage (from the backend directory):
+    python -m app.jobs.import_bank_statement statement.csv --dry-run
+    python -m app.jobs.import_bank_statement statement.csv
+    python -m app.jobs.import_bank_statement statement.csv --include-unmatched
+"""
+import argparse
+import json
+import logging
+
+from app.core.config import settings
+from app.core.tenancy import current_fund_id
+from app.services.statement_import_service import StatementImportService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import bank statement lines as transactions and allocate member payments")
+    parser.add_argument("path", help="CSV file")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be imported")
+    parser.add_argument("--include-unmatched", action="store_true", help="Import money in without a matching member as unassigned income")
+    parser.add_argument("--batch-size", type=int, help="Rows per insert request")
+    parser.add_argument("--fund-id", type=int, default=settings.DEFAULT_FUND_ID, help="Fund to work on")
+    args = parser.parse_args()
+    current_fund_id.set(args.fund_id)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    summary = StatementImportService().import_file(
+        args.path,
+        dry_run=args.dry_run,
+        include_unmatched=args.include_unmatched,
+        batch_size=args.batch_size,
+    )
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
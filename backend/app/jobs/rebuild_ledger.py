@@ -0,0 +1,42 @@
+"""
+Recompute FUND allocations of past income after fee schedules change.
+
+Usage (from the backend directory):
+    python -m app.jobs.rebuild_ledger                 # dry run, prints the summary
+    python -m app.jobs.rebuild_ledger --show-diff     # dry run, prints every change
+    python -m app.jobs.rebuild_ledger --apply         # write the differences
+    python -m app.jobs.rebuild_ledger --apply --user-id 3
+"""
+import argparse
+import json
+import logging
+
+from app.core.config import settings
+from app.core.tenancy import current_fund_id
+from app.services.ledger_rebuild_service import LedgerRebuildService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay allocation rules over completed income and fix transaction_entries")
+    parser.add_argument("--apply", action="store_true", help="Write the differences (default: dry run)")
+    parser.add_argument("--user-id", type=int, help="Only rebuild one member")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per write request")
+    parser.add_argument("--show-diff", action="store_true", help="Print every inserted, updated and deleted entry")
+    parser.add_argument("--fund-id", type=int, default=settings.DEFAULT_FUND_ID, help="Fund to work on")
+    args = parser.parse_args()
+    current_fund_id.set(args.fund_id)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    diff = LedgerRebuildService().rebuild(dry_run=not args.apply, user_id=args.user_id, batch_size=args.batch_size)
+
+    if args.show_diff:
+        for action, rows in (("insert", diff.to_insert), ("update", diff.to_update), ("delete", diff.to_delete)):
+            for row in rows:
+                print(json.dumps({"action": action, **row}, ensure_ascii=False))
+    print(json.dumps(diff.summary(), ensure_ascii=False))
+    if not args.apply and not diff.is_empty:
+        print("Dry run: re-run with --apply to write these changes")
+
+
+if __name__ == "__main__":
+    main()
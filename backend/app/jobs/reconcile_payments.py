@@ -0,0 +1,31 @@
+"""
+Complete PENDING PayOS payments from a bank statement CSV.
+
+Usage (from the backend directory):
+    python -m app.jobs.reconcile_payments statement.csv --dry-run
+    python -m app.jobs.reconcile_payments statement.csv
+"""
+import argparse
+import json
+import logging
+
+from app.core.config import settings
+from app.core.tenancy import current_fund_id
+from app.services.reconciliation_service import ReconciliationService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Match PENDING payments with statement lines and complete the matches")
+    parser.add_argument("path", help="CSV file")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the matches")
+    parser.add_argument("--fund-id", type=int, default=settings.DEFAULT_FUND_ID, help="Fund to work on")
+    args = parser.parse_args()
+    current_fund_id.set(args.fund_id)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    summary = ReconciliationService().reconcile_file(args.path, dry_run=args.dry_run)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
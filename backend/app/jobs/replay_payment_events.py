@@ -0,0 +1,39 @@
+"""
+Replay PayOS payment events that were never applied.
+
+Usage (from the backend directory):
+    python -m app.jobs.replay_payment_events               # all pending/failed/stuck events
+    python -m app.jobs.replay_payment_events --order-code 1736500000
+"""
+import argparse
+import json
+import logging
+
+from app.core.config import settings
+from app.core.tenancy import current_fund_id
+from app.services.payment_allocation_service import PaymentAllocationService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay pending, failed or stuck PayOS payment events")
+    parser.add_argument("--order-code", type=int, help="Replay a single order code")
+    parser.add_argument("--limit", type=int, default=100, help="Maximum number of events to replay")
+    parser.add_argument("--fund-id", type=int, default=settings.DEFAULT_FUND_ID, help="Fund to work on")
+    args = parser.parse_args()
+    current_fund_id.set(args.fund_id)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    service = PaymentAllocationService()
+
+    if args.order_code is not None:
+        results = [service.apply_event(args.order_code)]
+    else:
+        results = service.replay_pending(limit=args.limit)
+
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+    print(f"Replayed {len(results)} event(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Write the monthly balance snapshots of closed months (run after each month closes).
+
+Usage (from the backend directory):
+    python -m app.jobs.snapshot_balance                       # up to the last closed month
+    python -m app.jobs.snapshot_balance --through 2024-06
+    python -m app.jobs.snapshot_balance --rebuild             # delete and rewrite every snapshot
+"""
+import argparse
+import json
+import logging
+
+from app.core.config import settings
+from app.core.tenancy import current_fund_id
+from app.services.balance_snapshot_service import BalanceSnapshotService
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write cumulative balance snapshots of closed months")
+    parser.add_argument("--through", help="Last month to snapshot (YYYY-MM, default: last closed month)")
+    parser.add_argument("--rebuild", action="store_true", help="Delete every snapshot first")
+    parser.add_argument("--fund-id", type=int, default=settings.DEFAULT_FUND_ID, help="Fund to work on")
+    args = parser.parse_args()
+    current_fund_id.set(args.fund_id)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    service = BalanceSnapshotService()
+    if args.rebuild:
+        service.delete_snapshots()
+    written = service.take_snapshots(args.through)
+    print(json.dumps({"written": len(written), "latest": service.get_latest_snapshot()}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
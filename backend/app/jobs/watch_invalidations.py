@@ -0,0 +1,48 @@
+"""
+Print the cache invalidations published by the other worker processes.
+
+Handy to check that INVALIDATION_BACKEND reaches every worker, e.g. with
+INVALIDATION_BACKEND=unix on one machine:
+
+Usage (from the backend directory):
+    INVALIDATION_BACKEND=unix python -m app.jobs.watch_invalidations
+    INVALIDATION_BACKEND=unix python -m app.jobs.watch_invalidations --publish transactions --fund-id 2
+"""
+import argparse
+import json
+import logging
+import time
+
+from app.core.config import settings
+from app.core.invalidation import invalidation_bus
+from app.core.tenancy import current_fund_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Watch (or publish) cache invalidations between worker processes")
+    parser.add_argument("--publish", nargs="+", metavar="TABLE", help="Publish an invalidation of these tables and exit")
+    parser.add_argument("--fund-id", type=int, default=settings.DEFAULT_FUND_ID, help="Fund to work on")
+    args = parser.parse_args()
+    current_fund_id.set(args.fund_id)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.publish:
+        invalidation_bus.publish(*args.publish)
+        return
+
+    invalidation_bus.subscribe(lambda invalidation: invalidation.remote and print(json.dumps({
+        "fund_id": invalidation.fund_id,
+        "names": invalidation.names,
+        "keys": invalidation.keys,
+    }), flush=True))
+    invalidation_bus.start()
+    print(f"Watching invalidations ({invalidation_bus.backend.name} backend), Ctrl+C to stop", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,16 @@ from app.routers.transaction_router import router as transaction_router
 from app.routers.user_router import router as user_router
 from app.routers.debt_router import router as debt_router
 from app.routers.payment_router import router as payment_router
+from app.routers.event_router import router as event_router
+from app.routers.import_router import router as import_router
+from app.routers.job_router import router as job_router
+from app.routers.analytics_router import router as analytics_router
+from app.routers.fund_router import router as fund_router
+from app.routers.metrics_router import router as metrics_router
+from app.core.uploads import reject_oversized_uploads
+from app.core.ai_scheduler import admit_ai_requests
+from app.core.invalidation import invalidation_bus
+from app.services.fund_service import select_fund
 
 # @asynccontextmanager
 # async def lifespan(app: FastAPI):
@@ -40,10 +50,17 @@ from app.routers.payment_router import router as payment_router
 #     except asyncio.CancelledError:
 #         print("Worker task cancelled")
 
+@asynccontextmanager
+async def app_lifespan(app: FastAPI):
+    """Listen for cache invalidations of the other workers from startup."""
+    invalidation_bus.start()
+    yield
+
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     # lifespan=lifespan
+    lifespan=app_lifespan,
 )
 
 # Configure CORS
@@ -53,6 +70,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Add middleware to log all requests
@@ -64,11 +82,26 @@ async def log_requests(request: Request, call_next):
     logger.info(f"Response: {request.method} {request.url.path} - Status: {response.status_code}")
     return response
 
+# Reject oversized image uploads before the multipart body is parsed
+app.middleware("http")(reject_oversized_uploads)
+
+# Answer 503 + Retry-After when the worker already holds AI_MAX_ADMITTED_REQUESTS AI requests
+app.middleware("http")(admit_ai_requests)
+
+# Run every request on behalf of the fund named by X-Fund-Id (default fund otherwise)
+app.middleware("http")(select_fund)
+
 app.include_router(ai_router, prefix="/api", tags=["AI"])
 app.include_router(transaction_router, prefix="/api/transactions", tags=["Transactions"])
 app.include_router(user_router, prefix="/api/users", tags=["Users"])
 app.include_router(debt_router, prefix="/api/debts", tags=["Debts"])
 app.include_router(payment_router, prefix="/api/payments", tags=["Payments"])
+app.include_router(event_router, prefix="/api", tags=["Events"])
+app.include_router(import_router, prefix="/api/imports", tags=["Imports"])
+app.include_router(job_router, prefix="/api/jobs", tags=["Jobs"])
+app.include_router(analytics_router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(fund_router, prefix="/api/funds", tags=["Funds"])
+app.include_router(metrics_router, prefix="/api/metrics", tags=["Metrics"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,4 +1,6 @@
 from .transaction_model import Transaction, TransactionCreate, TransactionFilters
 from .user_model import User, UserCreate
 from .debts_model import Debt, DebtCreate
-from .transaction_entry_model import TransactionEntry, TransactionEntryCreate
\ No newline at end of file
+from .transaction_entry_model import TransactionEntry, TransactionEntryCreate
+from .fund_model import Fund, FundCreate
+from .extraction_model import IncomeExtraction, ExpenseExtraction
\ No newline at end of file
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Optional
+
+# Response schemas of the Gemini extraction calls: the model is constrained
+# to emit exactly these fields, so its output parses straight into them.
+
+class IncomeExtraction(BaseModel):
+    """Transfer read from a bank transfer screenshot or a chat message."""
+    # YYYY-MM-DD
+    transaction_date: Optional[str] = None
+    user_from: Optional[str] = None
+    # Member ID matching user_from in the member list of the prompt
+    id_from: Optional[int] = None
+    user_to: Optional[str] = None
+    amount: Optional[int] = None
+    description: Optional[str] = None
+
+class ExpenseExtraction(BaseModel):
+    """One bill read from an expense receipt."""
+    # YYYY-MM-DD
+    transaction_date: Optional[str] = None
+    bill_name: Optional[str] = None
+    amount: Optional[int] = None
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class FundBase(BaseModel):
+    name: str
+    # Member whose own fund shortfall is never reported as debt
+    admin_user_id: Optional[int] = None
+
+class FundCreate(FundBase):
+    pass
+
+class Fund(FundBase):
+    id: int
+    created_at: Optional[str] = None
+
+    class Config:
+        from_attributes = True
@@ -1,8 +1,20 @@
 """AI router endpoints."""
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from app.core.ai_scheduler import BATCH, INTERACTIVE, LANES, Admission, ai_scheduler
+from app.core.event_bus import publish_event
+from app.core.jobs import job_registry
+from app.core.sse import SSE_HEADERS, format_sse
+from app.core.tenancy import get_current_fund_id
+from app.core.uploads import save_upload_bounded
 from app.services import GeminiService
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # Dependency injection for service
@@ -10,13 +22,110 @@ def get_gemini_service() -> GeminiService:
     """Get GeminiService instance."""
     return GeminiService()
 
+def get_requester(request: Request) -> str:
+    """Fair-share key of the caller: its fund and client address."""
+    host = request.client.host if request.client else "unknown"
+    return f"{get_current_fund_id()}:{host}"
+
+def resolve_lane(default: str, priority: Optional[str]) -> str:
+    """
+    Get the scheduler lane of a request.
+    
+    Clients may lower the priority of their own requests (e.g. a bulk
+    import sending ?priority=background) but never raise it.
+    
+    Args:
+        default: Lane of the endpoint
+        priority: Requested lane
+        
+    Returns:
+        Lane name
+    """
+    if priority is None:
+        return default
+    if priority not in LANES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of: {', '.join(LANES)}")
+    return max(default, priority, key=LANES.index)
+
+def start_ai_job(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    kind: str,
+    lane: str,
+    work: Callable[[], Awaitable[Any]],
+    **params: Any
+) -> JSONResponse:
+    """
+    Run an AI request as a job after answering 202 (?async=true).
+    
+    The job takes over the admission of the request, so it keeps counting
+    against the worker's limit until it is done.
+    
+    Args:
+        request: Incoming request
+        background_tasks: Tasks run once the response is sent
+        kind: Job type
+        lane: Scheduler lane
+        work: Does the AI processing; its return value is the job result
+        **params: Parameters echoed back in the job
+        
+    Returns:
+        202 response with the job ID to poll at /api/jobs/{job_id}
+    """
+    admission: Optional[Admission] = getattr(request.state, "ai_admission", None)
+    job = job_registry.create(kind, lane=lane, **params)
+    background_tasks.add_task(run_ai_job, job["id"], kind, lane, get_requester(request), work, admission)
+    if admission is not None:
+        admission.handed_off = True
+    return JSONResponse(status_code=202, content={"job_id": job["id"], "status": job["status"]})
+
+async def run_ai_job(
+    job_id: str,
+    kind: str,
+    lane: str,
+    requester: str,
+    work: Callable[[], Awaitable[Any]],
+    admission: Optional[Admission]
+) -> None:
+    """
+    Run an AI job in its lane and publish job.completed or job.failed on /api/events.
+    
+    Args:
+        job_id: Job created in job_registry
+        kind: Job type
+        lane: Scheduler lane
+        requester: Fair-share key of the caller
+        work: Does the AI processing
+        admission: Admission taken over from the request
+    """
+    try:
+        async with ai_scheduler.slot(lane, requester):
+            job_registry.start(job_id)
+            result = await work()
+        job_registry.complete(job_id, result)
+        publish_event("job.completed", id=job_id, kind=kind)
+    except Exception as e:
+        error = e.detail if isinstance(e, HTTPException) else f"AI processing failed: {str(e)}"
+        logger.error(f"AI job failed - job_id: {job_id}, error: {error}")
+        job_registry.fail(job_id, str(error))
+        publish_event("job.failed", id=job_id, kind=kind, error=str(error))
+    finally:
+        if admission is not None:
+            admission.release()
+
 class ChatRequest(BaseModel):
     """Chat request model."""
     message: str
+    # Skip the answer cache and always ask the model
+    no_cache: bool = False
 
 @router.post("/chat")
 async def chat(
     request: ChatRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    priority: Optional[str] = Query(None, description="Lower the scheduling lane: batch or background"),
+    async_mode: bool = Query(False, alias="async", description="Answer 202 with a job ID instead of waiting"),
     service: GeminiService = Depends(get_gemini_service)
 ):
     """
@@ -24,19 +133,71 @@ async def chat(
     
     Args:
         request: Chat request with message
+        async_mode: Run as a job (poll /api/jobs/{job_id})
         service: GeminiService instance
         
     Returns:
-        Extracted transaction data
+        Extracted transaction data, or the job ID (202) in async mode
     """
+    lane = resolve_lane(INTERACTIVE, priority)
+    if async_mode:
+        return start_ai_job(
+            http_request, background_tasks, "ai_chat", lane,
+            lambda: asyncio.to_thread(service.chat_with_ai, request.message, use_cache=not request.no_cache),
+        )
     try:
-        return service.chat_with_ai(request.message)
+        async with ai_scheduler.slot(lane, get_requester(http_request)):
+            return await asyncio.to_thread(service.chat_with_ai, request.message, use_cache=not request.no_cache)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI processing failed: {str(e)}")
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    priority: Optional[str] = Query(None, description="Lower the scheduling lane: batch or background"),
+    service: GeminiService = Depends(get_gemini_service)
+):
+    """
+    Chat with AI and stream the answer as Server-Sent Events.
+    
+    Emits `delta` events with partial text while the model is generating,
+    then a terminal `result` event with the parsed JSON (same shape as
+    `/chat`), or an `error` event if generation or parsing failed.
+    Cached answers are sent as a single `result` event.
+    
+    Args:
+        request: Chat request with message
+        service: GeminiService instance
+        
+    Returns:
+        text/event-stream response
+    """
+    lane = resolve_lane(INTERACTIVE, priority)
+    requester = get_requester(http_request)
+
+    async def event_stream():
+        try:
+            # The slot is held until the answer has been fully streamed
+            async with ai_scheduler.slot(lane, requester):
+                async for event, payload in service.stream_chat_with_ai(request.message, use_cache=not request.no_cache):
+                    if event == "delta":
+                        yield format_sse({"text": payload}, event="delta")
+                    else:
+                        yield format_sse(payload, event=event)
+        except Exception as e:
+            logger.error(f"[CHAT_STREAM] AI processing failed: {e}")
+            yield format_sse({"detail": f"AI processing failed: {str(e)}"}, event="error")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/ai/process-income-image")
 async def upload_income_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    priority: Optional[str] = Query(None, description="Lower the scheduling lane: batch or background"),
+    async_mode: bool = Query(False, alias="async", description="Answer 202 with a job ID instead of waiting"),
     service: GeminiService = Depends(get_gemini_service)
 ):
     """
@@ -44,13 +205,24 @@ async def upload_income_image(
     
     Args:
         file: Image file to process
+        async_mode: Run as a job (poll /api/jobs/{job_id})
         service: GeminiService instance
         
     Returns:
-        Created transaction with extracted data (status: COMPLETED)
+        Created transaction with extracted data (status: COMPLETED), or the job ID (202) in async mode
     """
+    lane = resolve_lane(INTERACTIVE, priority)
     try:
-        return await service.process_income_image(file)
+        if async_mode:
+            # Store the upload now: the request body is gone once the 202 is sent
+            stored = await save_upload_bounded(file)
+            return start_ai_job(
+                request, background_tasks, "ai_income_image", lane,
+                lambda: service.process_income_image(stored),
+                filename=stored.filename, sha256=stored.sha256,
+            )
+        async with ai_scheduler.slot(lane, get_requester(request)):
+            return await service.process_income_image(file)
     except HTTPException:
         raise
     except Exception as e:
@@ -58,14 +230,28 @@ async def upload_income_image(
 
 @router.post("/ai/process-expense-image")
 async def upload_expense_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    priority: Optional[str] = Query(None, description="Lower the scheduling lane: background"),
+    async_mode: bool = Query(False, alias="async", description="Answer 202 with a job ID instead of waiting"),
     service: GeminiService = Depends(get_gemini_service)
 ):
     """
     Process expense image, extract transaction information, and create transaction immediately.
     """
+    lane = resolve_lane(BATCH, priority)
     try:
-        return await service.process_expense_image(file)
+        if async_mode:
+            # Store the upload now: the request body is gone once the 202 is sent
+            stored = await save_upload_bounded(file)
+            return start_ai_job(
+                request, background_tasks, "ai_expense_image", lane,
+                lambda: service.process_expense_image(stored),
+                filename=stored.filename, sha256=stored.sha256,
+            )
+        async with ai_scheduler.slot(lane, get_requester(request)):
+            return await service.process_expense_image(file)
     except HTTPException:
         raise
     except Exception as e:
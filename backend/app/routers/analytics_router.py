@@ -0,0 +1,251 @@
+"""Analytics router endpoints."""
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query
+from app.core.conditional import conditional_get
+from app.core.tenancy import get_current_fund_id, run_in_fund
+from app.services.allocation_engine import index_to_month, month_to_index
+from app.services.analytics_service import AnalyticsService
+from app.services.balance_snapshot_service import BalanceSnapshotService, take_missing_snapshots
+
+router = APIRouter()
+
+MAX_MONTHLY_RANGE = 240
+DEFAULT_MONTHLY_RANGE = 12
+
+_MONTH_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+# Dependency injection for service
+def get_analytics_service() -> AnalyticsService:
+    """Get AnalyticsService instance."""
+    return AnalyticsService()
+
+def get_balance_snapshot_service() -> BalanceSnapshotService:
+    """Get BalanceSnapshotService instance."""
+    return BalanceSnapshotService()
+
+def _month_range(from_month: Optional[str], to_month: Optional[str]) -> Tuple[str, str]:
+    """Validate a month range, defaulting to the last DEFAULT_MONTHLY_RANGE months."""
+    to_month = to_month or datetime.now().strftime("%Y-%m")
+    if not _MONTH_RE.match(to_month) or (from_month and not _MONTH_RE.match(from_month)):
+        raise HTTPException(status_code=400, detail="Months must use the YYYY-MM format")
+    from_month = from_month or index_to_month(month_to_index(to_month) - DEFAULT_MONTHLY_RANGE + 1)
+    span = month_to_index(to_month) - month_to_index(from_month) + 1
+    if span <= 0:
+        raise HTTPException(status_code=400, detail="to_month must be greater than or equal to from_month")
+    if span > MAX_MONTHLY_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_MONTHLY_RANGE} months")
+    return from_month, to_month
+
+@router.get(
+    "/monthly",
+    response_model=Dict[str, Any],
+    dependencies=[Depends(conditional_get("transactions", "transaction_entries", per_month=True))],
+)
+async def get_monthly_analytics(
+    from_month: Optional[str] = Query(None, description="First month (YYYY-MM), defaults to 11 months before to_month"),
+    to_month: Optional[str] = Query(None, description="Last month (YYYY-MM), defaults to the current month"),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Get income, fund, bonus, expense and net totals per month.
+    
+    Args:
+        from_month: First month (inclusive)
+        to_month: Last month (inclusive)
+        service: AnalyticsService instance
+        
+    Returns:
+        Range, one row per month and range totals
+    """
+    from_month, to_month = _month_range(from_month, to_month)
+    try:
+        return service.get_monthly_series(from_month, to_month)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch monthly analytics: {str(e)}")
+
+balance_etag = conditional_get("transactions", "transaction_entries")
+
+@router.get("/balance", response_model=Dict[str, Any], dependencies=[Depends(balance_etag)])
+async def get_balance(
+    background_tasks: BackgroundTasks,
+    service: BalanceSnapshotService = Depends(get_balance_snapshot_service)
+):
+    """
+    Get the current fund totals (latest balance snapshot plus newer rows).
+    
+    Missing snapshots of closed months are written in the background after the response.
+    
+    Args:
+        background_tasks: FastAPI background tasks
+        service: BalanceSnapshotService instance
+        
+    Returns:
+        Dict with fund_income, bonus_income, total_income, total_expense, balance and snapshot_month
+    """
+    try:
+        balance = service.get_balance()
+        background_tasks.add_task(run_in_fund, get_current_fund_id(), take_missing_snapshots)
+        return balance
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch balance: {str(e)}")
+
+@router.get(
+    "/balance/history",
+    response_model=Dict[str, Any],
+    dependencies=[Depends(conditional_get("transactions", "transaction_entries", per_month=True))],
+)
+async def get_balance_history(
+    from_month: Optional[str] = Query(None, description="First month (YYYY-MM), defaults to 11 months before to_month"),
+    to_month: Optional[str] = Query(None, description="Last month (YYYY-MM), defaults to the current month"),
+    service: BalanceSnapshotService = Depends(get_balance_snapshot_service)
+):
+    """
+    Get the cumulative totals and balance at the end of every month.
+    
+    Args:
+        from_month: First month (inclusive)
+        to_month: Last month (inclusive)
+        service: BalanceSnapshotService instance
+        
+    Returns:
+        Range and one point per month
+    """
+    from_month, to_month = _month_range(from_month, to_month)
+    try:
+        return service.get_balance_history(from_month, to_month)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch balance history: {str(e)}")
+
+@router.post("/balance/snapshots", response_model=Dict[str, Any])
+async def take_balance_snapshots(
+    through_month: Optional[str] = Query(None, description="Last month to snapshot (YYYY-MM), defaults to the last closed month"),
+    service: BalanceSnapshotService = Depends(get_balance_snapshot_service)
+):
+    """
+    Write the missing balance snapshots now instead of after the next balance read.
+    
+    Args:
+        through_month: Last month to snapshot (capped at the last closed month)
+        service: BalanceSnapshotService instance
+        
+    Returns:
+        Number of snapshots written and the latest snapshot
+    """
+    if through_month and not _MONTH_RE.match(through_month):
+        raise HTTPException(status_code=400, detail="Months must use the YYYY-MM format")
+    try:
+        written = service.take_snapshots(through_month)
+        return {"written": len(written), "latest": service.get_latest_snapshot()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to take balance snapshots: {str(e)}")
+
+food_etag = conditional_get("transactions")
+
+@router.get("/food/top-restaurants", response_model=List[Dict[str, Any]], dependencies=[Depends(food_etag)])
+async def get_top_restaurants(
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of restaurants"),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Get the most visited restaurants with visits, spend and last visit.
+    
+    Args:
+        limit: Maximum number of restaurants
+        service: AnalyticsService instance
+        
+    Returns:
+        Restaurants ordered by visits
+    """
+    try:
+        return service.get_top_restaurants(limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch top restaurants: {str(e)}")
+
+@router.get("/food/top-dishes", response_model=List[Dict[str, Any]], dependencies=[Depends(food_etag)])
+async def get_top_dishes(
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of dishes"),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Get the most ordered dishes.
+    
+    Args:
+        limit: Maximum number of dishes
+        service: AnalyticsService instance
+        
+    Returns:
+        Dishes ordered by orders
+    """
+    try:
+        return service.get_top_dishes(limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch top dishes: {str(e)}")
+
+@router.get("/food/restaurant-monthly", response_model=List[Dict[str, Any]], dependencies=[Depends(food_etag)])
+async def get_restaurant_monthly_spend(
+    from_month: Optional[str] = Query(None, description="First month (YYYY-MM)"),
+    to_month: Optional[str] = Query(None, description="Last month (YYYY-MM)"),
+    restaurant: Optional[str] = Query(None, description="Only this restaurant"),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Get spend per restaurant per month.
+    
+    Args:
+        from_month: First month (inclusive)
+        to_month: Last month (inclusive)
+        restaurant: Restaurant name filter
+        service: AnalyticsService instance
+        
+    Returns:
+        Rows of restaurant, month, count and total
+    """
+    for value in (from_month, to_month):
+        if value and not _MONTH_RE.match(value):
+            raise HTTPException(status_code=400, detail="Months must use the YYYY-MM format")
+    try:
+        return service.get_restaurant_monthly_spend(from_month, to_month, restaurant)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch restaurant spend: {str(e)}")
+
+@router.get("/food/last-visits", response_model=List[Dict[str, Any]], dependencies=[Depends(food_etag)])
+async def get_last_visits(
+    limit: int = Query(10, ge=1, le=100, description="Maximum number of restaurants"),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Get restaurants by most recent visit.
+    
+    Args:
+        limit: Maximum number of restaurants
+        service: AnalyticsService instance
+        
+    Returns:
+        Restaurants, most recently visited first
+    """
+    try:
+        return service.get_last_visits(limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch last visits: {str(e)}")
+
+@router.get("/food/suggestions", response_model=Dict[str, List[Dict[str, Any]]], dependencies=[Depends(food_etag)])
+async def get_food_suggestions(
+    top_k: int = Query(3, ge=1, le=20, description="Dishes per group"),
+    service: AnalyticsService = Depends(get_analytics_service)
+):
+    """
+    Get frequent and rarely eaten dishes for the food suggestion slider.
+    
+    Args:
+        top_k: Dishes per group
+        service: AnalyticsService instance
+        
+    Returns:
+        Dict with frequent and rare dishes
+    """
+    try:
+        return service.get_food_suggestions(top_k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch food suggestions: {str(e)}")
@@ -1,6 +1,7 @@
 """Debt router endpoints."""
 from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, HTTPException, Depends, Query
+from app.core.conditional import conditional_get
 from app.models import Debt
 from app.services import DebtService
 
@@ -11,7 +12,7 @@ def get_debt_service() -> DebtService:
     """Get DebtService instance."""
     return DebtService()
 
-@router.get("/", response_model=List[Dict[str, Any]])
+@router.get("/", response_model=List[Dict[str, Any]], dependencies=[Depends(conditional_get("debts", "users"))])
 async def get_debts(
     user_id: Optional[int] = Query(None, description="Filter by user_id"),
     is_fully_paid: Optional[bool] = Query(None, description="Filter by is_fully_paid status"),
@@ -0,0 +1,59 @@
+"""Change feed (Server-Sent Events) endpoints."""
+import asyncio
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.event_bus import DROPPED, event_broker
+from app.core.sse import SSE_HEADERS, format_sse
+
+router = APIRouter()
+
+@router.get("/events")
+async def stream_events():
+    """
+    Subscribe to change notifications as Server-Sent Events.
+
+    Event names: transaction.created, transaction.updated,
+    transaction.status_changed, transaction.deleted, entries.allocated,
+    debt.settled, stats.changed. A write publishes one event per kind
+    however many rows it touched; payloads only carry the ids (or
+    transaction_ids) and affected months, and clients refetch what they
+    display (cheaply, thanks to ETags).
+
+    A `reset` event means the client fell too far behind and was
+    disconnected: it should refetch everything and reconnect.
+
+    Only changes of the requested fund are sent; EventSource cannot set
+    headers, so pass it as `?fund_id=`.
+
+    Returns:
+        text/event-stream response
+    """
+    subscriber = event_broker.subscribe()
+    if subscriber is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many event subscribers",
+            headers={"Retry-After": str(settings.EVENTS_HEARTBEAT_SECONDS)},
+        )
+
+    async def event_stream():
+        try:
+            yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment frame keeps idle connections open through proxies
+                    yield ": ping\n\n"
+                    continue
+
+                if event is DROPPED:
+                    yield format_sse({"reason": "slow_consumer"}, event="reset")
+                    return
+
+                yield format_sse(event["data"] | {"ts": event["ts"]}, event=event["type"], event_id=str(event["id"]))
+        finally:
+            event_broker.unsubscribe(subscriber)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,57 @@
+"""Fund router endpoints."""
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException, Depends
+from app.core.tenancy import get_current_fund_id
+from app.models import FundCreate
+from app.services import FundService
+
+router = APIRouter()
+
+# Dependency injection for service
+def get_fund_service() -> FundService:
+    """Get FundService instance."""
+    return FundService()
+
+@router.get("/current", response_model=Dict[str, Any])
+async def get_current_fund(service: FundService = Depends(get_fund_service)):
+    """
+    Get the fund selected by X-Fund-Id (or the default fund).
+    
+    Args:
+        service: FundService instance
+        
+    Returns:
+        Fund
+    """
+    try:
+        fund = service.get_fund(get_current_fund_id())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch fund: {str(e)}")
+    if not fund:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    return fund
+
+@router.post("/", response_model=Dict[str, Any])
+async def create_fund(
+    fund: FundCreate,
+    service: FundService = Depends(get_fund_service)
+):
+    """
+    Create a new fund; send its id as X-Fund-Id to work on it.
+    
+    Args:
+        fund: Fund data
+        service: FundService instance
+        
+    Returns:
+        Created fund
+    """
+    try:
+        result = service.create_fund(fund)
+        if not result:
+            raise HTTPException(status_code=400, detail="Failed to create fund")
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create fund: {str(e)}")
@@ -0,0 +1,51 @@
+"""Bank statement import endpoints."""
+from typing import Any, Dict
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Query, UploadFile
+from app.core.config import settings
+from app.core.jobs import job_registry
+from app.core.uploads import save_file_bounded
+from app.services.statement_import_service import StatementImportService
+
+router = APIRouter()
+statement_import_service = StatementImportService()
+
+@router.post("/bank-statement", status_code=202, response_model=Dict[str, Any])
+async def import_bank_statement(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False, description="Only report what would be imported"),
+    include_unmatched: bool = Query(False, description="Import money in without a matching member as unassigned income"),
+):
+    """
+    Import a bank statement (CSV, or Excel saved as CSV).
+    
+    The file is stored and processed in the background; poll
+    /api/jobs/{job_id} for progress and the import summary.
+    
+    Args:
+        file: Statement file
+        dry_run: Only report what would be imported
+        include_unmatched: Import unmatched money in as unassigned income
+        
+    Returns:
+        Job ID and initial status
+    """
+    try:
+        upload = await save_file_bounded(file, max_bytes=settings.IMPORT_MAX_BYTES, suffix=".csv")
+        job = job_registry.create(
+            "bank_statement_import",
+            filename=upload.filename,
+            size=upload.size,
+            sha256=upload.sha256,
+            dry_run=dry_run,
+            include_unmatched=include_unmatched,
+        )
+        background_tasks.add_task(
+            statement_import_service.run_job, job["id"], upload.path,
+            dry_run=dry_run, include_unmatched=include_unmatched,
+        )
+        return {"job_id": job["id"], "status": job["status"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing bank statement: {str(e)}")
@@ -0,0 +1,24 @@
+"""Background job status endpoints."""
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException
+from app.core.jobs import job_registry
+from app.core.tenancy import get_current_fund_id
+
+router = APIRouter()
+
+@router.get("/{job_id}", response_model=Dict[str, Any])
+async def get_job(job_id: str):
+    """
+    Get the status, progress and result of a background job.
+    
+    Args:
+        job_id: Job ID returned when the job was started
+        
+    Returns:
+        Job with status PENDING, RUNNING, COMPLETED or FAILED
+    """
+    job = job_registry.get(job_id)
+    # Jobs of other funds are reported as missing
+    if not job or job.get("fund_id") != get_current_fund_id():
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
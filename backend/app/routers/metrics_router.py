@@ -0,0 +1,35 @@
+"""Runtime metrics endpoints."""
+from typing import Any, Dict
+from fastapi import APIRouter
+from app.core.ai_scheduler import ai_scheduler
+from app.core.query_cache import query_cache
+from app.services.model_router import chat_model_router, image_model_router
+
+router = APIRouter()
+
+@router.get("/cache", response_model=Dict[str, Any])
+async def get_cache_metrics():
+    """
+    Get query cache statistics of this worker.
+    
+    Returns:
+        Dict with hits, misses, hit_ratio, entries, evictions and funds per table
+    """
+    return {"query_cache": query_cache.stats()}
+
+@router.get("/ai", response_model=Dict[str, Any])
+async def get_ai_metrics():
+    """
+    Get AI scheduling and model routing statistics of this worker.
+    
+    Returns:
+        Dict with queue depth and wait times per scheduler lane, and latency
+        percentiles, SLO breaches and escalation rate per model tier
+    """
+    return {
+        "scheduler": ai_scheduler.stats(),
+        "model_routers": {
+            model_router.name: model_router.stats()
+            for model_router in (chat_model_router, image_model_router)
+        },
+    }
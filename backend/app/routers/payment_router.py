@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, Request
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, BackgroundTasks, File, HTTPException, Query, Request, UploadFile
+from fastapi.encoders import jsonable_encoder
 from app.services.payos_service import PayOSService
 from app.services.transaction_service import TransactionService
-from app.services.transaction_entry_service import TransactionEntryService
-from app.services.debt_service import DebtService
-from app.services.member_fee_service import MemberFeeService
+from app.services.payment_event_service import PaymentEventService
+from app.services.payment_allocation_service import PaymentAllocationService
+from app.services.reconciliation_service import ReconciliationService
+from app.services.fund_service import FundService
+from app.core.config import settings
+from app.core.jobs import job_registry
+from app.core.tenancy import run_in_fund, use_fund
+from app.core.uploads import save_file_bounded
 from app.models.transaction_model import TransactionCreate
-from app.models.transaction_entry_model import TransactionEntryCreate
 from pydantic import BaseModel
 from datetime import datetime
 import os
@@ -20,9 +26,10 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 payos_service = PayOSService()
 transaction_service = TransactionService()
-transaction_entry_service = TransactionEntryService()
-debt_service = DebtService()
-member_fee_service = MemberFeeService()
+payment_event_service = PaymentEventService()
+payment_allocation_service = PaymentAllocationService()
+reconciliation_service = ReconciliationService()
+fund_service = FundService()
 
 class CreatePaymentRequest(BaseModel):
     amount: int
@@ -74,20 +81,30 @@ async def create_payment(request: CreatePaymentRequest):
         
     return {"checkoutUrl": checkout_url, "orderCode": order_code, "transaction_id": transaction_id}
 
+def _to_payload(verified_data: Any) -> Optional[Dict[str, Any]]:
+    if hasattr(verified_data, "model_dump"):
+        return jsonable_encoder(verified_data.model_dump())
+    if isinstance(verified_data, dict):
+        return jsonable_encoder(verified_data)
+    return None
+
 @router.post("/webhook")
-async def payos_webhook(request: Request):
-    # Use print as backup in case logging isn't configured
-    print("[WEBHOOK] ========== WEBHOOK RECEIVED ==========")
+async def payos_webhook(request: Request, background_tasks: BackgroundTasks):
+    """
+    Receive a PayOS webhook.
+    
+    Only verifies the signature and durably records the event keyed by
+    order_code before acknowledging; allocation to FUND/DEBT entries runs
+    in the background, exactly once per order_code.
+    """
     logger.info("[WEBHOOK] Received webhook request")
     
     try:
         # Webhook verification cần raw body (bytes), không phải JSON parsed
         body_bytes = await request.body()
-        print(f"[WEBHOOK] Webhook body length: {len(body_bytes)} bytes")
         logger.debug(f"[WEBHOOK] Webhook body length: {len(body_bytes)} bytes")
         
         verified_data = payos_service.verify_webhook_data(body_bytes)
-        print(f"[WEBHOOK] Verified webhook data: {verified_data}")
         logger.info(f"[WEBHOOK] Verified webhook data: {verified_data}")
         
         if not verified_data:
@@ -111,217 +128,88 @@ async def payos_webhook(request: Request):
         # Convert order_code sang int nếu là string
         try:
             order_code = int(order_code)
-            print(f"[WEBHOOK] Extracted order_code: {order_code}")
             logger.info(f"[WEBHOOK] Extracted order_code: {order_code}")
         except (ValueError, TypeError) as e:
             logger.error(f"[WEBHOOK] Invalid orderCode format - order_code: {order_code}, error: {e}")
             raise HTTPException(status_code=400, detail="Invalid orderCode format")
         
-        # 1. Tìm transaction theo orderCode
-        print(f"[WEBHOOK] Looking up transaction by order_code: {order_code}")
-        logger.info(f"[WEBHOOK] Looking up transaction by order_code: {order_code}")
-        transaction = transaction_service.get_transaction_by_order_code(order_code)
-        print(f"[WEBHOOK] Found transaction: {transaction}")
-        logger.info(f"[WEBHOOK] Found transaction: {transaction}")
-        
-        if not transaction:
-            logger.error(f"[WEBHOOK] Transaction not found for order_code: {order_code}")
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Transaction not found for orderCode: {order_code}"
-            )
-        
-        transaction_id = transaction.get("id")
-        user_id = transaction.get("user_id")
-        amount = transaction.get("amount")
-        
-        print(f"[WEBHOOK] Transaction details - transaction_id: {transaction_id}, user_id: {user_id}, amount: {amount}")
-        logger.info(f"[WEBHOOK] Transaction details - transaction_id: {transaction_id}, user_id: {user_id}, amount: {amount}")
-        
-        if not user_id:
-            logger.error(f"[WEBHOOK] Transaction missing user_id - transaction_id: {transaction_id}")
-            raise HTTPException(status_code=400, detail="Transaction missing user_id")
-        
-        logger.info(f"[WEBHOOK] Updating transaction status to COMPLETED - transaction_id: {transaction_id}")
-        transaction_update = TransactionCreate(
-            type=transaction.get("type", "INCOME"),
-            amount=amount,
-            user_id=user_id,
-            transaction_date=datetime.now().strftime("%Y-%m-%d"),
-            status="COMPLETED"
-        )
-        updated_transaction = transaction_service.update_transaction(transaction_id, transaction_update)
-        logger.info(f"[WEBHOOK] Transaction updated: {updated_transaction}")
-
-        if not updated_transaction:
-            logger.error(f"[WEBHOOK] Failed to update transaction status - transaction_id: {transaction_id}")
-            raise HTTPException(status_code=500, detail="Failed to update transaction status")
-        
-        # 3. Tạo TransactionEntry cho nhiều tháng
-        logger.info(f"[WEBHOOK] Processing transaction entries - amount: {amount}")
-        if amount and amount > 0:
-            # Lấy tháng hiện tại (YYYY-MM)
-            current_date = datetime.now()
-            current_month_str = current_date.strftime("%Y-%m")
-            current_year, current_month = current_date.year, current_date.month
-            logger.info(f"[WEBHOOK] Current date - year: {current_year}, month: {current_month}, current_month_str: {current_month_str}")
-            
-            # Tìm FUND entry gần nhất của user
-            logger.info(f"[WEBHOOK] Finding latest FUND entry for user_id: {user_id}")
-            latest_fund_entry_query = transaction_entry_service.client.table("transaction_entries").select("period_month").eq("user_id", user_id).in_("type", ["FUND", "EXEMPT"]).order("period_month", desc=True).limit(1)
-            latest_fund_entry_response = latest_fund_entry_query.execute()
-            logger.info(f"[WEBHOOK] Latest FUND entry response: {latest_fund_entry_response.data}")
-            
-            # Xác định tháng bắt đầu đóng quỹ
-            if latest_fund_entry_response.data and len(latest_fund_entry_response.data) > 0:
-                latest_period_month = latest_fund_entry_response.data[0].get("period_month")
-                logger.info(f"[WEBHOOK] Latest FUND period_month: {latest_period_month}")
-                
-                if latest_period_month:
-                    # Tính tháng tiếp theo của FUND entry gần nhất
-                    year, month = latest_period_month.split("-")
-                    start_year, start_month = int(year), int(month)
-                    logger.info(f"[WEBHOOK] Latest FUND entry - year: {start_year}, month: {start_month}")
-                    
-                    # Tính tháng tiếp theo
-                    if start_month == 12:
-                        start_year += 1
-                        start_month = 1
-                    else:
-                        start_month += 1
-                    logger.info(f"[WEBHOOK] Starting payment from - year: {start_year}, month: {start_month}")
-                else:
-                    # Nếu không có period_month, bắt đầu từ tháng 1
-                    start_year, start_month = current_year, 1
-                    logger.info(f"[WEBHOOK] No period_month in latest entry, starting from month 1 - year: {start_year}, month: {start_month}")
-            else:
-                # Không có FUND entry nào, bắt đầu từ tháng 1
-                start_year, start_month = current_year, 1
-                logger.info(f"[WEBHOOK] No FUND entries found, starting from month 1 - year: {start_year}, month: {start_month}")
-            
-            # Tính số tháng cần đóng từ start_month đến current_month
-            remaining_amount = amount
-            months_to_pay = []
-            
-            logger.info(f"[WEBHOOK] Calculating months to pay - start: {start_year}-{start_month:02d}, current: {current_year}-{current_month:02d}, remaining_amount: {remaining_amount}")
-            
-            # Tạo danh sách các tháng cần đóng
-            temp_year, temp_month = start_year, start_month
-            while (temp_year < current_year) or (temp_year == current_year and temp_month <= current_month):
-                month_str = f"{temp_year}-{temp_month:02d}"
-                monthly_fee = member_fee_service.get_monthly_fee(user_id, month_str)
+        # PayOS does not send X-Fund-Id: the payment belongs to the fund of its transaction
+        fund_id = fund_service.get_fund_id_by_order_code(order_code)
+        if fund_id is None:
+            # Keep the delivery as a failed event (listed by /events/replay) instead of acknowledging it silently
+            error = f"Transaction not found for orderCode: {order_code}"
+            with use_fund(settings.DEFAULT_FUND_ID):
+                payment_event_service.record_event(order_code, _to_payload(verified_data))
+                payment_event_service.mark_failed(order_code, error)
+            logger.warning(f"[WEBHOOK] {error}, event recorded as FAILED in fund {settings.DEFAULT_FUND_ID}")
+            return {"success": True, "orderCode": order_code, "status": "FAILED"}
 
-                if monthly_fee <= 0:
-                    months_to_pay.append(month_str)
-                    logger.info(f"[WEBHOOK] Added zero-fee month to pay list: {month_str}, remaining_amount: {remaining_amount}")
+        # 1. Ghi nhận event (idempotent theo order_code) rồi trả 200 ngay, phân bổ chạy nền
+        with use_fund(fund_id):
+            event, is_new = payment_event_service.record_event(order_code, _to_payload(verified_data))
+        logger.info(f"[WEBHOOK] Payment event recorded - order_code: {order_code}, fund_id: {fund_id}, is_new: {is_new}, status: {event.get('status') if event else None}")
 
-                    # Tính tháng tiếp theo
-                    if temp_month == 12:
-                        temp_year += 1
-                        temp_month = 1
-                    else:
-                        temp_month += 1
-                    continue
+        if event and event.get("status") == "APPLIED":
+            logger.info(f"[WEBHOOK] Duplicate delivery for applied order_code: {order_code}, ignoring")
+            return {"success": True, "orderCode": order_code, "status": "APPLIED"}
 
-                if remaining_amount >= monthly_fee:
-                    months_to_pay.append(month_str)
-                    remaining_amount -= monthly_fee
-                    logger.info(f"[WEBHOOK] Added month to pay list: {month_str}, monthly_fee: {monthly_fee}, remaining_amount: {remaining_amount}")
-                    
-                    # Tính tháng tiếp theo
-                    if temp_month == 12:
-                        temp_year += 1
-                        temp_month = 1
-                    else:
-                        temp_month += 1
-                else:
-                    logger.info(f"[WEBHOOK] Insufficient amount to pay next month - remaining_amount: {remaining_amount}, monthly_fee: {monthly_fee}")
-                    break
-            
-            logger.info(f"[WEBHOOK] Total months to pay: {len(months_to_pay)}, months: {months_to_pay}, remaining_amount: {remaining_amount}")
-            
-            # Tạo FUND entries cho các tháng thiếu
-            for period_month in months_to_pay:
-                monthly_fee = member_fee_service.get_monthly_fee(user_id, period_month)
-                logger.info(f"[WEBHOOK] Creating FUND entry - transaction_id: {transaction_id}, user_id: {user_id}, period_month: {period_month}, amount: {monthly_fee}")
-                transaction_entry_fund_data = TransactionEntryCreate(
-                    transaction_id=transaction_id,
-                    user_id=user_id,
-                    amount=monthly_fee,
-                    type="FUND",
-                    period_month=period_month
-                )
-                created_entry = transaction_entry_service.create_transaction_entry(transaction_entry_fund_data)
-                logger.info(f"[WEBHOOK] FUND entry created: {created_entry}")
-            
-            # Sau khi đóng các tháng thiếu, xử lý phần dư
-            if remaining_amount > 0:
-                logger.info(f"[WEBHOOK] Processing remaining amount: {remaining_amount}")
-                
-                logger.info(f"[WEBHOOK] Checking for unpaid debt - user_id: {user_id}")
-                debt = debt_service.get_unpaid_debt(user_id)
-                logger.info(f"[WEBHOOK] Debt found: {debt}")
-                
-                if debt and remaining_amount >= debt.get("amount"):
-                    debt_amount = debt.get("amount")
-                    logger.info(f"[WEBHOOK] Paying debt - debt_id: {debt.get('id')}, debt_amount: {debt_amount}, remaining_amount: {remaining_amount}")
-                    
-                    # Ưu tiên thanh toán debt
-                    transaction_entry_debt_data = TransactionEntryCreate(
-                        transaction_id=transaction_id,
-                        debt_id=int(debt.get("id")),
-                        user_id=user_id,
-                        amount=debt_amount,
-                        type="DEBT",
-                        period_month=current_month_str
-                    )
-                    created_debt_entry = transaction_entry_service.create_transaction_entry(transaction_entry_debt_data)
-                    logger.info(f"[WEBHOOK] DEBT entry created: {created_debt_entry}")
-                    
-                    # Update debt to fully paid
-                    debt_id = debt.get("id")
-                    if debt_id:
-                        logger.info(f"[WEBHOOK] Updating debt to fully paid - debt_id: {debt_id}")
-                        debt_service.update(debt_id, {"is_fully_paid": True})
-                        logger.info(f"[WEBHOOK] Debt updated to fully paid")
-                    
-                    remaining_amount -= debt_amount
-                    logger.info(f"[WEBHOOK] Remaining amount after debt payment: {remaining_amount}")
-                else:
-                    if debt:
-                        logger.info(f"[WEBHOOK] Debt exists but insufficient amount - debt_amount: {debt.get('amount')}, remaining_amount: {remaining_amount}")
-                    else:
-                        logger.info(f"[WEBHOOK] No unpaid debt found")
-                
-                # Nếu còn dư đủ mức phí tháng tiếp theo, tạo FUND entry cho tháng tiếp theo
-                next_year = current_year + 1 if current_month == 12 else current_year
-                next_month = 1 if current_month == 12 else current_month + 1
-                next_period_month = f"{next_year}-{next_month:02d}"
-                next_monthly_fee = member_fee_service.get_monthly_fee(user_id, next_period_month)
+        background_tasks.add_task(run_in_fund, fund_id, payment_allocation_service.apply_event, order_code)
 
-                if next_monthly_fee <= 0 or remaining_amount >= next_monthly_fee:
-                    # Tính tháng tiếp theo sau current_month
-                    logger.info(f"[WEBHOOK] Creating FUND entry for next month - period_month: {next_period_month}, amount: {next_monthly_fee}")
-                    transaction_entry_fund_data = TransactionEntryCreate(
-                        transaction_id=transaction_id,
-                        user_id=user_id,
-                        amount=next_monthly_fee,
-                        type="FUND",
-                        period_month=next_period_month
-                    )
-                    created_next_entry = transaction_entry_service.create_transaction_entry(transaction_entry_fund_data)
-                    logger.info(f"[WEBHOOK] Next month FUND entry created: {created_next_entry}")
-                    
-                    remaining_amount -= next_monthly_fee
-                    logger.info(f"[WEBHOOK] Final remaining amount: {remaining_amount}")
-                else:
-                    logger.info(f"[WEBHOOK] Remaining amount ({remaining_amount}) is less than next monthly fee ({next_monthly_fee}), no further entries created")
-        
-        logger.info(f"[WEBHOOK] Payment processing completed successfully - order_code: {order_code}, transaction_id: {transaction_id}")
-        print(f"[WEBHOOK] ========== WEBHOOK COMPLETED SUCCESSFULLY ==========")
-        return {"success": True, "orderCode": order_code, "transaction_id": transaction_id}
+        return {"success": True, "orderCode": order_code, "status": "RECEIVED"}
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"[WEBHOOK] ERROR: {str(e)}"
-        print(error_msg)
         logger.error(error_msg, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Webhook processing error: {str(e)}")
+
+@router.post("/events/replay")
+async def replay_payment_events(
+    order_code: Optional[int] = Query(None, description="Replay a single event; omit to replay every pending/stuck event"),
+    limit: int = Query(100, description="Maximum number of events to replay"),
+):
+    """
+    Re-apply payment events that were never applied (failed or stuck).
+    
+    Args:
+        order_code: Optional single order code
+        limit: Maximum number of events
+        
+    Returns:
+        Outcome per event
+    """
+    try:
+        if order_code is not None:
+            return [payment_allocation_service.apply_event(order_code)]
+        return payment_allocation_service.replay_pending(limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to replay payment events: {str(e)}")
+
+@router.post("/reconcile", status_code=202)
+async def reconcile_payments(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False, description="Only report the matches"),
+):
+    """
+    Complete PENDING payments that never received a webhook, from a bank statement CSV.
+    
+    Runs in the background; poll /api/jobs/{job_id} for the matched,
+    unmatched lines and unmatched pending payments.
+    
+    Args:
+        file: Statement file (CSV, or Excel saved as CSV)
+        dry_run: Only report the matches
+        
+    Returns:
+        Job ID and initial status
+    """
+    try:
+        upload = await save_file_bounded(file, max_bytes=settings.IMPORT_MAX_BYTES, suffix=".csv")
+        job = job_registry.create("payment_reconciliation", filename=upload.filename, sha256=upload.sha256, dry_run=dry_run)
+        background_tasks.add_task(reconciliation_service.run_job, job["id"], upload.path, dry_run=dry_run)
+        return {"job_id": job["id"], "status": job["status"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start reconciliation: {str(e)}")
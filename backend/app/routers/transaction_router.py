@@ -1,9 +1,12 @@
 """Transaction router endpoints."""
 from typing import List, Dict, Any
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
 from pydantic import BaseModel
+from app.core.conditional import conditional_get
+from app.core.tenancy import get_current_fund_id, run_in_fund
 from app.models import Transaction, TransactionCreate, TransactionFilters
 from app.services import TransactionService
+from app.services.balance_snapshot_service import take_missing_snapshots
 
 router = APIRouter()
 
@@ -12,7 +15,7 @@ def get_transaction_service() -> TransactionService:
     """Get TransactionService instance."""
     return TransactionService()
 
-@router.get("/", response_model=list[Transaction])
+@router.get("/", response_model=list[Transaction], dependencies=[Depends(conditional_get("transactions", "users"))])
 async def get_transactions(
     filters: TransactionFilters = Depends(),
     service: TransactionService = Depends(get_transaction_service)
@@ -65,7 +68,7 @@ async def create_transaction(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create transaction: {str(e)}")
 
-@router.get("/get-all-incomes", response_model=List[Dict[str, Any]])
+@router.get("/get-all-incomes", response_model=List[Dict[str, Any]], dependencies=[Depends(conditional_get("transactions", "users"))])
 async def get_all_incomes(
     filters: TransactionFilters = Depends(),
     service: TransactionService = Depends(get_transaction_service)
@@ -88,20 +91,26 @@ async def get_all_incomes(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch incomes: {str(e)}")
 
-@router.get("/dashboard-stats", response_model=Dict[str, Any])
+@router.get("/dashboard-stats", response_model=Dict[str, Any], dependencies=[Depends(conditional_get("transactions", "transaction_entries"))])
 async def get_dashboard_stats(
+    background_tasks: BackgroundTasks,
     service: TransactionService = Depends(get_transaction_service)
 ):
     """
     Get dashboard statistics.
     
+    Missing balance snapshots of closed months are written in the background after the response.
+    
     Args:
+        background_tasks: FastAPI background tasks
         service: TransactionService instance
         
     Returns:
         Dict with total_income, total_expense, and balance
     """
     try:
-        return service.get_dashboard_stats()
+        stats = service.get_dashboard_stats()
+        background_tasks.add_task(run_in_fund, get_current_fund_id(), take_missing_snapshots)
+        return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch dashboard stats: {str(e)}")
\ No newline at end of file
@@ -1,17 +1,23 @@
 """User router endpoints."""
 from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, HTTPException, Depends, Query
+from app.core.conditional import conditional_get
 from app.models import User, UserCreate
 from app.services import UserService
 
 router = APIRouter()
 
+# Contribution views read these tables and depend on the current month
+contributions_etag = conditional_get("users", "transaction_entries", "debts", "member_fee_schedules", per_month=True)
+
+MAX_MATRIX_YEARS = 20
+
 # Dependency injection for service
 def get_user_service() -> UserService:
     """Get UserService instance."""
     return UserService()
 
-@router.get("/", response_model=list[User])
+@router.get("/", response_model=list[User], dependencies=[Depends(conditional_get("users"))])
 async def get_users(service: UserService = Depends(get_user_service)):
     """
     Get all users.
@@ -28,7 +34,7 @@ async def get_users(service: UserService = Depends(get_user_service)):
         raise HTTPException(status_code=500, detail=f"Failed to fetch users: {str(e)}")
 
 
-@router.get("/get-users-with-contributions", response_model=List[Dict[str, Any]])
+@router.get("/get-users-with-contributions", response_model=List[Dict[str, Any]], dependencies=[Depends(contributions_etag)])
 async def get_users_with_contributions(
     year: Optional[int] = Query(None, description="Filter transactions by year (e.g., 2024)"),
     service: UserService = Depends(get_user_service)
@@ -48,6 +54,34 @@ async def get_users_with_contributions(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch users with contributions: {str(e)}")
 
+@router.get("/contribution-matrix", response_model=Dict[str, Any], dependencies=[Depends(contributions_etag)])
+async def get_contribution_matrix(
+    from_year: int = Query(..., description="First year of the range (e.g., 2024)"),
+    to_year: Optional[int] = Query(None, description="Last year of the range, defaults to from_year"),
+    service: UserService = Depends(get_user_service)
+):
+    """
+    Get the per-user, per-month contribution grid for a range of years.
+    
+    Args:
+        from_year: First year (inclusive)
+        to_year: Last year (inclusive)
+        service: UserService instance
+        
+    Returns:
+        Columnar grid: month axis once, per-user status/paid/fee/shortfall arrays
+    """
+    to_year = to_year or from_year
+    if to_year < from_year:
+        raise HTTPException(status_code=400, detail="to_year must be greater than or equal to from_year")
+    if to_year - from_year >= MAX_MATRIX_YEARS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_MATRIX_YEARS} years")
+
+    try:
+        return service.get_contribution_matrix(from_year=from_year, to_year=to_year)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch contribution matrix: {str(e)}")
+
 @router.post("/", response_model=User)
 async def create_user(
     user: UserCreate,
@@ -3,3 +3,4 @@ from .gemini_service import GeminiService
 from .user_service import UserService
 from .debt_service import DebtService
 from .member_fee_service import MemberFeeService
+from .fund_service import FundService
@@ -0,0 +1,225 @@
+"""
+Pure ledger allocation engine.
+
+Turns payments into transaction_entries rows (FUND months, DEBT settlement,
+prepaid next month) without touching the database. Callers preload fee
+schedules, existing FUND/EXEMPT entries and unpaid debts, so a batch of any
+size is allocated with a fixed number of queries.
+
+Months are handled as integers (year * 12 + month - 1) so walking a range is
+plain arithmetic.
+"""
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.constants import MONTHLY_FEE
+
+
+def month_to_index(period_month: str) -> int:
+    """Convert YYYY-MM to a month index."""
+    year, month = period_month[:7].split("-")
+    return int(year) * 12 + int(month) - 1
+
+
+def index_to_month(month_index: int) -> str:
+    """Convert a month index back to YYYY-MM."""
+    year, month = divmod(month_index, 12)
+    return f"{year}-{month + 1:02d}"
+
+
+def default_start_for(date: str) -> str:
+    """
+    First month a member without any FUND/EXEMPT entry owes, for a payment made on a date.
+
+    Every payment path (webhook, image, statement import, rebuild) uses
+    this rule, so replaying a payment gives the entries it was booked with.
+
+    Args:
+        date: Payment date or month (YYYY-MM[-DD])
+
+    Returns:
+        January of that year (YYYY-MM)
+    """
+    return f"{date[:4]}-01"
+
+
+@dataclass(frozen=True)
+class Payment:
+    """A payment to allocate."""
+    transaction_id: int
+    user_id: int
+    amount: int
+    # Month treated as "now": arrears are paid up to it, then one month ahead
+    as_of_month: str
+
+
+@dataclass
+class AllocationResult:
+    """Entries to insert and debts to settle for a batch of payments."""
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    settled_debt_ids: List[int] = field(default_factory=list)
+    # Amount left unallocated per transaction
+    remaining: Dict[int, int] = field(default_factory=dict)
+    # Fee of the first due month a payment could not cover, per transaction
+    insufficient_fee: Dict[int, int] = field(default_factory=dict)
+
+    def entries_for(self, transaction_id: int) -> List[Dict[str, Any]]:
+        return [entry for entry in self.entries if entry["transaction_id"] == transaction_id]
+
+
+class FeeTable:
+    """Monthly fee lookup built once from member_fee_schedules rows."""
+
+    def __init__(self, schedules: Iterable[Dict[str, Any]], default_fee: int = MONTHLY_FEE):
+        self.default_fee = default_fee
+        by_user: Dict[int, List[Tuple[Tuple[str, str, int], int, Optional[int], int]]] = defaultdict(list)
+        for schedule in schedules:
+            effective_from = schedule.get("effective_from_month")
+            if not schedule.get("user_id") or not effective_from:
+                continue
+            effective_to = schedule.get("effective_to_month")
+            monthly_fee = schedule.get("monthly_fee")
+            by_user[schedule["user_id"]].append((
+                (effective_from, schedule.get("created_at") or "", schedule.get("id") or 0),
+                month_to_index(effective_from),
+                month_to_index(effective_to) if effective_to else None,
+                int(monthly_fee) if monthly_fee is not None else default_fee,
+            ))
+
+        # Latest-effective schedule first, same precedence as MemberFeeService.get_monthly_fee
+        self._schedules = {
+            user_id: [(start, end, fee) for _, start, end, fee in sorted(rows, key=lambda row: row[0], reverse=True)]
+            for user_id, rows in by_user.items()
+        }
+        self._memo: Dict[Tuple[int, int], int] = {}
+
+    def fee(self, user_id: int, month_index: int) -> int:
+        """Get the fee of a member for a month index."""
+        key = (user_id, month_index)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+
+        fee = self.default_fee
+        for start, end, schedule_fee in self._schedules.get(user_id, ()):
+            if start <= month_index and (end is None or end >= month_index):
+                fee = schedule_fee
+                break
+        self._memo[key] = fee
+        return fee
+
+
+def latest_paid_months(entries: Iterable[Dict[str, Any]]) -> Dict[int, int]:
+    """
+    Get the latest FUND/EXEMPT month index of every member.
+
+    Args:
+        entries: transaction_entries rows (at least user_id, type, period_month)
+
+    Returns:
+        Dict of user_id -> month index
+    """
+    latest: Dict[int, int] = {}
+    for entry in entries:
+        if entry.get("type") not in ("FUND", "EXEMPT") or not entry.get("period_month"):
+            continue
+        user_id = entry.get("user_id")
+        month_index = month_to_index(entry["period_month"])
+        if month_index > latest.get(user_id, -1):
+            latest[user_id] = month_index
+    return latest
+
+
+def allocate_payments(
+    payments: Iterable[Payment],
+    fee_schedules: Iterable[Dict[str, Any]],
+    existing_entries: Iterable[Dict[str, Any]],
+    unpaid_debts: Iterable[Dict[str, Any]],
+    default_fee: int = MONTHLY_FEE,
+) -> AllocationResult:
+    """
+    Allocate a batch of payments.
+
+    Payments are applied in the given order (pass them chronologically) and
+    each one sees the state left by the previous ones: months already paid,
+    debts already settled. Rules per payment:
+
+    1. Pay FUND months from the month after the member's latest FUND/EXEMPT
+       entry (default_start_for(as_of_month) without one) up to as_of_month,
+       while the remaining amount covers the fee (zero-fee months are always taken).
+    2. With money left, settle the member's oldest unpaid debt if it is fully covered.
+    3. With money left, prepay the month after as_of_month if not already paid.
+
+    Args:
+        payments: Payments to allocate
+        fee_schedules: member_fee_schedules rows of the members involved
+        existing_entries: Existing FUND/EXEMPT entries of the members involved
+        unpaid_debts: Unpaid debts of the members involved
+        default_fee: Fee when no schedule applies
+
+    Returns:
+        AllocationResult with the rows to insert and the debts to settle
+    """
+    fees = FeeTable(fee_schedules, default_fee)
+    latest = latest_paid_months(existing_entries)
+
+    debts_by_user: Dict[int, Deque[Dict[str, Any]]] = defaultdict(deque)
+    for debt in sorted(unpaid_debts, key=lambda debt: (debt.get("created_at") or "", debt.get("id") or 0)):
+        if debt.get("user_id") and not debt.get("is_fully_paid"):
+            debts_by_user[debt["user_id"]].append(debt)
+
+    result = AllocationResult()
+    for payment in payments:
+        user_id = payment.user_id
+        remaining = payment.amount or 0
+        current_index = month_to_index(payment.as_of_month)
+
+        if user_id in latest:
+            month_index = latest[user_id] + 1
+        else:
+            month_index = month_to_index(default_start_for(payment.as_of_month))
+
+        # 1. Arrears up to the current month
+        while month_index <= current_index:
+            fee = fees.fee(user_id, month_index)
+            if fee > 0 and remaining < fee:
+                result.insufficient_fee[payment.transaction_id] = fee
+                break
+            result.entries.append(_entry(payment, "FUND", fee, index_to_month(month_index)))
+            remaining -= max(fee, 0)
+            latest[user_id] = month_index
+            month_index += 1
+
+        if remaining > 0:
+            # 2. Oldest unpaid debt, only when fully covered
+            debts = debts_by_user.get(user_id)
+            if debts and remaining >= (debts[0].get("amount") or 0):
+                debt = debts.popleft()
+                result.entries.append(_entry(payment, "DEBT", debt.get("amount") or 0, payment.as_of_month, debt_id=int(debt["id"])))
+                result.settled_debt_ids.append(int(debt["id"]))
+                remaining -= debt.get("amount") or 0
+
+            # 3. Prepay next month
+            next_index = current_index + 1
+            next_fee = fees.fee(user_id, next_index)
+            arrears_cleared = month_index > current_index
+            if arrears_cleared and latest.get(user_id, -1) < next_index and (next_fee <= 0 or remaining >= next_fee):
+                result.entries.append(_entry(payment, "FUND", next_fee, index_to_month(next_index)))
+                remaining -= max(next_fee, 0)
+                latest[user_id] = next_index
+
+        result.remaining[payment.transaction_id] = remaining
+
+    return result
+
+
+def _entry(payment: Payment, type: str, amount: int, period_month: str, debt_id: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        "transaction_id": payment.transaction_id,
+        "debt_id": debt_id,
+        "user_id": payment.user_id,
+        "amount": amount,
+        "type": type,
+        "period_month": period_month,
+    }
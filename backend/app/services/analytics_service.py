@@ -0,0 +1,280 @@
+"""Server-side bucketed analytics for dashboard charts."""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.invalidation import Invalidation, invalidation_bus
+from app.core.tenancy import FundLocal
+from app.core.text import normalize_text
+from app.services.allocation_engine import index_to_month, month_to_index
+from app.services.base_service import BaseService
+from app.services.food_rollup import food_rollup
+
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_FIELDS = ("income", "fund", "bonus", "expense")
+
+# Invalidation name of writes that change the totals of some months (keys: dates or months)
+LEDGER_MONTHS = "ledger_months"
+
+# Totals of closed months, keyed by YYYY-MM, one cache per fund. A month is
+# closed once it is in the past; its totals only change through backdated
+# writes, which call invalidate_analytics_months.
+closed_month_cache: FundLocal[TTLCache] = FundLocal(
+    lambda: TTLCache(
+        max_entries=settings.ANALYTICS_CACHE_MAX_MONTHS,
+        ttl=settings.ANALYTICS_CLOSED_MONTH_TTL_SECONDS or None,
+    ),
+    max_funds=settings.FUND_CACHE_MAX_FUNDS,
+)
+
+
+def ledger_date(transaction: Dict[str, Any]) -> str:
+    """Date a transaction counts on; rows saved without a transaction_date count from their creation."""
+    return (transaction.get("transaction_date") or transaction.get("created_at") or "")[:10]
+
+
+def dated_between(start_date: Optional[str], end_date: Optional[str] = None) -> str:
+    """
+    PostgREST or-filter selecting transactions whose ledger_date is in [start_date, end_date).
+
+    Args:
+        start_date: First date (YYYY-MM-DD), None for no lower bound
+        end_date: Date after the last one, None for no upper bound
+
+    Returns:
+        Filter for query.or_()
+    """
+    def bounds(column: str) -> List[str]:
+        return ([f"{column}.gte.{start_date}"] if start_date else []) + ([f"{column}.lt.{end_date}"] if end_date else [])
+
+    dated = bounds("transaction_date") or ["transaction_date.not.is.null"]
+    return f"and({','.join(dated)}),and({','.join(['transaction_date.is.null', *bounds('created_at')])})"
+
+
+def invalidate_analytics_months(months: Optional[Iterable[Optional[str]]] = None) -> None:
+    """
+    Drop cached monthly totals after a write.
+
+    Args:
+        months: Dates or months (YYYY-MM[-DD]) touched by the write; None clears everything
+    """
+    if months is None:
+        closed_month_cache.clear()
+        return
+    for month in months:
+        if month:
+            closed_month_cache.delete(month[:7])
+
+
+def _on_invalidation(invalidation: Invalidation) -> None:
+    if LEDGER_MONTHS in invalidation.names:
+        invalidate_analytics_months(invalidation.keys)
+
+
+invalidation_bus.subscribe(_on_invalidation)
+
+
+class AnalyticsService(BaseService):
+    """Monthly income/expense series and food expense rankings."""
+
+    def __init__(self):
+        super().__init__(table_name="transactions")
+
+    def get_monthly_series(self, from_month: str, to_month: str) -> Dict[str, Any]:
+        """
+        Get per-month totals for a range of months.
+
+        - income: COMPLETED INCOME transactions (members and bonus) by transaction date
+        - fund: FUND entries by the month they pay for
+        - bonus: COMPLETED INCOME without a member by transaction date
+        - expense: EXPENSE transactions by transaction date
+        - net: fund + bonus - expense, the same definition as the dashboard balance
+
+        Closed months come from closed_month_cache after their first computation;
+        the current month (and any future month) is always recomputed.
+
+        Args:
+            from_month: First month (YYYY-MM)
+            to_month: Last month (YYYY-MM), inclusive
+
+        Returns:
+            Dict with the range, one row per month and the range totals
+        """
+        first, last = month_to_index(from_month), month_to_index(to_month)
+        current = month_to_index(datetime.now().strftime("%Y-%m"))
+        months = [index_to_month(index) for index in range(first, last + 1)]
+
+        totals_by_month: Dict[str, Dict[str, int]] = {}
+        to_compute: List[str] = []
+        for index, month in zip(range(first, last + 1), months):
+            cached = closed_month_cache.get(month) if index < current else None
+            if cached is not None:
+                totals_by_month[month] = cached
+            else:
+                to_compute.append(month)
+
+        if to_compute:
+            computed = self._compute_months(to_compute[0], to_compute[-1])
+            for month in to_compute:
+                totals = computed.get(month) or dict.fromkeys(MONTHLY_FIELDS, 0)
+                totals_by_month[month] = totals
+                if month_to_index(month) < current:
+                    closed_month_cache.set(month, totals)
+            logger.info("Monthly analytics computed %d month(s), %d from cache", len(to_compute), len(months) - len(to_compute))
+
+        rows = [self._with_net({"month": month, **totals_by_month[month]}) for month in months]
+        range_totals = {field: sum(row[field] for row in rows) for field in MONTHLY_FIELDS}
+        return {
+            "from_month": from_month,
+            "to_month": to_month,
+            "months": rows,
+            "totals": self._with_net(range_totals),
+        }
+
+    def _compute_months(self, from_month: str, to_month: str) -> Dict[str, Dict[str, int]]:
+        """One paginated read per table over the span, bucketed by month in memory."""
+        start_date = f"{from_month}-01"
+        end_date = f"{index_to_month(month_to_index(to_month) + 1)}-01"
+        totals: Dict[str, Dict[str, int]] = {}
+
+        def bucket(month: str) -> Dict[str, int]:
+            return totals.setdefault(month, dict.fromkeys(MONTHLY_FIELDS, 0))
+
+        transactions = self._fetch_all_pages(
+            lambda: self.client.table(self.table_name)
+            .select("id, type, amount, user_id, status, transaction_date, created_at")
+            .or_(dated_between(start_date, end_date))
+            .gt("amount", 0)
+            .order("id")
+        )
+        for transaction in transactions:
+            month = ledger_date(transaction)[:7]
+            if not month:
+                continue
+            amount = transaction.get("amount") or 0
+            if transaction.get("type") == "EXPENSE":
+                bucket(month)["expense"] += amount
+            elif transaction.get("type") == "INCOME" and transaction.get("status") == "COMPLETED":
+                bucket(month)["income"] += amount
+                if transaction.get("user_id") is None:
+                    bucket(month)["bonus"] += amount
+
+        entries = self._fetch_all_pages(
+            lambda: self.client.table("transaction_entries")
+            .select("id, amount, period_month")
+            .eq("type", "FUND")
+            .gte("period_month", from_month)
+            .lte("period_month", to_month)
+            .order("id")
+        )
+        for entry in entries:
+            if entry.get("period_month"):
+                bucket(entry["period_month"][:7])["fund"] += entry.get("amount") or 0
+
+        return totals
+
+    def get_top_restaurants(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get the most visited restaurants.
+        
+        Args:
+            limit: Maximum number of restaurants
+            
+        Returns:
+            Restaurants ordered by visits, then spend
+        """
+        restaurants = food_rollup.restaurants()
+        restaurants.sort(key=lambda item: (item["count"], item["total"], item["last_at"]), reverse=True)
+        return restaurants[:limit]
+
+    def get_top_dishes(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get the most ordered dishes.
+        
+        Args:
+            limit: Maximum number of dishes
+            
+        Returns:
+            Dishes ordered by orders, then most recent
+        """
+        dishes = food_rollup.dishes()
+        dishes.sort(key=lambda item: (item["count"], item["last_at"]), reverse=True)
+        return dishes[:limit]
+
+    def get_restaurant_monthly_spend(
+        self,
+        from_month: Optional[str] = None,
+        to_month: Optional[str] = None,
+        restaurant: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get spend per restaurant per month.
+        
+        Args:
+            from_month: First month (YYYY-MM)
+            to_month: Last month (YYYY-MM)
+            restaurant: Only this restaurant (case and accent insensitive)
+            
+        Returns:
+            Rows of restaurant, month, count and total ordered by month then spend
+        """
+        rows = food_rollup.restaurant_months(from_month, to_month)
+        if restaurant:
+            key = normalize_text(restaurant)
+            rows = [row for row in rows if row["key"] == key]
+        rows.sort(key=lambda row: (row["month"], -row["total"]))
+        return rows
+
+    def get_last_visits(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get restaurants by most recent visit.
+        
+        Args:
+            limit: Maximum number of restaurants
+            
+        Returns:
+            Restaurants with last_at, most recent first
+        """
+        restaurants = food_rollup.restaurants()
+        restaurants.sort(key=lambda item: item["last_at"], reverse=True)
+        return restaurants[:limit]
+
+    def get_food_suggestions(self, top_k: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get dishes to suggest: often eaten, and rarely / long ago eaten.
+        
+        Same rules as the dashboard slider: frequent dishes (eaten more than
+        once) by count then recency; rare ones among the rest by count then
+        oldest first visit.
+        
+        Args:
+            top_k: Dishes per group
+            
+        Returns:
+            Dict with frequent and rare dishes
+        """
+        dishes = food_rollup.dishes()
+        frequent = sorted(
+            (dish for dish in dishes if dish["count"] > 1),
+            key=lambda dish: (-dish["count"], _negate_day(dish["last_at"])),
+        )[:top_k]
+        frequent_keys = {dish["key"] for dish in frequent}
+        rare = sorted(
+            (dish for dish in dishes if dish["key"] not in frequent_keys),
+            key=lambda dish: (dish["count"], dish["first_at"]),
+        )[:top_k]
+        return {"frequent": frequent, "rare": rare}
+
+    @staticmethod
+    def _with_net(row: Dict[str, Any]) -> Dict[str, Any]:
+        row["net"] = row["fund"] + row["bonus"] - row["expense"]
+        return row
+
+
+def _negate_day(day: str) -> int:
+    # Sort key for "most recent first" inside an ascending sort
+    return -int(day.replace("-", "") or 0)
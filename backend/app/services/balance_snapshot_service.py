@@ -0,0 +1,286 @@
+"""Cumulative monthly balance snapshots: balance = latest snapshot + newer rows."""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.invalidation import Invalidation, invalidation_bus
+from app.core.table_versions import table_versions
+from app.core.tenancy import get_current_fund_id
+from app.services.allocation_engine import index_to_month, month_to_index
+from app.services.analytics_service import LEDGER_MONTHS, AnalyticsService, dated_between
+from app.services.base_service import BaseService
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = ("fund_income", "bonus_income", "total_income", "total_expense", "balance")
+
+# Writes that change what a snapshot sums up
+SNAPSHOT_DEPENDENCIES = ("transactions", "transaction_entries", LEDGER_MONTHS)
+
+# Funds whose snapshots are being written in the background, so concurrent reads start one job
+_snapshotting: Set[int] = set()
+# Last closed month each fund is known to have every snapshot for, until a ledger write
+_complete_through: Dict[int, str] = {}
+_snapshotting_lock = threading.Lock()
+
+
+def last_closed_month() -> str:
+    return index_to_month(month_to_index(datetime.now().strftime("%Y-%m")) - 1)
+
+
+def invalidate_balance_snapshots(months: Optional[Iterable[str]] = None) -> None:
+    """
+    Delete snapshots made stale by a write, so they are recomputed after the next read.
+
+    Snapshots only exist for closed months, so writes dated in the current
+    month cost nothing; a backdated write deletes the snapshots from its month on.
+
+    Args:
+        months: Dates or months touched by the write; None deletes every snapshot
+    """
+    if months is not None:
+        months = [month[:7] for month in months if month]
+        if not months or min(months) > last_closed_month():
+            return
+    BalanceSnapshotService().delete_snapshots(from_month=min(months) if months else None)
+
+
+def _on_invalidation(invalidation: Invalidation) -> None:
+    if LEDGER_MONTHS in invalidation.names:
+        _complete_through.pop(invalidation.fund_id, None)
+
+
+invalidation_bus.subscribe(_on_invalidation)
+
+
+def take_missing_snapshots() -> None:
+    """
+    Month close for the current fund, run off the read path (background task after a balance read).
+
+    Costs nothing while the fund's snapshots are known to be complete, and
+    does nothing while another call for the same fund is running.
+    """
+    fund_id = get_current_fund_id()
+    closed = last_closed_month()
+    with _snapshotting_lock:
+        if _complete_through.get(fund_id) == closed or fund_id in _snapshotting:
+            return
+        _snapshotting.add(fund_id)
+    try:
+        service = BalanceSnapshotService()
+        service.take_snapshots()
+        latest = service.get_latest_snapshot()
+        if latest and latest["period_month"] >= closed:
+            with _snapshotting_lock:
+                _complete_through[fund_id] = closed
+    except Exception as e:
+        logger.warning("Failed to take balance snapshots - fund_id: %s, error: %s", fund_id, e, exc_info=True)
+    finally:
+        with _snapshotting_lock:
+            _snapshotting.discard(fund_id)
+
+
+class BalanceSnapshotService(BaseService):
+    """
+    Monthly snapshots of cumulative fund income, bonus income, expense and balance.
+
+    Totals follow the dashboard definitions: income is FUND entries (by the
+    month they pay for) plus income without a member, expense is every
+    EXPENSE transaction, each counted on its transaction_date (created_at
+    when it has none). A snapshot for month M covers everything up to the
+    end of M. Snapshots of closed months are written by the snapshot_balance
+    job, on demand, or in the background after balance reads
+    (take_missing_snapshots); reads never wait for them.
+    """
+
+    def __init__(self):
+        super().__init__(table_name="balance_snapshots")
+        self.analytics_service = AnalyticsService()
+
+    def get_latest_snapshot(self, before_month: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get the most recent snapshot, optionally strictly before a month.
+
+        Args:
+            before_month: Month (YYYY-MM) the snapshot must precede
+
+        Returns:
+            Snapshot or None
+        """
+        query = self.client.table(self.table_name).select("*")
+        if before_month:
+            query = query.lt("period_month", before_month)
+        response = query.order("period_month", desc=True).limit(1).execute()
+        return self._get_first_item(response.data)
+
+    def take_snapshots(self, through_month: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Write the missing snapshots up to a closed month.
+
+        Continues from the latest snapshot, so only the months after it are
+        read; the very first call reads the fund history once.
+
+        Args:
+            through_month: Last month to snapshot (defaults to, and is capped at, the last closed month)
+
+        Returns:
+            Written snapshots
+        """
+        closed = last_closed_month()
+        through = min(through_month or closed, closed)
+        versions = table_versions.snapshot(SNAPSHOT_DEPENDENCIES)
+        latest = self.get_latest_snapshot()
+        if latest and latest["period_month"] >= through:
+            return []
+
+        if latest:
+            start = index_to_month(month_to_index(latest["period_month"]) + 1)
+            running = {field: latest.get(field) or 0 for field in SNAPSHOT_FIELDS}
+        else:
+            start = self._first_data_month()
+            running = dict.fromkeys(SNAPSHOT_FIELDS, 0)
+            if not start or start > through:
+                return []
+
+        monthly = self.analytics_service._compute_months(start, through)
+        snapshots = []
+        for index in range(month_to_index(start), month_to_index(through) + 1):
+            month = index_to_month(index)
+            totals = monthly.get(month, {})
+            running = self._accumulate(running, totals.get("fund", 0), totals.get("bonus", 0), totals.get("expense", 0))
+            snapshots.append({"period_month": month, **running})
+
+        self.upsert(snapshots, on_conflict="fund_id,period_month")
+        if table_versions.snapshot(SNAPSHOT_DEPENDENCIES) != versions:
+            # A write landed while the months were read: its invalidation may have run before this upsert
+            self.delete_snapshots(from_month=start)
+            logger.info("Balance snapshots from %s dropped: ledger changed while they were computed", start)
+            return []
+        logger.info("Balance snapshots written: %s..%s (%d)", snapshots[0]["period_month"], through, len(snapshots))
+        return snapshots
+
+    def delete_snapshots(self, from_month: Optional[str] = None) -> None:
+        """
+        Delete snapshots from a month on (all when from_month is None).
+
+        Args:
+            from_month: First month to delete (YYYY-MM)
+        """
+        self.client.table(self.table_name).delete().gte("period_month", from_month or "0000-00").execute()
+        self._mark_changed()
+
+    def get_balance(self) -> Dict[str, Any]:
+        """
+        Get the current totals: latest snapshot plus the rows after it.
+
+        Missing snapshots only mean more rows to sum; see take_missing_snapshots.
+
+        Returns:
+            Dict with total_income, total_expense, balance and the snapshot month used
+        """
+        snapshot = self.get_latest_snapshot()
+        running = {field: (snapshot or {}).get(field) or 0 for field in SNAPSHOT_FIELDS}
+        after_month = snapshot["period_month"] if snapshot else None
+        since_date = f"{index_to_month(month_to_index(after_month) + 1)}-01" if after_month else None
+
+        def fund_query():
+            query = self.client.table("transaction_entries").select("id, amount").eq("type", "FUND")
+            if after_month:
+                query = query.gt("period_month", after_month)
+            return query.order("id")
+
+        def transactions_query():
+            query = self.client.table("transactions").select("id, type, amount, user_id, status").gt("amount", 0)
+            if since_date:
+                query = query.or_(dated_between(since_date))
+            return query.order("id")
+
+        fund = sum(row.get("amount") or 0 for row in self._fetch_all_pages(fund_query))
+        bonus = expense = 0
+        for row in self._fetch_all_pages(transactions_query):
+            if row.get("type") == "EXPENSE":
+                expense += row.get("amount") or 0
+            elif row.get("type") == "INCOME" and row.get("user_id") is None and row.get("status") == "COMPLETED":
+                bonus += row.get("amount") or 0
+
+        running = self._accumulate(running, fund, bonus, expense)
+        return {**running, "snapshot_month": after_month}
+
+    def get_balance_history(self, from_month: str, to_month: str) -> Dict[str, Any]:
+        """
+        Get cumulative totals at the end of every month in a range.
+
+        Months with a snapshot come straight from it; only the months after
+        the latest snapshot are computed, so once snapshots are up to date the
+        cost depends on the range and not on the age of the fund.
+
+        Args:
+            from_month: First month (YYYY-MM)
+            to_month: Last month (YYYY-MM), inclusive
+
+        Returns:
+            Dict with the range and one point per month
+        """
+        baseline = self.get_latest_snapshot(before_month=from_month)
+        running = {field: (baseline or {}).get(field) or 0 for field in SNAPSHOT_FIELDS}
+        if baseline:
+            replay_from = index_to_month(month_to_index(baseline["period_month"]) + 1)
+        else:
+            replay_from = min(self._first_data_month() or from_month, from_month)
+
+        snapshots = {
+            row["period_month"]: row
+            for row in self.client.table(self.table_name).select("*")
+            .gte("period_month", replay_from).lte("period_month", to_month)
+            .order("period_month").execute().data
+        }
+        months = [index_to_month(index) for index in range(month_to_index(replay_from), month_to_index(to_month) + 1)]
+        first_missing = next((month for month in months if month not in snapshots), None)
+        computed = self.analytics_service._compute_months(first_missing, to_month) if first_missing else {}
+
+        points = []
+        for month in months:
+            previous_balance = running["balance"]
+            if month in snapshots:
+                running = {field: snapshots[month].get(field) or 0 for field in SNAPSHOT_FIELDS}
+            else:
+                totals = computed.get(month, {})
+                running = self._accumulate(running, totals.get("fund", 0), totals.get("bonus", 0), totals.get("expense", 0))
+            if month >= from_month:
+                points.append({"month": month, **running, "change": running["balance"] - previous_balance})
+
+        return {"from_month": from_month, "to_month": to_month, "points": points}
+
+    def _first_data_month(self) -> Optional[str]:
+        months = []
+        transaction = self.client.table("transactions").select("transaction_date").not_.is_(
+            "transaction_date", "null"
+        ).order("transaction_date").limit(1).execute().data
+        if transaction:
+            months.append(transaction[0]["transaction_date"][:7])
+        undated = self.client.table("transactions").select("created_at").is_(
+            "transaction_date", "null"
+        ).order("created_at").limit(1).execute().data
+        if undated and undated[0].get("created_at"):
+            months.append(undated[0]["created_at"][:7])
+        entry = self.client.table("transaction_entries").select("period_month").eq("type", "FUND").not_.is_(
+            "period_month", "null"
+        ).order("period_month").limit(1).execute().data
+        if entry:
+            months.append(entry[0]["period_month"][:7])
+        return min(months) if months else None
+
+    @staticmethod
+    def _accumulate(running: Dict[str, int], fund: int, bonus: int, expense: int) -> Dict[str, int]:
+        fund_income = running["fund_income"] + fund
+        bonus_income = running["bonus_income"] + bonus
+        total_expense = running["total_expense"] + expense
+        return {
+            "fund_income": fund_income,
+            "bonus_income": bonus_income,
+            "total_income": fund_income + bonus_income,
+            "total_expense": total_expense,
+            "balance": fund_income + bonus_income - total_expense,
+        }
@@ -1,22 +1,62 @@
 """Base service class for common database operations."""
-from typing import Optional, List, Dict, Any
-from app.core.database import get_supabase_client
-from supabase import Client
+from typing import Optional, List, Dict, Any, Callable, Iterable, Iterator, Sequence, TypeVar
+from app.core.config import settings
+from app.core.database import FundScopedClient, get_fund_client
+from app.core.invalidation import invalidation_bus
+from app.core.query_cache import query_cache, query_key
+
+T = TypeVar("T")
 
 
 class BaseService:
     """Base service class with common CRUD operations."""
     
+    # Opt-in read-through cache of query results (see _cached); None disables it
+    query_cache_ttl: Optional[float] = None
+    query_cache_max_entries: int = 256
+    
+    # Rows per bulk write request and ids per in_ filter (see create_many, get_by_ids)
+    bulk_chunk_size: int = settings.BULK_CHUNK_SIZE
+    bulk_id_chunk_size: int = settings.BULK_ID_CHUNK_SIZE
+    
     def __init__(self, table_name: str):
         """
         Initialize base service.
         
+        Queries only see the rows of the current fund (see FUND_SCOPED_TABLES).
+        
         Args:
             table_name: Name of the Supabase table
         """
-        self.client: Client = get_supabase_client()
+        self.client: FundScopedClient = get_fund_client()
         self.table_name: str = table_name
     
+    def _mark_changed(self) -> None:
+        """Announce a write to the table so derived caches of every worker go stale."""
+        invalidation_bus.publish(self.table_name)
+    
+    def _cached(self, operation: str, load: Callable[[], T], **parts: Any) -> T:
+        """
+        Serve a read from the query cache when the service opts in (query_cache_ttl).
+        
+        Args:
+            operation: Query name
+            load: Runs the query and returns its result
+            **parts: Everything the result depends on (columns, filters, order, range)
+            
+        Returns:
+            Query result
+        """
+        if self.query_cache_ttl is None:
+            return load()
+        return query_cache.get_or_load(
+            self.table_name,
+            query_key(operation, **parts),
+            load,
+            ttl=self.query_cache_ttl,
+            max_entries=self.query_cache_max_entries,
+        )
+    
     def _get_first_item(self, response_data: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """
         Extract first item from Supabase response.
@@ -29,6 +69,30 @@ class BaseService:
         """
         return response_data[0] if response_data else None
     
+    def _fetch_all_pages(self, build_query: Callable[[], Any], page_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Execute a select page by page until every row has been read.
+        
+        PostgREST caps the rows returned by a single request, so large reads
+        must be paginated. build_query must return a fresh, deterministically
+        ordered query each time it is called.
+        
+        Args:
+            build_query: Factory returning the query to paginate
+            page_size: Rows per request
+            
+        Returns:
+            All rows
+        """
+        rows: List[Dict[str, Any]] = []
+        start = 0
+        while True:
+            page = build_query().range(start, start + page_size - 1).execute().data
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            start += page_size
+    
     def get_all(self, order_by: Optional[str] = None, desc: bool = True, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Get all records from table.
@@ -36,21 +100,24 @@ class BaseService:
         Args:
             order_by: Column name to order by
             desc: Order descending if True
+            filters: Equality filters (column -> value)
             
         Returns:
             List of records
         """
-        query = self.client.table(self.table_name).select("*")
+        def load() -> List[Dict[str, Any]]:
+            query = self.client.table(self.table_name).select("*")
 
-        if filters:
-            for key, value in filters.items():
-                query = query.eq(key, value)
-        
-        if order_by:
-            query = query.order(order_by, desc=desc)
-        
-        response = query.execute()
-        return response.data
+            if filters:
+                for key, value in filters.items():
+                    query = query.eq(key, value)
+            
+            if order_by:
+                query = query.order(order_by, desc=desc)
+            
+            return query.execute().data
+
+        return self._cached("get_all", load, filters=filters or {}, order_by=order_by, desc=desc)
     
     def get_by_id(self, id: int) -> Optional[Dict[str, Any]]:
         """
@@ -62,8 +129,11 @@ class BaseService:
         Returns:
             Record or None if not found
         """
-        response = self.client.table(self.table_name).select("*").eq("id", id).execute()
-        return self._get_first_item(response.data)
+        return self._cached(
+            "get_by_id",
+            lambda: self._get_first_item(self.client.table(self.table_name).select("*").eq("id", id).execute().data),
+            id=id,
+        )
     
     def create(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -76,6 +146,7 @@ class BaseService:
             Created record or None
         """
         response = self.client.table(self.table_name).insert(data).execute()
+        self._mark_changed()
         return self._get_first_item(response.data)
     
     def update(self, id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -90,6 +161,7 @@ class BaseService:
             Updated record or None
         """
         response = self.client.table(self.table_name).update(data).eq("id", id).execute()
+        self._mark_changed()
         return self._get_first_item(response.data)
     
     def delete(self, id: int) -> bool:
@@ -103,5 +175,132 @@ class BaseService:
             True if deleted successfully
         """
         response = self.client.table(self.table_name).delete().eq("id", id).execute()
+        self._mark_changed()
         return len(response.data) > 0
+    
+    def get_by_ids(self, ids: Iterable[int], chunk_size: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        Get many records by ID with one in_ query per chunk of IDs.
+        
+        Args:
+            ids: Record IDs (duplicates are read once)
+            chunk_size: IDs per request (default bulk_id_chunk_size)
+            
+        Returns:
+            Dict of ID -> record; IDs that do not exist are missing
+        """
+        unique_ids = sorted(set(ids))
+        records: Dict[int, Dict[str, Any]] = {}
+        for chunk in _chunks(unique_ids, chunk_size or self.bulk_id_chunk_size):
+            for row in self.client.table(self.table_name).select("*").in_("id", chunk).execute().data:
+                records[row["id"]] = row
+        return records
+    
+    def create_many(self, rows: Sequence[Dict[str, Any]], chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Insert many records, one request per chunk.
+        
+        A failing chunk raises; the chunks before it stay written.
+        
+        Args:
+            rows: Data to insert
+            chunk_size: Rows per request (default bulk_chunk_size)
+            
+        Returns:
+            Created records, in the order of rows
+        """
+        created: List[Dict[str, Any]] = []
+        if not rows:
+            return created
+        try:
+            for chunk in _chunks(rows, chunk_size or self.bulk_chunk_size):
+                created.extend(self.client.table(self.table_name).insert(chunk).execute().data)
+        finally:
+            self._mark_changed()
+        return created
+    
+    def upsert(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        on_conflict: str = "id",
+        ignore_duplicates: bool = False,
+        chunk_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert or update many records, one request per chunk.
+        
+        On fund-scoped tables on_conflict must include fund_id unless
+        ignore_duplicates is set; use update_many to update records by ID.
+        
+        Args:
+            rows: Data to write; every row must carry the on_conflict columns
+            on_conflict: Comma-separated unique columns rows are matched on
+            ignore_duplicates: Leave existing records untouched instead of updating them
+            chunk_size: Rows per request (default bulk_chunk_size)
+            
+        Returns:
+            Written records (existing ones skipped by ignore_duplicates are not returned)
+        """
+        written: List[Dict[str, Any]] = []
+        if not rows:
+            return written
+        try:
+            for chunk in _chunks(rows, chunk_size or self.bulk_chunk_size):
+                written.extend(
+                    self.client.table(self.table_name)
+                    .upsert(chunk, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+                    .execute().data
+                )
+        finally:
+            self._mark_changed()
+        return written
+    
+    def update_many(self, ids: Iterable[int], data: Dict[str, Any], chunk_size: Optional[int] = None) -> Dict[int, Optional[Dict[str, Any]]]:
+        """
+        Apply the same update to many records with one in_ query per chunk of IDs.
+        
+        Args:
+            ids: Record IDs
+            data: Data to update
+            chunk_size: IDs per request (default bulk_id_chunk_size)
+            
+        Returns:
+            Dict of every requested ID -> updated record, or None when it does not exist
+        """
+        results: Dict[int, Optional[Dict[str, Any]]] = dict.fromkeys(ids)
+        if not results:
+            return results
+        try:
+            for chunk in _chunks(sorted(results), chunk_size or self.bulk_id_chunk_size):
+                for row in self.client.table(self.table_name).update(data).in_("id", chunk).execute().data:
+                    results[row["id"]] = row
+        finally:
+            self._mark_changed()
+        return results
+    
+    def delete_many(self, ids: Iterable[int], chunk_size: Optional[int] = None) -> int:
+        """
+        Delete many records with one in_ query per chunk of IDs.
+        
+        Args:
+            ids: Record IDs
+            chunk_size: IDs per request (default bulk_id_chunk_size)
+            
+        Returns:
+            Number of records deleted
+        """
+        unique_ids = sorted(set(ids))
+        if not unique_ids:
+            return 0
+        deleted = 0
+        try:
+            for chunk in _chunks(unique_ids, chunk_size or self.bulk_id_chunk_size):
+                deleted += len(self.client.table(self.table_name).delete().in_("id", chunk).execute().data)
+        finally:
+            self._mark_changed()
+        return deleted
+
 
+def _chunks(rows: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
@@ -1,4 +1,6 @@
+from app.core.event_bus import publish_event
 from app.services.base_service import BaseService
+from app.services.user_directory import user_directory
 from app.models import Debt, DebtCreate
 from typing import Optional, List, Dict, Any
 
@@ -15,6 +17,43 @@ class DebtService(BaseService):
     def update_debt(self, id: int, debt: Debt):
         return self.update(id, debt.model_dump())
 
+    def settle_debt(self, id: int):
+        """
+        Mark a debt as fully paid.
+        
+        Args:
+            id: Debt ID
+            
+        Returns:
+            Updated debt or None
+        """
+        debt = self.update(id, {"is_fully_paid": True})
+        if debt:
+            self._publish_settled([debt])
+        return debt
+
+    def settle_debts(self, ids: List[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+        """
+        Mark many debts as fully paid with one update per chunk of IDs.
+        
+        Args:
+            ids: Debt IDs
+            
+        Returns:
+            Dict of debt ID -> updated debt, or None when it does not exist
+        """
+        debts = self.update_many(ids, {"is_fully_paid": True})
+        self._publish_settled([debt for debt in debts.values() if debt])
+        return debts
+
+    def _publish_settled(self, debts: List[Dict[str, Any]]) -> None:
+        if debts:
+            publish_event(
+                "debt.settled",
+                ids=[debt.get("id") for debt in debts],
+                user_ids=sorted({debt.get("user_id") for debt in debts if debt.get("user_id") is not None}),
+            )
+
     def get_unpaid_debt(self, user_id: int):
         debts = self.get_all(order_by="created_at", desc=False, filters={"user_id": user_id, "is_fully_paid": False})
         return debts[0] if debts else None
@@ -38,7 +77,7 @@ class DebtService(BaseService):
         Returns:
             List of debts with user information
         """
-        query = self.client.table(self.table_name).select("*, users(*)").order(order_by, desc=desc)
+        query = self.client.table(self.table_name).select("*").order(order_by, desc=desc)
         
         if user_id is not None:
             query = query.eq("user_id", user_id)
@@ -48,24 +87,4 @@ class DebtService(BaseService):
         
         response = query.execute()
         
-        # Transform data: Supabase returns users as array, but we need single user object
-        transformed_data = []
-        for item in response.data:
-            # Handle different response formats from Supabase
-            if 'users' in item:
-                if isinstance(item['users'], list):
-                    if len(item['users']) > 0:
-                        item['user'] = item['users'][0]
-                    else:
-                        item['user'] = None
-                elif isinstance(item['users'], dict):
-                    item['user'] = item['users']
-                else:
-                    item['user'] = None
-                item.pop('users', None)
-            else:
-                item['user'] = None
-            
-            transformed_data.append(item)
-        
-        return transformed_data
\ No newline at end of file
+        return user_directory.attach(response.data)
\ No newline at end of file
@@ -0,0 +1,330 @@
+"""Process-wide, incrementally maintained rollups of food expenses."""
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.database import get_fund_client
+from app.core.invalidation import Invalidation, invalidation_bus
+from app.core.tenancy import FundLocal
+from app.core.text import normalize_text
+
+
+logger = logging.getLogger(__name__)
+
+FOOD_COLUMNS = "id, type, amount, description, food_name, restaurant_name, source_url, image_url, transaction_date, created_at"
+
+# Invalidation name of written food expenses; keys are the transaction ids
+FOOD_EXPENSES = "food_expenses"
+
+
+@dataclass
+class FoodRecord:
+    """What one EXPENSE transaction contributes to the rollups."""
+    id: int
+    dish_key: str
+    dish: str
+    restaurant_key: str
+    restaurant: str
+    month: str
+    day: str
+    amount: int
+    image_url: Optional[str]
+    source_url: Optional[str]
+
+
+def to_food_record(row: Dict[str, Any]) -> Optional[FoodRecord]:
+    """
+    Build the rollup record of a transaction row.
+
+    Args:
+        row: transactions row
+
+    Returns:
+        FoodRecord, or None when the row is not a food expense
+    """
+    if row.get("type") != "EXPENSE" or not (row.get("food_name") or row.get("restaurant_name")):
+        return None
+    dish = (row.get("food_name") or row.get("description") or "").strip()
+    restaurant = (row.get("restaurant_name") or "").strip()
+    day = (row.get("transaction_date") or row.get("created_at") or "")[:10]
+    return FoodRecord(
+        id=row["id"],
+        dish_key=normalize_text(dish),
+        dish=dish,
+        restaurant_key=normalize_text(restaurant),
+        restaurant=restaurant,
+        month=day[:7],
+        day=day,
+        amount=row.get("amount") or 0,
+        image_url=row.get("image_url"),
+        source_url=row.get("source_url"),
+    )
+
+
+class FoodRollup:
+    """
+    Per-dish, per-restaurant and per-restaurant-month aggregates of food expenses.
+
+    Loaded with one query on first use, then kept current by TransactionService:
+    apply() on create/update, remove() on delete. Every record is kept by
+    transaction id so an update or delete subtracts exactly what the row
+    contributed. Other workers' writes arrive as the ids of the expenses
+    they touched, and only those rows are read again (refresh()). Reads
+    never touch the database. A TTL reload picks up writes made outside
+    the API.
+    """
+
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._records: Dict[int, FoodRecord] = {}
+        self._dish_ids: Dict[str, Set[int]] = defaultdict(set)
+        self._restaurant_ids: Dict[str, Set[int]] = defaultdict(set)
+        self._dishes: Dict[str, Dict[str, Any]] = {}
+        self._restaurants: Dict[str, Dict[str, Any]] = {}
+        self._restaurant_months: Dict[Tuple[str, str], Dict[str, int]] = defaultdict(lambda: {"count": 0, "total": 0})
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.ttl:
+            return
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.ttl:
+                return
+            client = get_fund_client()
+            rows: List[Dict[str, Any]] = []
+            page_size, start = 1000, 0
+            while True:
+                page = (
+                    client.table("transactions").select(FOOD_COLUMNS)
+                    .eq("type", "EXPENSE")
+                    .or_("food_name.not.is.null,restaurant_name.not.is.null")
+                    .order("id").range(start, start + page_size - 1).execute().data
+                )
+                rows.extend(page)
+                if len(page) < page_size:
+                    break
+                start += page_size
+
+            self._reset()
+            for row in rows:
+                record = to_food_record(row)
+                if record:
+                    self._add(record)
+            self._loaded_at = time.monotonic()
+            logger.info("Food rollup loaded: %d expenses", len(self._records))
+
+    def invalidate(self) -> None:
+        """Force a reload on next access."""
+        self._loaded_at = None
+
+    def apply(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        Add or replace the contribution of written transaction rows.
+
+        Args:
+            rows: Created or updated transactions rows (non-food rows only remove a previous contribution)
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for row in rows:
+                if row.get("id") is None:
+                    continue
+                self._discard(row["id"])
+                record = to_food_record(row)
+                if record:
+                    self._add(record)
+
+    def tracks(self, transaction_id: int) -> bool:
+        """Whether a transaction currently contributes to the rollups."""
+        with self._lock:
+            return transaction_id in self._records
+
+    def refresh(self, transaction_ids: Iterable[int]) -> None:
+        """
+        Read transactions written by another worker again and apply them; missing ones are removed.
+
+        Args:
+            transaction_ids: Transaction IDs
+        """
+        if self._loaded_at is None:
+            return
+        ids = sorted(set(transaction_ids))
+        client = get_fund_client()
+        rows: List[Dict[str, Any]] = []
+        for start in range(0, len(ids), settings.BULK_ID_CHUNK_SIZE):
+            rows.extend(
+                client.table("transactions").select(FOOD_COLUMNS)
+                .in_("id", ids[start:start + settings.BULK_ID_CHUNK_SIZE]).execute().data
+            )
+        with self._lock:
+            self.apply(rows)
+            for transaction_id in set(ids) - {row["id"] for row in rows}:
+                self.remove(transaction_id)
+
+    def remove(self, transaction_id: int) -> None:
+        """
+        Remove the contribution of a deleted transaction.
+
+        Args:
+            transaction_id: Transaction ID
+        """
+        with self._lock:
+            if self._loaded_at is not None:
+                self._discard(transaction_id)
+
+    def _add(self, record: FoodRecord) -> None:
+        self._records[record.id] = record
+        if record.dish_key:
+            self._dish_ids[record.dish_key].add(record.id)
+            _fold(self._dishes, record.dish_key, record)
+        if record.restaurant_key:
+            self._restaurant_ids[record.restaurant_key].add(record.id)
+            _fold(self._restaurants, record.restaurant_key, record)
+            bucket = self._restaurant_months[(record.restaurant_key, record.month)]
+            bucket["count"] += 1
+            bucket["total"] += record.amount
+
+    def _discard(self, transaction_id: int) -> None:
+        record = self._records.pop(transaction_id, None)
+        if not record:
+            return
+        if record.dish_key:
+            self._unfold(self._dishes, self._dish_ids, record.dish_key, record)
+        if record.restaurant_key:
+            self._unfold(self._restaurants, self._restaurant_ids, record.restaurant_key, record)
+            key = (record.restaurant_key, record.month)
+            bucket = self._restaurant_months[key]
+            bucket["count"] -= 1
+            bucket["total"] -= record.amount
+            if bucket["count"] <= 0:
+                del self._restaurant_months[key]
+
+    def _unfold(self, aggregates: Dict[str, Dict[str, Any]], members: Dict[str, Set[int]], key: str, record: FoodRecord) -> None:
+        ids = members[key]
+        ids.discard(record.id)
+        if not ids:
+            del members[key]
+            del aggregates[key]
+            return
+
+        # The removed row may have defined the first/latest fields: refold the key (updates and deletes are rare)
+        del aggregates[key]
+        for id in sorted(ids):
+            _fold(aggregates, key, self._records[id])
+
+    def dishes(self) -> List[Dict[str, Any]]:
+        """Summary of every dish (latest name, restaurant and links)."""
+        self._ensure_loaded()
+        with self._lock:
+            return [_public(key, aggregate) for key, aggregate in self._dishes.items()]
+
+    def restaurants(self) -> List[Dict[str, Any]]:
+        """Summary of every restaurant (latest dish and links)."""
+        self._ensure_loaded()
+        with self._lock:
+            return [_public(key, aggregate) for key, aggregate in self._restaurants.items()]
+
+    def restaurant_months(self, from_month: Optional[str] = None, to_month: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Spend per restaurant per month, optionally limited to a month range."""
+        self._ensure_loaded()
+        with self._lock:
+            return [
+                {"key": key, "restaurant": self._restaurants[key]["restaurant"], "month": month, **bucket}
+                for (key, month), bucket in self._restaurant_months.items()
+                if (not from_month or month >= from_month) and (not to_month or month <= to_month)
+            ]
+
+
+def _fold(aggregates: Dict[str, Dict[str, Any]], key: str, record: FoodRecord) -> None:
+    aggregate = aggregates.get(key)
+    if aggregate is None:
+        aggregate = aggregates[key] = {
+            "count": 0, "total": 0, "first_at": record.day, "last_at": record.day, "_last": (record.day, record.id),
+            "dish": record.dish, "restaurant": record.restaurant, "image_url": None, "source_url": None,
+        }
+    aggregate["count"] += 1
+    aggregate["total"] += record.amount
+    aggregate["first_at"] = min(aggregate["first_at"], record.day)
+    if (record.day, record.id) >= aggregate["_last"]:
+        aggregate["_last"] = (record.day, record.id)
+        aggregate["last_at"] = record.day
+        aggregate["dish"] = record.dish
+        aggregate["restaurant"] = record.restaurant
+        aggregate["image_url"] = record.image_url or aggregate["image_url"]
+        aggregate["source_url"] = record.source_url or aggregate["source_url"]
+    else:
+        aggregate["image_url"] = aggregate["image_url"] or record.image_url
+        aggregate["source_url"] = aggregate["source_url"] or record.source_url
+
+
+def _public(key: str, aggregate: Dict[str, Any]) -> Dict[str, Any]:
+    return {"key": key, **{name: value for name, value in aggregate.items() if not name.startswith("_")}}
+
+
+# Global instance shared by every service in the process, one rollup per fund
+food_rollup: FundLocal[FoodRollup] = FundLocal(
+    lambda: FoodRollup(ttl=settings.FOOD_ROLLUP_TTL_SECONDS),
+    max_funds=settings.FUND_CACHE_MAX_FUNDS,
+)
+
+
+def food_expenses_written(rows: List[Dict[str, Any]]) -> None:
+    """
+    Apply written transactions rows to the rollup of the current fund and
+    tell the other workers which food expenses changed.
+
+    Args:
+        rows: Created or updated transactions rows
+    """
+    rollup = food_rollup.current()
+    # Income (most writes) never touches the rollups, unless the row used to be a food expense
+    ids = [
+        row["id"] for row in rows
+        if row.get("id") is not None and (row.get("type") == "EXPENSE" or rollup.tracks(row["id"]))
+    ]
+    rollup.apply(rows)
+    if ids:
+        invalidation_bus.publish(FOOD_EXPENSES, keys=[str(id) for id in ids])
+
+
+def food_expenses_deleted(transaction_ids: List[int]) -> None:
+    """
+    Remove deleted transactions from the rollup of the current fund and from the other workers' rollups.
+
+    Args:
+        transaction_ids: Deleted transaction IDs
+    """
+    rollup = food_rollup.current()
+    for transaction_id in transaction_ids:
+        rollup.remove(transaction_id)
+    if transaction_ids:
+        invalidation_bus.publish(FOOD_EXPENSES, keys=[str(id) for id in transaction_ids])
+
+
+def _on_invalidation(invalidation: Invalidation) -> None:
+    # Local writes are applied by food_expenses_written/deleted; other workers' writes name the rows to read again
+    if not invalidation.remote or FOOD_EXPENSES not in invalidation.names:
+        return
+    rollup = food_rollup.peek(invalidation.fund_id)
+    if not rollup:
+        return
+    if invalidation.keys is None:
+        rollup.invalidate()
+        return
+    try:
+        rollup.refresh(int(key) for key in invalidation.keys)
+    except Exception as e:
+        logger.warning("Food rollup refresh failed, reloading on next read: %s", e)
+        rollup.invalidate()
+
+
+invalidation_bus.subscribe(_on_invalidation)
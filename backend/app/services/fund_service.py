@@ -0,0 +1,113 @@
+"""Funds (tenants) and selection of the fund of a request."""
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_supabase_client
+from app.core.invalidation import Invalidation, invalidation_bus
+from app.core.tenancy import FUND_HEADER, FUND_QUERY_PARAM, get_current_fund_id, use_fund
+from app.models import FundCreate
+from app.services.base_service import BaseService
+
+
+logger = logging.getLogger(__name__)
+
+# Fund rows by id; funds are read on every request that names one and almost never change
+fund_cache = TTLCache(max_entries=settings.FUND_CACHE_MAX_FUNDS, ttl=settings.FUND_DIRECTORY_TTL_SECONDS)
+
+
+def _on_invalidation(invalidation: Invalidation) -> None:
+    if "funds" in invalidation.names:
+        fund_cache.clear()
+
+
+invalidation_bus.subscribe(_on_invalidation)
+
+
+class FundService(BaseService):
+    """Service for fund operations. The funds table itself is shared by every fund."""
+
+    def __init__(self):
+        super().__init__(table_name="funds")
+
+    def get_fund(self, fund_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a fund by ID (cached).
+        
+        Args:
+            fund_id: Fund ID
+            
+        Returns:
+            Fund or None
+        """
+        fund = fund_cache.get(fund_id)
+        if fund is None:
+            fund = self.get_by_id(fund_id)
+            if fund:
+                fund_cache.set(fund_id, fund)
+        return fund
+
+    def create_fund(self, fund: FundCreate) -> Optional[Dict[str, Any]]:
+        """
+        Create a new fund.
+        
+        Args:
+            fund: Fund data
+            
+        Returns:
+            Created fund or None
+        """
+        return self.create(fund.model_dump())
+
+    def get_admin_user_id(self) -> Optional[int]:
+        """
+        Get the admin member of the current fund.
+        
+        Returns:
+            User ID or None when the fund has no admin
+        """
+        fund = self.get_fund(get_current_fund_id())
+        return fund.get("admin_user_id") if fund else None
+
+    def get_fund_id_by_order_code(self, order_code: int) -> Optional[int]:
+        """
+        Find the fund of a PayOS payment, for callbacks that do not name a fund.
+        
+        Args:
+            order_code: PayOS order code
+            
+        Returns:
+            Fund ID or None when no transaction has this order code
+        """
+        response = get_supabase_client().table("transactions").select("fund_id").eq("order_code", order_code).limit(1).execute()
+        transaction = self._get_first_item(response.data)
+        return transaction.get("fund_id") if transaction else None
+
+
+def _requested_fund_id(request: Request) -> Optional[str]:
+    return request.headers.get(FUND_HEADER) or request.query_params.get(FUND_QUERY_PARAM)
+
+
+async def select_fund(request: Request, call_next):
+    """
+    Middleware: run the request on behalf of the fund named by X-Fund-Id (or ?fund_id=).
+
+    Requests that do not name a fund use settings.DEFAULT_FUND_ID, so
+    single-fund deployments keep working unchanged.
+    """
+    requested = _requested_fund_id(request)
+    if requested is None:
+        return await call_next(request)
+
+    if not requested.isdigit():
+        return JSONResponse(status_code=400, content={"detail": f"{FUND_HEADER} must be a fund id"})
+    fund_id = int(requested)
+    if fund_id != settings.DEFAULT_FUND_ID and not FundService().get_fund(fund_id):
+        return JSONResponse(status_code=404, content={"detail": "Fund not found"})
+
+    with use_fund(fund_id):
+        return await call_next(request)
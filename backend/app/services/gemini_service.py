@@ -1,27 +1,45 @@
 import asyncio
+import copy
+import logging
+import math
 import os
-import json
 import time
-import tempfile
 from pathlib import Path
 from datetime import datetime
+from typing import AsyncIterator, Tuple, Any, List, Optional, Union
 from google import genai
+from google.genai import types
+from pydantic import TypeAdapter, ValidationError
 from app.models.transaction_model import TransactionCreate
 from app.models.transaction_entry_model import TransactionEntryCreate
 from app.models.debts_model import DebtCreate
+from app.models.extraction_model import ExpenseExtraction, IncomeExtraction
 from fastapi import UploadFile, HTTPException
 from dotenv import load_dotenv
 
 from app.services.user_service import UserService
+from app.services.user_directory import user_directory
 from app.services.transaction_service import TransactionService
 from app.services.debt_service import DebtService
 from app.services.transaction_entry_service import TransactionEntryService
-from app.services.member_fee_service import MemberFeeService
+from app.services.allocation_engine import AllocationResult, Payment
+from app.services.ledger_allocation_service import LedgerAllocationService
+from app.services.ledger_unit_of_work import LedgerUnitOfWork, commit_with_replan
+from app.services.image_preprocess_service import ImagePreprocessService
+from app.services.model_router import chat_model_router, image_model_router
+from app.core.uploads import StoredUpload, save_upload_bounded
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.table_versions import table_versions
+from app.core.tenancy import FundLocal
+from app.core.text import normalize_text
 # Lazy import QueueManager to avoid circular dependency
 
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+logger = logging.getLogger(__name__)
+
 INCOME_PROMPT_TEMPLATE = """
 Bạn là một trợ lý kế toán AI. Nhiệm vụ của bạn là trích xuất thông tin tài chính từ văn bản hoặc hình ảnh chuyển khoản ngân hàng.
 Hãy trả về kết quả CHỈ LÀ MỘT JSON duy nhất (không giải thích thêm) theo định dạng sau:
@@ -35,7 +53,7 @@ Quy tắc quan trọng về user_from:
 {{
     "transaction_date": "YYYY-MM-DD",
     "user_from": "Tên người gửi (nếu có)",
-    "id_from": "ID người gửi được lấy từ trong danh sách thành viên hợp lệ tương ứng với user_from",
+    "id_from": ID người gửi (Số_nguyên) được lấy từ trong danh sách thành viên hợp lệ tương ứng với user_from, null nếu không có,
     "user_to": "Tên người nhận (nếu có)",
     "amount": Số_nguyên (Ví dụ: 50000),
     "description": "Nội dung của giao dịch"
@@ -53,6 +71,41 @@ Hãy trả về kết quả CHỈ LÀ MỘT ARRAY JSON duy nhất. Mỗi phần
 }]
 """
 
+REPAIR_PROMPT_TEMPLATE = """
+Kết quả JSON dưới đây không khớp với schema yêu cầu. Hãy sửa lại cho đúng schema, giữ nguyên các giá trị đã trích xuất, không thêm thông tin mới.
+
+Lỗi: {error}
+
+Kết quả cần sửa:
+{output}
+"""
+
+# Models are picked per request by the model routers (AI_CHAT_MODEL_TIERS, AI_IMAGE_MODEL_TIERS)
+
+# Response schema of each extraction type (structured output, parsed with pydantic)
+EXTRACTION_SCHEMAS = {
+    "INCOME": IncomeExtraction,
+    "EXPENSE": list[ExpenseExtraction],
+}
+
+# Bump whenever the chat prompt templates change so cached answers are not reused
+CHAT_PROMPT_VERSION = 2
+
+# The chat prompt embeds the member list, so every answer depends on users
+CHAT_BASE_TABLES = ("users",)
+# Questions about the fund ("còn bao nhiêu tiền?") also depend on the ledger
+CHAT_LEDGER_TABLES = ("transactions", "transaction_entries", "debts")
+CHAT_QUESTION_HINTS = (
+    "?", "bao nhieu", "con lai", "so du", "tong", "ai chua", "ai da", "chua dong",
+    "da dong chua", "nhung ai", "khi nao", "thong ke", "how much", "who ",
+)
+
+# One answer cache per fund: a busy fund only evicts its own answers
+chat_cache: FundLocal[TTLCache] = FundLocal(
+    lambda: TTLCache(max_entries=settings.CHAT_CACHE_MAX_ENTRIES, ttl=settings.CHAT_CACHE_TTL_SECONDS),
+    max_funds=settings.FUND_CACHE_MAX_FUNDS,
+)
+
 class GeminiService:
     def __init__(self):
         api_key = os.environ.get("GOOGLE_API_KEY")
@@ -67,146 +120,181 @@ class GeminiService:
         self.transaction_service = TransactionService()
         self.debt_service = DebtService()
         self.transaction_entry_service = TransactionEntryService()
-        self.member_fee_service = MemberFeeService()
-
-    def _get_next_fund_period_month(self, user_id: int, fallback_date: str) -> str:
-        latest_fund_entry_query = self.transaction_entry_service.client.table("transaction_entries").select("period_month").eq("user_id", user_id).in_("type", ["FUND", "EXEMPT"]).order("period_month", desc=True).limit(1)
-        latest_fund_entry_response = latest_fund_entry_query.execute()
-
-        if latest_fund_entry_response.data and len(latest_fund_entry_response.data) > 0:
-            latest_period_month = latest_fund_entry_response.data[0].get("period_month")
-            if latest_period_month:
-                year, month = latest_period_month.split("-")
-                year_int, month_int = int(year), int(month)
-                if month_int == 12:
-                    return f"{year_int + 1}-01"
-                return f"{year_int}-{month_int + 1:02d}"
-
-        return fallback_date[:7]
-
-    def chat_with_ai(self, message: str):
-        system_prompt = self._get_system_prompt()
-        response = self.client.models.generate_content(
-            model='gemini-2.5-flash', # Hoặc model bạn muốn
-            contents=f"{system_prompt}\n\nNội dung user nhập: {message}"
+        self.ledger_allocation_service = LedgerAllocationService()
+        self.image_preprocess_service = ImagePreprocessService()
+
+    def chat_with_ai(self, message: str, use_cache: bool = True):
+        cache_key = self._get_chat_cache_key(message)
+        if use_cache:
+            cached = self._get_cached_chat_result(cache_key)
+            if cached is not None:
+                return cached
+
+        # Versions read before the model call: a write racing with it leaves the answer stale, not fresh
+        versions = self._get_chat_versions(message)
+        contents = self._build_chat_contents(self._get_system_prompt(), message)
+        extraction = chat_model_router.generate(
+            lambda model, timeout: self._generate_structured(model, contents, "INCOME", timeout),
+            check=self._check_chat_answer,
         )
-        clean_res = self._clean_json_string(response.text)
-        return json.loads(clean_res)
+        result = extraction.model_dump()
+        self._set_cached_chat_result(cache_key, versions, result)
+        return result
+
+    async def stream_chat_with_ai(self, message: str, use_cache: bool = True) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a chat answer from Gemini as it is generated.
+        
+        Yields ("delta", text) for every partial chunk, then a single
+        ("result", parsed_json) once the full answer has been received.
+        A cached answer is yielded directly as the result.
+        
+        The answer is streamed from the first chat tier. When it has to
+        escalate, the deltas were only a preview: the result comes from
+        the next tiers.
+        
+        Args:
+            message: User message
+            use_cache: Set to False to bypass the answer cache
+            
+        Yields:
+            Tuples of (event_name, payload)
+        """
+        cache_key = self._get_chat_cache_key(message)
+        if use_cache:
+            cached = self._get_cached_chat_result(cache_key)
+            if cached is not None:
+                yield "result", cached
+                return
+
+        versions = self._get_chat_versions(message)
+        contents = self._build_chat_contents(self._get_system_prompt(), message)
+        tier = chat_model_router.tiers[0]
+        can_escalate = len(chat_model_router.tiers) > 1
+        started = time.perf_counter()
+        chunks = []
+        try:
+            stream = await self.client.aio.models.generate_content_stream(
+                model=tier.model,
+                contents=contents,
+                config=self._get_structured_config("INCOME"),
+            )
+            async for chunk in stream:
+                text = chunk.text
+                if not text:
+                    continue
+                chunks.append(text)
+                yield "delta", text
+        except Exception as e:
+            chat_model_router.observe(tier, time.perf_counter() - started, error=e)
+            # Fall back only while nothing has been sent yet
+            if chunks or not can_escalate:
+                raise
+            logger.warning(f"[MODEL_ROUTER] chat stream on {tier.model} failed: {e}")
+            chunks = None
+
+        escalate = chunks is None
+        if chunks is not None:
+            try:
+                # A repair, if needed, is a blocking model call: keep it off the event loop
+                extraction = await asyncio.to_thread(self._parse_structured, "".join(chunks), "INCOME", tier.model)
+                reason = chat_model_router.escalation_reason(extraction, None, self._check_chat_answer)
+            except ValidationError:
+                if not can_escalate:
+                    raise
+                reason = "invalid_output"
+            escalate = reason is not None and can_escalate
+            chat_model_router.observe(tier, time.perf_counter() - started, escalation=reason if escalate else None)
+
+        if escalate:
+            extraction = await asyncio.to_thread(
+                chat_model_router.generate,
+                lambda model, timeout: self._generate_structured(model, contents, "INCOME", timeout),
+                self._check_chat_answer,
+                1,
+            )
+        result = extraction.model_dump()
+        self._set_cached_chat_result(cache_key, versions, result)
+        yield "result", result
 
-    async def process_income_image(self, file: UploadFile):
+    async def process_income_image(self, file: Union[UploadFile, StoredUpload]):
         """
         Process income image, extract transaction data, and create transaction immediately.
         
         Args:
-            file: Image file to process
+            file: Image file to process, or an upload already stored by the router (deleted once processed)
             
         Returns:
             Created transaction with extracted data
         """
-        extracted_data = await self._extract_transaction_from_image(file, "INCOME")
-        print('extracted_data', extracted_data)
-        print('extracted_data.get("amount")', extracted_data.get("amount"))
+        extracted_data: IncomeExtraction = await self._extract_transaction_from_image(file, "INCOME")
+        logger.info(f"Income extracted: {extracted_data.model_dump()}")
 
-        if not extracted_data.get("user_from") or not extracted_data.get("id_from") or not extracted_data.get("amount"):
+        if not extracted_data.user_from or not extracted_data.amount:
             raise HTTPException(status_code=400, detail="Không tìm thấy thông tin giao dịch hoặc số tiền chuyển khoản. Vui lòng thử lại")
         
-        user_id = extracted_data.get("id_from")
-        if isinstance(user_id, str) and user_id.isdigit():
-            user_id = int(user_id)
-        elif not isinstance(user_id, int) or user_id is None:
-            # Try to find user by name
-            user_from = extracted_data.get("user_from")
-            if user_from:
-                users = self.user_service.get_all()
-                matching_user = next((u for u in users if u.get("name") == user_from), None)
-                if matching_user:
-                    user_id = matching_user.get("id")
-                else:
-                    user_id = None
+        user_id = extracted_data.id_from
+        if user_id is None:
+            # id_from is null when the model found no member in the list: try to find user by name
+            users = user_directory.get_all().values()
+            matching_user = next((u for u in users if u.get("name") == extracted_data.user_from), None)
+            if matching_user:
+                user_id = matching_user.get("id")
 
         if not user_id:
             raise HTTPException(status_code=400, detail="Không tìm thấy thành viên phù hợp với giao dịch. Vui lòng thử lại")
 
-        next_period_month = self._get_next_fund_period_month(
-            user_id,
-            extracted_data.get("transaction_date") or datetime.now().strftime("%Y-%m-%d")
-        )
-        monthly_fee = self.member_fee_service.get_monthly_fee(user_id, next_period_month)
+        transaction_date = extracted_data.transaction_date or datetime.now().strftime("%Y-%m-%d")
 
-        if extracted_data.get("amount") < monthly_fee:
-            raise HTTPException(status_code=400, detail=f"Số tiền chuyển khoản phải lớn hơn hoặc bằng {monthly_fee}")
+        # Plan before creating the transaction so an insufficient amount is rejected cleanly
+        plan = self._plan_income(user_id, extracted_data.amount, transaction_date)
 
-        debt_amount = extracted_data.get("amount") - monthly_fee
-        
         transaction_data = TransactionCreate(
             type="INCOME",
-            description=extracted_data.get("description", ""),
-            amount=extracted_data.get("amount"),
+            description=extracted_data.description or "",
+            amount=extracted_data.amount,
             user_id=user_id,
-            transaction_date=extracted_data.get("transaction_date"),
+            transaction_date=transaction_date,
             status="COMPLETED"
         )
 
-        transaction = self.transaction_service.create_transaction(transaction_data)
+        def build(replan: bool) -> LedgerUnitOfWork:
+            unit_of_work = LedgerUnitOfWork()
+            unit_of_work.add_transaction(transaction_data)
+            unit_of_work.add_allocation(self._plan_income(user_id, extracted_data.amount, transaction_date) if replan else plan)
+            return unit_of_work
+
+        # Transaction, entries and settled debts are written together or not at all
+        transaction = commit_with_replan(build)[0].transaction
 
         if not transaction:
             raise HTTPException(status_code=500, detail="Failed to create transaction")
 
-        debt = self.debt_service.get_unpaid_debt(user_id)
-
-        transaction_entry_fund_data = TransactionEntryCreate(
-            transaction_id=transaction.get("id"),
-            user_id=user_id,
-            amount=monthly_fee,
-            type="FUND",
-            period_month=next_period_month
-        )
-        transaction_entry_fund_data = self.transaction_entry_service.create_transaction_entry(transaction_entry_fund_data)
-
-        if debt and debt_amount > 0 and debt_amount >= debt.get("amount"):
-            transaction_entry_debt_data = TransactionEntryCreate(
-                transaction_id=transaction.get("id"),
-                debt_id=int(debt.get("id")),
-                user_id=user_id,
-                amount=debt_amount,
-                type="DEBT",
-                period_month=next_period_month
-            )
-            print('transaction_entry_debt_data', transaction_entry_debt_data)
-            transaction_entry_debt_data = self.transaction_entry_service.create_transaction_entry(transaction_entry_debt_data)
-
-            # Update only is_full_paid field
-            debt_id = debt.get("id")
-            if debt_id:
-                self.debt_service.update(debt_id, {"is_fully_paid": True})
-
         result = dict(transaction)
-        result["user_name"] = extracted_data.get("user_from")
+        result["user_name"] = extracted_data.user_from
         return result
 
-    async def process_expense_image(self, file: UploadFile):
+    async def process_expense_image(self, file: Union[UploadFile, StoredUpload]):
         """
         Process expense image, extract transaction information, and create transaction immediately.
         
         Args:
-            file: Image file to process
+            file: Image file to process, or an upload already stored by the router (deleted once processed)
             
         Returns:
             Created transactions with extracted data (status: COMPLETED)
         """
-        extracted_data_list = await self._extract_transaction_from_image(file, "EXPENSE")
-        
-        # Ensure extracted_data_list is a list
-        if not isinstance(extracted_data_list, list):
-            extracted_data_list = [extracted_data_list]
+        extracted_data_list: List[ExpenseExtraction] = await self._extract_transaction_from_image(file, "EXPENSE")
+        today = datetime.now().strftime("%Y-%m-%d")
 
         transaction_creates = [
             TransactionCreate(
                 type="EXPENSE",
-                description=extracted_data.get("bill_name"),
-                amount=extracted_data.get("amount"),
+                description=extracted_data.bill_name,
+                amount=extracted_data.amount,
                 user_id=None,
-                transaction_date=extracted_data.get("transaction_date"),
+                # A bill without a readable date is booked today, so dated totals count it
+                transaction_date=extracted_data.transaction_date or today,
                 status="COMPLETED"
             )
             for extracted_data in extracted_data_list
@@ -221,8 +309,147 @@ class GeminiService:
 
     # Private methods
 
-    def _clean_json_string(self, json_str):
-        return json_str.replace("```json", "").replace("```", "").strip()
+    def _plan_income(self, user_id: int, amount: int, transaction_date: str) -> AllocationResult:
+        plan = self.ledger_allocation_service.plan([Payment(
+            transaction_id=0,
+            user_id=user_id,
+            amount=amount,
+            as_of_month=transaction_date[:7],
+        )])
+        if not any(entry["type"] == "FUND" for entry in plan.entries) and 0 in plan.insufficient_fee:
+            raise HTTPException(status_code=400, detail=f"Số tiền chuyển khoản phải lớn hơn hoặc bằng {plan.insufficient_fee[0]}")
+        if not plan.entries:
+            raise HTTPException(status_code=400, detail="Thành viên đã đóng quỹ đủ, không có khoản nào cần phân bổ")
+        return plan
+
+    def _get_chat_cache_key(self, message: str) -> Tuple[int, str, str]:
+        # Answers use today's date for relative phrases ("tháng này", "hôm nay")
+        return (CHAT_PROMPT_VERSION, datetime.now().strftime("%Y-%m-%d"), normalize_text(message))
+
+    def _get_chat_dependencies(self, message: str) -> Tuple[str, ...]:
+        normalized = normalize_text(message)
+        if any(hint in normalized for hint in CHAT_QUESTION_HINTS):
+            return CHAT_BASE_TABLES + CHAT_LEDGER_TABLES
+        return CHAT_BASE_TABLES
+
+    def _get_cached_chat_result(self, cache_key: Tuple[int, str, str]) -> Optional[Any]:
+        if not settings.CHAT_CACHE_ENABLED:
+            return None
+
+        cached = chat_cache.get(cache_key)
+        if cached is None:
+            return None
+
+        versions, result = cached
+        if versions != table_versions.snapshot(table for table, _ in versions):
+            chat_cache.delete(cache_key)
+            return None
+        return copy.deepcopy(result)
+
+    def _get_chat_versions(self, message: str) -> Tuple[Tuple[str, int], ...]:
+        return table_versions.snapshot(self._get_chat_dependencies(message))
+
+    def _set_cached_chat_result(self, cache_key: Tuple[int, str, str], versions: Tuple[Tuple[str, int], ...], result: Any) -> None:
+        if not settings.CHAT_CACHE_ENABLED:
+            return
+        chat_cache.set(cache_key, (versions, copy.deepcopy(result)))
+
+    def _build_chat_contents(self, system_prompt: str, message: str) -> str:
+        return f"{system_prompt}\n\nNội dung user nhập: {message}"
+
+    def _get_structured_config(self, type: str, timeout: Optional[float] = None) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=EXTRACTION_SCHEMAS[type],
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None,
+        )
+
+    def _generate_structured(self, model: str, contents: Any, type: str, timeout: Optional[float] = None) -> Tuple[Any, Optional[float]]:
+        """
+        Run one extraction call on a model (a model router tier).
+        
+        Args:
+            model: Model name
+            contents: Prompt and uploaded files
+            type: INCOME or EXPENSE (see EXTRACTION_SCHEMAS)
+            timeout: Seconds before the call is abandoned
+            
+        Returns:
+            Parsed answer and its confidence (None when the model reports no log probabilities)
+        """
+        response = self.client.models.generate_content(
+            model=model,
+            contents=contents,
+            config=self._get_structured_config(type, timeout),
+        )
+        return self._parse_structured(response.text, type, model), self._get_confidence(response)
+
+    def _get_confidence(self, response: Any) -> Optional[float]:
+        # Mean token probability of the answer
+        candidates = getattr(response, "candidates", None) or []
+        avg_logprobs = getattr(candidates[0], "avg_logprobs", None) if candidates else None
+        return math.exp(avg_logprobs) if avg_logprobs is not None else None
+
+    def _check_chat_answer(self, extraction: IncomeExtraction) -> Optional[str]:
+        # Chat messages need not be transfers (questions have no amount): only the date is checked
+        return self._check_date(extraction.transaction_date)
+
+    def _check_income(self, extraction: IncomeExtraction) -> Optional[str]:
+        if not extraction.amount:
+            return "missing_amount"
+        users = user_directory.get_all()
+        if extraction.id_from not in users and not any(user.get("name") == extraction.user_from for user in users.values()):
+            return "unknown_member"
+        return self._check_date(extraction.transaction_date)
+
+    def _check_expense(self, bills: List[ExpenseExtraction]) -> Optional[str]:
+        if not bills:
+            return "no_bill"
+        if any(not bill.amount for bill in bills):
+            return "missing_amount"
+        return next(filter(None, (self._check_date(bill.transaction_date) for bill in bills)), None)
+
+    def _check_date(self, value: Optional[str]) -> Optional[str]:
+        # A missing date defaults to today; a malformed or future one is misread
+        if not value:
+            return None
+        try:
+            parsed = datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            return "bad_date"
+        return "bad_date" if parsed.date() > datetime.now().date() else None
+
+    def _parse_structured(self, text: str, type: str, model: str) -> Any:
+        """
+        Parse a structured-output answer into its pydantic schema.
+        
+        Output that still does not validate (truncated, wrong types) gets a
+        single text-only repair call instead of failing the whole request.
+        
+        Args:
+            text: Raw model output
+            type: INCOME or EXPENSE (see EXTRACTION_SCHEMAS)
+            model: Model that produced the output, also used for the repair
+            
+        Returns:
+            IncomeExtraction, or list of ExpenseExtraction
+            
+        Raises:
+            ValidationError: The repaired output is still invalid
+        """
+        adapter = TypeAdapter(EXTRACTION_SCHEMAS[type])
+        try:
+            return adapter.validate_json(text or "")
+        except ValidationError as e:
+            logger.warning(f"Structured output did not validate ({type}), repairing: {e.error_count()} error(s)")
+            error = e
+
+        response = self.client.models.generate_content(
+            model=model,
+            contents=REPAIR_PROMPT_TEMPLATE.format(error=error, output=text),
+            config=self._get_structured_config(type),
+        )
+        return adapter.validate_json(response.text or "")
 
     def _get_system_prompt(self, type: str = "INCOME"):
         if type == "INCOME":
@@ -231,36 +458,45 @@ class GeminiService:
         elif type == "EXPENSE":
             return EXPENSE_PROMPT_TEMPLATE
 
-    async def _extract_transaction_from_image(self, file: UploadFile, type: str):
+    def _upload_file(self, path: str) -> Any:
+        uploaded_file = self.client.files.upload(file=path)
+        # Đợi xử lý
+        while uploaded_file.state.name == "PROCESSING":
+            time.sleep(0.5)
+            uploaded_file = self.client.files.get(name=uploaded_file.name)
+        return uploaded_file
+
+    async def _extract_transaction_from_image(self, file: Union[UploadFile, StoredUpload], type: str):
         temp_file_path = None
+        prepared_file_path = None
         try:
+            # Ghi file theo từng chunk, giới hạn dung lượng và kiểm tra magic bytes
+            stored = file if isinstance(file, StoredUpload) else await save_upload_bounded(file)
+            temp_file_path = stored.path
+            logger.info(f"Upload stored: {stored.filename} ({stored.mime_type}, {stored.size} bytes, sha256={stored.sha256})")
+
             system_prompt = self._get_system_prompt(type)
+
+            # Xoay/thu nhỏ/nén ảnh trước khi upload để giảm dung lượng và độ trễ
+            upload_path = temp_file_path
+            prepared = await self.image_preprocess_service.preprocess(temp_file_path)
+            if prepared and prepared.converted:
+                prepared_file_path = prepared.path
+                upload_path = prepared.path
             
-            suffix = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                temp_file_path = temp_file.name
-                content = await file.read()
-                temp_file.write(content)
-            
-            # Upload lên Gemini
-            uploaded_file = self.client.files.upload(file=temp_file_path)
-            
-            # Đợi xử lý
-            while uploaded_file.state.name == "PROCESSING":
-                time.sleep(0.5)
-                uploaded_file = self.client.files.get(name=uploaded_file.name)
-            
-            # Generate content
-            response = self.client.models.generate_content(
-                model='gemini-3-flash-preview',
-                contents=[system_prompt, uploaded_file]
-            )
+            # Upload lên Gemini (blocking calls run in a thread so other requests keep being served)
+            uploaded_file = await asyncio.to_thread(self._upload_file, upload_path)
             
-            clean_res = self._clean_json_string(response.text)
+            # Generate content, escalating to stronger models while the answer is unusable
+            contents = [system_prompt, uploaded_file]
 
             # await asyncio.sleep(10)
 
-            return json.loads(clean_res)
+            return await asyncio.to_thread(
+                image_model_router.generate,
+                lambda model, timeout: self._generate_structured(model, contents, type, timeout),
+                self._check_income if type == "INCOME" else self._check_expense,
+            )
             # return {
             #     "transaction_date": "2026-01-11",
             #     "user_from": "Phạm ĐÌnh Hưng",
@@ -270,9 +506,12 @@ class GeminiService:
             #     "amount": 251000,
             #     "description": "Pham Dinh Hung chuyen"
             # }
+        except HTTPException:
+            raise
         except Exception as e:
             print('error', e)
             raise HTTPException(status_code=500, detail=str(e))
         finally:
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            for path in (temp_file_path, prepared_file_path):
+                if path and os.path.exists(path):
+                    os.unlink(path)
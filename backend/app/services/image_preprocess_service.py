@@ -0,0 +1,209 @@
+"""Receipt image preprocessing before AI extraction."""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Optional, Tuple, Dict, Any
+
+from PIL import Image, ImageOps, ImageStat
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+EXIF_ORIENTATION_TAG = 0x0112
+OUTPUT_SUFFIXES = {"JPEG": ".jpg", "WEBP": ".webp"}
+OUTPUT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class PreprocessOptions:
+    """Options for a single preprocessing run (must stay picklable)."""
+    max_edge: int = 1600
+    output_format: str = "JPEG"
+    quality: int = 80
+    grayscale: str = "auto"
+    grayscale_max_saturation: int = 24
+
+    @classmethod
+    def from_settings(cls) -> "PreprocessOptions":
+        output_format = settings.IMAGE_OUTPUT_FORMAT if settings.IMAGE_OUTPUT_FORMAT in OUTPUT_SUFFIXES else "JPEG"
+        return cls(
+            max_edge=settings.IMAGE_MAX_EDGE,
+            output_format=output_format,
+            quality=settings.IMAGE_QUALITY,
+            grayscale=settings.IMAGE_GRAYSCALE,
+            grayscale_max_saturation=settings.IMAGE_GRAYSCALE_MAX_SATURATION,
+        )
+
+
+@dataclass
+class PreprocessResult:
+    """Outcome of preprocessing one image."""
+    path: str
+    mime_type: Optional[str]
+    original_bytes: int
+    output_bytes: int
+    original_size: Tuple[int, int]
+    output_size: Tuple[int, int]
+    rotated: bool
+    grayscale: bool
+    elapsed_ms: float
+    # False when the original file is kept (e.g. re-encoding would not help)
+    converted: bool = True
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.output_bytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("path", None)
+        data["bytes_saved"] = self.bytes_saved
+        return data
+
+
+def _is_near_grayscale(image: Image.Image, max_saturation: int) -> bool:
+    """Check whether an image carries little colour information."""
+    sample = image.copy()
+    sample.thumbnail((64, 64))
+    saturation = sample.convert("HSV").getchannel("S")
+    return ImageStat.Stat(saturation).mean[0] <= max_saturation
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """Convert any mode to RGB/L, compositing transparency onto white."""
+    if image.mode in ("RGB", "L"):
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def preprocess_image_file(src_path: str, options: PreprocessOptions) -> PreprocessResult:
+    """
+    Auto-rotate, downscale, optionally grayscale and recompress an image.
+
+    Runs in a worker process, so it only takes and returns picklable values.
+    The output is written to a new temporary file that the caller must delete.
+
+    Args:
+        src_path: Path of the uploaded image
+        options: Preprocessing options
+
+    Returns:
+        PreprocessResult describing the output file
+    """
+    started = time.perf_counter()
+    original_bytes = os.path.getsize(src_path)
+
+    with Image.open(src_path) as source:
+        original_size = source.size
+        rotated = source.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1
+        image = ImageOps.exif_transpose(source)
+        image = _flatten(image)
+
+        if options.max_edge and max(image.size) > options.max_edge:
+            image.thumbnail((options.max_edge, options.max_edge), Image.Resampling.LANCZOS)
+
+        grayscale = image.mode == "L"
+        if not grayscale and (
+            options.grayscale == "always"
+            or (options.grayscale == "auto" and _is_near_grayscale(image, options.grayscale_max_saturation))
+        ):
+            image = image.convert("L")
+            grayscale = True
+
+        suffix = OUTPUT_SUFFIXES[options.output_format]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as output_file:
+            output_path = output_file.name
+            image.save(output_file, format=options.output_format, quality=options.quality, optimize=True)
+
+    output_bytes = os.path.getsize(output_path)
+    output_size = image.size
+
+    # Re-encoding an already small, upright image can make it bigger; keep the original then
+    if output_bytes >= original_bytes and output_size == original_size and not rotated:
+        os.unlink(output_path)
+        return PreprocessResult(
+            path=src_path,
+            mime_type=None,
+            original_bytes=original_bytes,
+            output_bytes=original_bytes,
+            original_size=original_size,
+            output_size=original_size,
+            rotated=False,
+            grayscale=False,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+            converted=False,
+        )
+
+    return PreprocessResult(
+        path=output_path,
+        mime_type=OUTPUT_MIME_TYPES[options.output_format],
+        original_bytes=original_bytes,
+        output_bytes=output_bytes,
+        original_size=original_size,
+        output_size=output_size,
+        rotated=rotated,
+        grayscale=grayscale,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+def get_image_executor() -> ProcessPoolExecutor:
+    """Get the process-wide pool used for image CPU work."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(1, settings.IMAGE_PREPROCESS_WORKERS))
+    return _executor
+
+
+class ImagePreprocessService:
+    """Shrink uploaded bill photos before they are sent to Gemini."""
+
+    def __init__(self, options: Optional[PreprocessOptions] = None):
+        self.options = options or PreprocessOptions.from_settings()
+
+    async def preprocess(self, src_path: str) -> Optional[PreprocessResult]:
+        """
+        Preprocess an image in the process pool without blocking the event loop.
+
+        Args:
+            src_path: Path of the uploaded image
+
+        Returns:
+            PreprocessResult, or None when preprocessing is disabled or failed
+            (callers should then use the original file)
+        """
+        if not settings.IMAGE_PREPROCESS_ENABLED:
+            return None
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(get_image_executor(), preprocess_image_file, src_path, self.options)
+        except Exception as exc:
+            logger.warning("Image preprocessing failed for %s, using original: %s", src_path, exc)
+            return None
+
+        logger.info(
+            "Image preprocessed: %d -> %d bytes (saved %d), %sx%s -> %sx%s, rotated=%s, grayscale=%s, %.1f ms",
+            result.original_bytes,
+            result.output_bytes,
+            result.bytes_saved,
+            *result.original_size,
+            *result.output_size,
+            result.rotated,
+            result.grayscale,
+            result.elapsed_ms,
+        )
+        return result
@@ -0,0 +1,85 @@
+"""Load allocation inputs, run the allocation engine and persist its output."""
+from typing import Any, Dict, List, Optional
+
+from app.services.allocation_engine import AllocationResult, Payment, allocate_payments
+from app.services.debt_service import DebtService
+from app.services.member_fee_service import MemberFeeService
+from app.services.transaction_entry_service import TransactionEntryService
+
+# Keep `in_` filters well below URL length limits
+USER_ID_CHUNK_SIZE = 200
+
+
+class LedgerAllocationService:
+    """Shared allocation path for every way a payment can enter the fund."""
+
+    def __init__(self):
+        self.transaction_entry_service = TransactionEntryService()
+        self.debt_service = DebtService()
+        self.member_fee_service = MemberFeeService()
+
+    def plan(self, payments: List[Payment]) -> AllocationResult:
+        """
+        Compute the ledger rows for a batch of payments without writing anything.
+        
+        Fee schedules, FUND/EXEMPT entries and unpaid debts of every member in
+        the batch are loaded with one query per table (per chunk of members).
+        
+        Args:
+            payments: Payments in chronological order
+            
+        Returns:
+            AllocationResult
+        """
+        user_ids = sorted({payment.user_id for payment in payments})
+        if not user_ids:
+            return AllocationResult()
+
+        schedules = self.member_fee_service.get_fee_schedules(user_ids)
+        entries: List[Dict[str, Any]] = []
+        debts: List[Dict[str, Any]] = []
+        for start in range(0, len(user_ids), USER_ID_CHUNK_SIZE):
+            chunk = user_ids[start:start + USER_ID_CHUNK_SIZE]
+            entries.extend(self.transaction_entry_service._fetch_all_pages(
+                lambda: self.transaction_entry_service.client.table("transaction_entries")
+                .select("id, user_id, type, period_month")
+                .in_("user_id", chunk)
+                .in_("type", ["FUND", "EXEMPT"])
+                .order("id")
+            ))
+            debts.extend(
+                self.debt_service.client.table("debts").select("*")
+                .in_("user_id", chunk).eq("is_fully_paid", False).execute().data
+            )
+
+        return allocate_payments(payments, schedules, entries, debts)
+
+    def apply(self, result: AllocationResult, batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Persist an allocation: insert its entries and settle its debts.
+        
+        Args:
+            result: Output of plan()
+            batch_size: Entries per insert request (default BULK_CHUNK_SIZE)
+            
+        Returns:
+            Created entries
+        """
+        created = self.transaction_entry_service.create_transaction_entries(result.entries, chunk_size=batch_size)
+        if result.settled_debt_ids:
+            self.debt_service.settle_debts(result.settled_debt_ids)
+        return created
+
+    def allocate(self, payments: List[Payment]) -> AllocationResult:
+        """
+        Plan and apply a batch of payments.
+        
+        Args:
+            payments: Payments in chronological order
+            
+        Returns:
+            AllocationResult that was applied
+        """
+        result = self.plan(payments)
+        self.apply(result)
+        return result
@@ -0,0 +1,21 @@
+"""Single hook for writes that change ledger totals of some months."""
+from typing import Iterable, Optional
+
+from app.core.invalidation import invalidation_bus
+from app.services.analytics_service import LEDGER_MONTHS
+from app.services.balance_snapshot_service import invalidate_balance_snapshots
+
+
+def ledger_months_changed(months: Optional[Iterable[Optional[str]]] = None) -> None:
+    """
+    Drop everything derived from the totals of the given months.
+
+    Stale balance snapshots are deleted from the database once; cached
+    monthly totals are dropped in every worker through the invalidation bus.
+
+    Args:
+        months: Dates or months (YYYY-MM[-DD]) touched by a write; None means unknown (everything)
+    """
+    months = None if months is None else [month for month in months if month]
+    invalidate_balance_snapshots(months)
+    invalidation_bus.publish(LEDGER_MONTHS, keys=months)
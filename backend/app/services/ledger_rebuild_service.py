@@ -0,0 +1,214 @@
+"""Recompute FUND allocations of past income from the current fee schedules."""
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.event_bus import publish_event
+from app.services.allocation_engine import Payment, allocate_payments
+from app.services.base_service import BaseService
+from app.services.ledger_changes import ledger_months_changed
+from app.services.member_fee_service import MemberFeeService
+
+
+logger = logging.getLogger(__name__)
+
+ENTRY_COLUMNS = "id, transaction_id, debt_id, user_id, amount, type, period_month"
+
+
+@dataclass
+class LedgerDiff:
+    """Differences between the stored ledger and a replay of the allocation rules."""
+    to_insert: List[Dict[str, Any]] = field(default_factory=list)
+    to_update: List[Dict[str, Any]] = field(default_factory=list)
+    to_delete: List[Dict[str, Any]] = field(default_factory=list)
+    transactions: int = 0
+    entries_scanned: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.to_insert or self.to_update or self.to_delete)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "transactions": self.transactions,
+            "entries_scanned": self.entries_scanned,
+            "insert": len(self.to_insert),
+            "update": len(self.to_update),
+            "delete": len(self.to_delete),
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "transactions_per_minute": int(self.transactions / self.elapsed_seconds * 60) if self.elapsed_seconds else None,
+        }
+
+
+class LedgerRebuildService(BaseService):
+    """
+    Replay every COMPLETED member income through the allocation engine and
+    reconcile transaction_entries with the result.
+
+    Only FUND entries linked to those transactions are recomputed. Everything
+    else is an input that stays untouched:
+    - EXEMPT entries and FUND entries without a replayed transaction count as
+      months already covered,
+    - DEBT entries keep their amount and debt, and that amount is taken off
+      the payment before its FUND months are recomputed.
+    """
+
+    def __init__(self):
+        super().__init__(table_name="transaction_entries")
+        self.member_fee_service = MemberFeeService()
+
+    def compute_diff(self, user_id: Optional[int] = None, page_size: int = 1000) -> LedgerDiff:
+        """
+        Compute what the ledger should look like without writing anything.
+
+        Args:
+            user_id: Restrict the rebuild to one member
+            page_size: Rows per read request
+
+        Returns:
+            LedgerDiff
+        """
+        started = time.perf_counter()
+        diff = LedgerDiff()
+
+        # First pass keeps ids only; the rows are streamed into the engine afterwards
+        transaction_ids: Set[int] = set()
+        user_ids: Set[int] = set()
+        for transaction in self._iter_by_id(lambda: self._income_query(user_id, "id, user_id"), page_size):
+            transaction_ids.add(transaction["id"])
+            user_ids.add(transaction["user_id"])
+        diff.transactions = len(transaction_ids)
+
+        fixed_entries: List[Dict[str, Any]] = []
+        debt_paid: Dict[int, int] = defaultdict(int)
+        current_fund: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        for entry in self._iter_entries(user_id, page_size):
+            diff.entries_scanned += 1
+            entry_type = entry.get("type")
+            if entry_type == "DEBT":
+                debt_paid[entry.get("transaction_id")] += entry.get("amount") or 0
+            elif entry_type == "FUND" and entry.get("transaction_id") in transaction_ids:
+                current_fund[(entry["transaction_id"], entry.get("period_month"))] = entry
+            elif entry_type in ("FUND", "EXEMPT"):
+                fixed_entries.append(entry)
+
+        schedules = self.member_fee_service.get_fee_schedules(sorted(user_ids)) if user_ids else []
+
+        payments = (
+            Payment(
+                transaction_id=transaction["id"],
+                user_id=transaction["user_id"],
+                amount=max((transaction.get("amount") or 0) - debt_paid.get(transaction["id"], 0), 0),
+                as_of_month=transaction["transaction_date"][:7],
+            )
+            for transaction in self._iter_income(user_id, page_size)
+            # Income committed after the first pass waits for the next rebuild
+            if transaction["id"] in transaction_ids
+        )
+        # DEBT settlement is left as it is, so no debt is offered to the engine
+        result = allocate_payments(payments, schedules, fixed_entries, [])
+
+        for entry in result.entries:
+            if entry["type"] != "FUND":
+                continue
+            existing = current_fund.pop((entry["transaction_id"], entry["period_month"]), None)
+            if existing is None:
+                diff.to_insert.append(entry)
+            elif existing.get("amount") != entry["amount"] or existing.get("user_id") != entry["user_id"]:
+                diff.to_update.append({**existing, "amount": entry["amount"], "user_id": entry["user_id"]})
+        diff.to_delete = list(current_fund.values())
+
+        diff.elapsed_seconds = time.perf_counter() - started
+        return diff
+
+    def apply_diff(self, diff: LedgerDiff, batch_size: int = 500) -> None:
+        """
+        Write a diff in batches: deletes, then updates, then inserts.
+
+        Args:
+            diff: Output of compute_diff()
+            batch_size: Rows per write request
+        """
+        if diff.is_empty:
+            return
+
+        self.delete_many([entry["id"] for entry in diff.to_delete], chunk_size=batch_size)
+        # Updated entries only differ in amount and user_id: one update_many per pair
+        updates: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for entry in diff.to_update:
+            updates[(entry["amount"], entry["user_id"])].append(entry["id"])
+        for (amount, user_id), ids in updates.items():
+            self.update_many(ids, {"amount": amount, "user_id": user_id}, chunk_size=batch_size)
+        self.create_many(diff.to_insert, chunk_size=batch_size)
+
+        ledger_months_changed()
+        publish_event("stats.changed")
+        logger.info("Ledger rebuild applied: %s", diff.summary())
+
+    def rebuild(self, dry_run: bool = True, user_id: Optional[int] = None, batch_size: int = 500) -> LedgerDiff:
+        """
+        Compute the diff and, unless dry_run, apply it.
+
+        Args:
+            dry_run: Only report the differences
+            user_id: Restrict the rebuild to one member
+            batch_size: Rows per read/write request
+
+        Returns:
+            LedgerDiff
+        """
+        diff = self.compute_diff(user_id=user_id, page_size=max(batch_size, 1000))
+        logger.info("Ledger rebuild %s: %s", "dry run" if dry_run else "diff", diff.summary())
+        if not dry_run:
+            self.apply_diff(diff, batch_size=batch_size)
+        return diff
+
+    def _income_query(self, user_id: Optional[int], columns: str):
+        query = (
+            self.client.table("transactions")
+            .select(columns)
+            .eq("type", "INCOME")
+            .eq("status", "COMPLETED")
+            .not_.is_("user_id", "null")
+            .not_.is_("transaction_date", "null")
+        )
+        if user_id is not None:
+            query = query.eq("user_id", user_id)
+        return query
+
+    def _iter_income(self, user_id: Optional[int], page_size: int) -> Iterator[Dict[str, Any]]:
+        # Keyset pagination on (transaction_date, id), the order payments are replayed in
+        last: Optional[Dict[str, Any]] = None
+        while True:
+            query = self._income_query(user_id, "id, user_id, amount, transaction_date")
+            if last is not None:
+                query = query.or_(
+                    f"transaction_date.gt.{last['transaction_date']},"
+                    f"and(transaction_date.eq.{last['transaction_date']},id.gt.{last['id']})"
+                )
+            page = query.order("transaction_date").order("id").limit(page_size).execute().data
+            yield from page
+            if len(page) < page_size:
+                return
+            last = page[-1]
+
+    def _iter_entries(self, user_id: Optional[int], page_size: int) -> Iterator[Dict[str, Any]]:
+        def query():
+            query = self.client.table(self.table_name).select(ENTRY_COLUMNS)
+            return query.eq("user_id", user_id) if user_id is not None else query
+
+        return self._iter_by_id(query, page_size)
+
+    @staticmethod
+    def _iter_by_id(query: Callable[[], Any], page_size: int) -> Iterator[Dict[str, Any]]:
+        # Keyset pagination on id: pages stay cheap however large the table is
+        last_id = 0
+        while True:
+            page = query().gt("id", last_id).order("id").limit(page_size).execute().data
+            yield from page
+            if len(page) < page_size:
+                return
+            last_id = page[-1]["id"]
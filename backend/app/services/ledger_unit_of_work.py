@@ -0,0 +1,331 @@
+"""Collect the ledger writes of payments and commit them all at once."""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.tenancy import get_current_fund_id
+from app.models import TransactionCreate
+from app.services.allocation_engine import AllocationResult
+from app.services.debt_service import DebtService
+from app.services.transaction_entry_service import TransactionEntryService
+from app.services.transaction_service import TransactionService
+
+
+logger = logging.getLogger(__name__)
+
+COMMIT_FUNCTION = "commit_ledger_payments"
+
+# PostgREST error code of a function that does not exist (sql/ledger_unit_of_work.sql not applied)
+FUNCTION_NOT_FOUND = "PGRST202"
+
+# Raised by commit_ledger_payments when a planned month or debt was taken meanwhile, and the
+# unique_violation of transaction_entries_member_month_key that backs it up
+CONFLICT_CODES = ("PT409", "23505")
+
+# Plans tried per payment before a conflict is given up on
+COMMIT_ATTEMPTS = 3
+
+
+class LedgerConflictError(Exception):
+    """A concurrent payment of the same member allocated the planned months or debts first."""
+
+
+@dataclass
+class LedgerCommit:
+    """Rows written for one payment of a unit of work."""
+    transaction: Dict[str, Any]
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    settled_debts: List[Dict[str, Any]] = field(default_factory=list)
+    # The existing transaction already had its entries: only its row was updated
+    already_allocated: bool = False
+    # Date of an existing transaction before it was completed
+    previous_transaction_date: Optional[str] = None
+
+
+@dataclass
+class _PendingPayment:
+    transaction: Dict[str, Any]
+    # Set when an existing transaction is completed instead of a new one created
+    transaction_id: Optional[int] = None
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    settle_debt_ids: List[int] = field(default_factory=list)
+
+
+class LedgerUnitOfWork:
+    """
+    The writes of one or more payments: per payment, its transaction
+    (new, or an existing PENDING one completed), its allocation entries and
+    the debts they settle.
+
+    Nothing is written until commit(), which sends everything to the
+    commit_ledger_payments function in one request: the database applies
+    it in a single transaction, so a failure leaves no half-written
+    ledger. An existing transaction that already has entries keeps them
+    (the check runs inside that transaction), so completing a payment is
+    safe to repeat. Payments of the same member are serialized there, and
+    a plan whose months or debts a concurrent payment took first raises
+    LedgerConflictError (see commit_with_replan). A database without the function is an error, unless
+    LEDGER_COMMIT_SEQUENTIAL opts into sequential writes that are undone
+    (best effort) when a later one fails. Caches and events are only
+    notified once the commit succeeded.
+    """
+
+    def __init__(self):
+        self.transaction_service = TransactionService()
+        self.transaction_entry_service = TransactionEntryService()
+        self.debt_service = DebtService()
+        self._payments: List[_PendingPayment] = []
+
+    def add_transaction(self, transaction: TransactionCreate) -> None:
+        """
+        Start a payment that creates a transaction.
+
+        Args:
+            transaction: Transaction to create
+        """
+        self._payments.append(_PendingPayment(transaction=transaction.model_dump()))
+
+    def complete_transaction(self, transaction_id: int, transaction: TransactionCreate) -> None:
+        """
+        Start a payment that updates an existing transaction (e.g. a PENDING PayOS one).
+
+        Args:
+            transaction_id: Transaction to update
+            transaction: New values; fields left None are kept
+        """
+        self._payments.append(_PendingPayment(transaction=transaction.model_dump(exclude_none=True), transaction_id=transaction_id))
+
+    def add_allocation(self, result: AllocationResult, transaction_id: Optional[int] = None) -> None:
+        """
+        Add entries and debt settlements of an allocation to the last payment started.
+
+        The entries are linked to the transaction of that payment whatever
+        transaction_id they were planned with.
+
+        Args:
+            result: Output of LedgerAllocationService.plan()
+            transaction_id: Only take the entries planned for this transaction (plans covering several payments)
+        """
+        if not self._payments:
+            raise ValueError("Add a transaction before its allocation")
+        payment = self._payments[-1]
+        entries = result.entries if transaction_id is None else result.entries_for(transaction_id)
+        payment.entries.extend({key: value for key, value in entry.items() if key != "transaction_id"} for entry in entries)
+        if transaction_id is None:
+            payment.settle_debt_ids.extend(result.settled_debt_ids)
+        else:
+            payment.settle_debt_ids.extend(entry["debt_id"] for entry in entries if entry["type"] == "DEBT" and entry.get("debt_id"))
+
+    def commit(self) -> List[LedgerCommit]:
+        """
+        Write everything collected, all or nothing.
+
+        Returns:
+            One LedgerCommit per payment, in the order they were added
+
+        Raises:
+            ValueError: No payment was added
+            LedgerConflictError: A planned month or debt was allocated meanwhile; nothing was written
+            RuntimeError: commit_ledger_payments is not installed and LEDGER_COMMIT_SEQUENTIAL is off
+        """
+        if not self._payments:
+            raise ValueError("A ledger unit of work needs a transaction")
+
+        if settings.LEDGER_COMMIT_SEQUENTIAL:
+            commits = self._commit_sequential()
+        else:
+            try:
+                commits = self._commit_function()
+            except Exception as e:
+                if getattr(e, "code", None) != FUNCTION_NOT_FOUND:
+                    raise
+                raise RuntimeError(
+                    f"{COMMIT_FUNCTION} is not installed: apply sql/ledger_unit_of_work.sql "
+                    "(or set LEDGER_COMMIT_SEQUENTIAL=true to accept non-atomic payment writes)"
+                ) from e
+
+        self._publish(commits)
+        return commits
+
+    def _commit_function(self) -> List[LedgerCommit]:
+        try:
+            data = self._call_function()
+        except Exception as e:
+            if getattr(e, "code", None) in CONFLICT_CODES:
+                raise LedgerConflictError(str(e)) from e
+            raise
+        return [
+            LedgerCommit(
+                transaction=item["transaction"],
+                entries=item.get("entries") or [],
+                settled_debts=item.get("debts") or [],
+                already_allocated=bool(item.get("already_allocated")),
+                previous_transaction_date=item.get("previous_transaction_date"),
+            )
+            for item in data
+        ]
+
+    def _call_function(self) -> List[Dict[str, Any]]:
+        return self.transaction_service.client.rpc(COMMIT_FUNCTION, {
+            "p_fund_id": get_current_fund_id(),
+            "p_payments": [
+                {
+                    "transaction": payment.transaction,
+                    "transaction_id": payment.transaction_id,
+                    "entries": payment.entries,
+                    "settle_debt_ids": payment.settle_debt_ids,
+                }
+                for payment in self._payments
+            ],
+        }).execute().data
+
+    def _commit_sequential(self) -> List[LedgerCommit]:
+        table = self.transaction_service.client.table
+        existing_ids = [payment.transaction_id for payment in self._payments if payment.transaction_id is not None]
+        previous = self.transaction_service.get_by_ids(existing_ids) if existing_ids else {}
+        missing = [transaction_id for transaction_id in existing_ids if transaction_id not in previous]
+        if missing:
+            raise ValueError(f"Transactions not found: {missing}")
+        allocated = {
+            entry["transaction_id"]
+            for entry in (table("transaction_entries").select("transaction_id").in_("transaction_id", existing_ids).execute().data if existing_ids else [])
+        }
+        # No lock here: this only narrows the window that the unique index closes
+        self._check_not_taken([payment for payment in self._payments if payment.transaction_id not in allocated])
+
+        commits: List[Optional[LedgerCommit]] = [None] * len(self._payments)
+        created: List[Dict[str, Any]] = []
+        updated: List[Dict[str, Any]] = []
+        try:
+            new_positions = [position for position, payment in enumerate(self._payments) if payment.transaction_id is None]
+            if new_positions:
+                created = table("transactions").insert([self._payments[position].transaction for position in new_positions]).execute().data
+                for position, transaction in zip(new_positions, created):
+                    commits[position] = LedgerCommit(transaction=transaction)
+
+            for position, payment in enumerate(self._payments):
+                if payment.transaction_id is None:
+                    continue
+                transaction = table("transactions").update(payment.transaction).eq("id", payment.transaction_id).execute().data[0]
+                updated.append(previous[payment.transaction_id])
+                commits[position] = LedgerCommit(
+                    transaction=transaction,
+                    already_allocated=payment.transaction_id in allocated,
+                    previous_transaction_date=previous[payment.transaction_id].get("transaction_date"),
+                )
+
+            entries = [
+                {**entry, "transaction_id": commit.transaction["id"]}
+                for payment, commit in zip(self._payments, commits)
+                if not commit.already_allocated
+                for entry in payment.entries
+            ]
+            if entries:
+                by_transaction: Dict[int, List[Dict[str, Any]]] = {}
+                for entry in table("transaction_entries").insert(entries).execute().data:
+                    by_transaction.setdefault(entry["transaction_id"], []).append(entry)
+                for commit in commits:
+                    commit.entries = by_transaction.get(commit.transaction["id"], [])
+
+            debt_ids = [
+                debt_id
+                for payment, commit in zip(self._payments, commits)
+                if not commit.already_allocated
+                for debt_id in payment.settle_debt_ids
+            ]
+            if debt_ids:
+                settled = {
+                    debt["id"]: debt
+                    for debt in table("debts").update({"is_fully_paid": True}).in_("id", debt_ids).eq("is_fully_paid", False).execute().data
+                }
+                for payment, commit in zip(self._payments, commits):
+                    if not commit.already_allocated:
+                        commit.settled_debts = [settled[debt_id] for debt_id in payment.settle_debt_ids if debt_id in settled]
+            return commits
+        except Exception as e:
+            self._undo(created, updated, [commit for commit in commits if commit is not None])
+            if getattr(e, "code", None) in CONFLICT_CODES:
+                raise LedgerConflictError(str(e)) from e
+            raise
+
+    def _check_not_taken(self, payments: List[_PendingPayment]) -> None:
+        table = self.transaction_service.client.table
+        entries = [entry for payment in payments for entry in payment.entries]
+        planned = {(entry["user_id"], entry["period_month"]) for entry in entries if entry["type"] in ("FUND", "EXEMPT")}
+        if planned:
+            covered = (
+                table("transaction_entries").select("user_id, period_month")
+                .in_("type", ["FUND", "EXEMPT"])
+                .in_("user_id", sorted({user_id for user_id, _ in planned}))
+                .in_("period_month", sorted({month for _, month in planned}))
+                .execute().data
+            )
+            if any((entry["user_id"], entry["period_month"]) in planned for entry in covered):
+                raise LedgerConflictError("ledger months already allocated")
+        debt_ids = sorted({entry["debt_id"] for entry in entries if entry["type"] == "DEBT" and entry.get("debt_id")})
+        if debt_ids and table("debts").select("id").in_("id", debt_ids).eq("is_fully_paid", True).execute().data:
+            raise LedgerConflictError("debts already settled")
+
+    def _undo(self, created: List[Dict[str, Any]], updated: List[Dict[str, Any]], commits: List[LedgerCommit]) -> None:
+        table = self.transaction_service.client.table
+        queries = []
+        debt_ids = [debt["id"] for commit in commits for debt in commit.settled_debts]
+        entry_ids = [entry["id"] for commit in commits for entry in commit.entries]
+        if debt_ids:
+            queries.append(table("debts").update({"is_fully_paid": False}).in_("id", debt_ids))
+        if entry_ids:
+            queries.append(table("transaction_entries").delete().in_("id", entry_ids))
+        for transaction in updated:
+            restored = {key: transaction.get(key) for key in ("type", "description", "amount", "user_id", "transaction_date", "status")}
+            queries.append(table("transactions").update(restored).eq("id", transaction["id"]))
+        if created:
+            queries.append(table("transactions").delete().in_("id", [transaction["id"] for transaction in created]))
+        for query in queries:
+            try:
+                query.execute()
+            except Exception as e:
+                logger.error("Failed to undo a ledger write: %s", e, exc_info=True)
+
+    def _publish(self, commits: List[LedgerCommit]) -> None:
+        created = [commit.transaction for payment, commit in zip(self._payments, commits) if payment.transaction_id is None]
+        completed = [commit for payment, commit in zip(self._payments, commits) if payment.transaction_id is not None]
+        self.transaction_service._mark_changed()
+        if created:
+            self.transaction_service._publish_created(created)
+        if completed:
+            self.transaction_service._publish_updated(
+                [commit.transaction for commit in completed],
+                [commit.previous_transaction_date for commit in completed],
+            )
+
+        entries = [entry for commit in commits for entry in commit.entries]
+        if entries:
+            self.transaction_entry_service._mark_changed()
+            self.transaction_entry_service._publish_allocated(entries)
+        settled = [debt for commit in commits for debt in commit.settled_debts]
+        if settled:
+            self.debt_service._mark_changed()
+            self.debt_service._publish_settled(settled)
+
+
+def commit_with_replan(build: Callable[[bool], LedgerUnitOfWork]) -> List[LedgerCommit]:
+    """
+    Commit a unit of work, planning its allocation again when a concurrent payment got there first.
+
+    Args:
+        build: Returns the unit of work to commit; called with True after a conflict, when it must plan again
+
+    Returns:
+        Output of LedgerUnitOfWork.commit()
+
+    Raises:
+        LedgerConflictError: Still conflicting after COMMIT_ATTEMPTS plans
+    """
+    for attempt in range(1, COMMIT_ATTEMPTS + 1):
+        try:
+            return build(attempt > 1).commit()
+        except LedgerConflictError as e:
+            if attempt == COMMIT_ATTEMPTS:
+                raise
+            logger.info("Ledger commit conflicted with a concurrent payment (%s); planning again", e)
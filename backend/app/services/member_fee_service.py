@@ -3,6 +3,7 @@ from typing import Any, Dict, List, Optional
 import logging
 
 from app.constants import MONTHLY_FEE
+from app.core.config import settings
 from app.services.base_service import BaseService
 
 
@@ -12,18 +13,24 @@ logger = logging.getLogger(__name__)
 class MemberFeeService(BaseService):
     """Resolve monthly fund fees from member fee schedules."""
 
+    # Schedules change a few times a year but are read by every contribution view
+    query_cache_ttl = settings.QUERY_CACHE_FEE_SCHEDULES_TTL_SECONDS
+    query_cache_max_entries = settings.QUERY_CACHE_MAX_ENTRIES
+
     def __init__(self):
         super().__init__(table_name="member_fee_schedules")
 
     def get_fee_schedules(self, user_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
-        query = self.client.table(self.table_name).select("*")
+        def load() -> List[Dict[str, Any]]:
+            query = self.client.table(self.table_name).select("*")
+
+            if user_ids:
+                query = query.in_("user_id", user_ids)
 
-        if user_ids:
-            query = query.in_("user_id", user_ids)
+            return query.order("effective_from_month", desc=True).execute().data
 
         try:
-            response = query.order("effective_from_month", desc=True).execute()
-            return response.data
+            return self._cached("get_fee_schedules", load, user_ids=frozenset(user_ids or ()))
         except Exception as exc:
             logger.warning("Failed to load member fee schedules, using default fee: %s", exc)
             return []
@@ -66,6 +73,56 @@ class MemberFeeService(BaseService):
         monthly_fee = user_schedules[0].get("monthly_fee")
         return int(monthly_fee) if monthly_fee is not None else MONTHLY_FEE
 
+    def get_monthly_fee_series(
+        self,
+        user_id: int,
+        period_months: List[str],
+        schedules: List[Dict[str, Any]],
+    ) -> List[int]:
+        """
+        Resolve the monthly fee for many months of one user at once.
+        
+        Same rules as get_monthly_fee, but the user's schedules are filtered
+        and sorted once instead of once per month.
+        
+        Args:
+            user_id: User ID
+            period_months: Months (YYYY-MM) to resolve
+            schedules: Preloaded fee schedules
+            
+        Returns:
+            Fee for each month, aligned with period_months
+        """
+        user_schedules = sorted(
+            (
+                schedule for schedule in schedules
+                if schedule.get("user_id") == user_id and schedule.get("effective_from_month")
+            ),
+            key=lambda schedule: (
+                schedule.get("effective_from_month") or "",
+                schedule.get("created_at") or "",
+                schedule.get("id") or 0,
+            ),
+            reverse=True,
+        )
+
+        fees = []
+        for period_month in period_months:
+            schedule = next(
+                (
+                    schedule for schedule in user_schedules
+                    if schedule["effective_from_month"] <= period_month
+                    and (
+                        not schedule.get("effective_to_month")
+                        or schedule.get("effective_to_month") >= period_month
+                    )
+                ),
+                None,
+            )
+            monthly_fee = schedule.get("monthly_fee") if schedule else None
+            fees.append(int(monthly_fee) if monthly_fee is not None else MONTHLY_FEE)
+        return fees
+
     def get_first_effective_month(
         self,
         user_id: int,
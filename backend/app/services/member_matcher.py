@@ -0,0 +1,82 @@
+"""Match free-text sender names (bank statements, transfer notes) to members."""
+import difflib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.text import normalize_text
+
+
+class MemberMatcher:
+    """
+    Local, deterministic name matching; no AI call involved.
+
+    Names and texts are compared after normalize_text, so case and
+    diacritics never matter ("NGUYEN VAN AN" matches "Nguyễn Văn An").
+    Scores:
+    - 1.0 when the whole text is the member name,
+    - 0.95 when the name appears as whole words inside the text,
+    - otherwise the best difflib ratio between the name and any run of words
+      of the same length in the text (catches typos and missing letters).
+    A match is only returned when it reaches min_score and is unambiguous;
+    on equal scores the longer name wins ("Nguyen Van An" over "An").
+    """
+
+    def __init__(self, users: Iterable[Dict[str, Any]], min_score: Optional[float] = None):
+        self.min_score = settings.NAME_MATCH_MIN_SCORE if min_score is None else min_score
+        self._members: List[Tuple[int, str, List[str]]] = []
+        for user in users:
+            name = normalize_text(user.get("name") or "")
+            if user.get("id") is not None and name:
+                self._members.append((user["id"], name, name.split(" ")))
+
+    def score(self, text: str) -> List[Tuple[int, float]]:
+        """
+        Score every member against a text.
+
+        Args:
+            text: Sender name or transfer description
+
+        Returns:
+            (user_id, score) pairs, best first
+        """
+        return [(user_id, score) for user_id, score, _ in self._score(text)]
+
+    def _score(self, text: str) -> List[Tuple[int, float, int]]:
+        normalized = normalize_text(text or "")
+        if not normalized:
+            return []
+
+        words = normalized.split(" ")
+        padded = f" {normalized} "
+        scores = []
+        for user_id, name, name_words in self._members:
+            if normalized == name:
+                score = 1.0
+            elif f" {name} " in padded:
+                score = 0.95
+            else:
+                width = len(name_words)
+                windows = (" ".join(words[i:i + width]) for i in range(max(len(words) - width + 1, 1)))
+                score = max(difflib.SequenceMatcher(None, name, window).ratio() for window in windows)
+            scores.append((user_id, score, len(name)))
+        scores.sort(key=lambda item: (item[1], item[2]), reverse=True)
+        return scores
+
+    def match(self, *texts: Optional[str]) -> Optional[int]:
+        """
+        Find the member referred to by the first text that matches unambiguously.
+
+        Args:
+            *texts: Candidate texts, most specific first (e.g. sender column, then description)
+
+        Returns:
+            user_id or None
+        """
+        for text in texts:
+            scores = self._score(text or "")
+            if not scores or scores[0][1] < self.min_score:
+                continue
+            if len(scores) > 1 and scores[1][1:] == scores[0][1:]:
+                continue
+            return scores[0][0]
+        return None
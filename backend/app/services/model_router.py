@@ -0,0 +1,224 @@
+"""Route Gemini calls to the cheapest model tier that gives a usable answer."""
+import logging
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+from pydantic import ValidationError
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# call(model, timeout_seconds) -> (answer, confidence or None)
+TierCall = Callable[[str, float], Tuple[T, Optional[float]]]
+# check(answer) -> escalation reason, or None when the answer is usable
+AnswerCheck = Callable[[T], Optional[str]]
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    """A model and the latency it must answer within."""
+    model: str
+    latency_slo_seconds: float
+
+
+def parse_tiers(spec: str) -> List[ModelTier]:
+    """
+    Parse a tier list from Settings.
+
+    Args:
+        spec: Comma-separated model:latency_slo_seconds, cheapest first
+
+    Returns:
+        Tiers in order
+    """
+    tiers = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, slo = item.rpartition(":")
+        if not model:
+            raise ValueError(f"Model tier needs a latency SLO (model:seconds): {item}")
+        tiers.append(ModelTier(model=model, latency_slo_seconds=float(slo)))
+    if not tiers:
+        raise ValueError(f"No model tier in {spec!r}")
+    return tiers
+
+
+class TierStats:
+    """Outcome counters and recent latencies of one tier."""
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.served = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.slo_breaches = 0
+        self.escalations: Counter = Counter()
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def report(self, tier: ModelTier) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        escalated = sum(self.escalations.values())
+        return {
+            "model": tier.model,
+            "latency_slo_seconds": tier.latency_slo_seconds,
+            "calls": self.calls,
+            "served": self.served,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "slo_breaches": self.slo_breaches,
+            "escalations": escalated,
+            "escalation_rate": round(escalated / self.calls, 4) if self.calls else 0.0,
+            "escalation_reasons": dict(self.escalations),
+            "latency_p50_ms": _percentile_ms(latencies, 0.5),
+            "latency_p95_ms": _percentile_ms(latencies, 0.95),
+        }
+
+
+def _percentile_ms(latencies: List[float], fraction: float) -> Optional[int]:
+    if not latencies:
+        return None
+    return round(latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000)
+
+
+class ModelRouter:
+    """
+    Tries the model tiers of one kind of request in order, cheapest first.
+
+    A tier's answer is served unless it has to escalate to the next tier:
+    the call failed or ran past the tier's latency SLO (the SLO is the
+    request timeout), the output did not validate against its schema, the
+    caller's check rejected it (missing amount, unknown member, bad date...)
+    or its confidence is below AI_MIN_CONFIDENCE. The last tier's answer is
+    served whatever its quality; only when every tier failed is the last
+    error raised.
+    """
+
+    def __init__(self, name: str, tiers: List[ModelTier]):
+        """
+        Initialize router.
+
+        Args:
+            name: Kind of request, used in logs and metrics (e.g. "chat")
+            tiers: Tiers, cheapest first
+        """
+        self.name = name
+        self.tiers = tiers
+        self._stats = {tier.model: TierStats(settings.AI_METRICS_WINDOW) for tier in tiers}
+        self._lock = threading.Lock()
+
+    def generate(self, call: TierCall, check: Optional[AnswerCheck] = None, start_tier: int = 0) -> T:
+        """
+        Get an answer from the first tier that gives a usable one.
+
+        Args:
+            call: Runs the request on a model within a timeout; returns the answer and its confidence
+            check: Returns why an answer is not usable, or None
+            start_tier: Index of the first tier to try
+
+        Returns:
+            Answer
+
+        Raises:
+            Exception: The error of the last tier when no tier answered
+        """
+        tiers = self.tiers[start_tier:]
+        if not tiers:
+            raise ValueError(f"No {self.name} model tier from index {start_tier}")
+
+        fallback: Optional[T] = None
+        last_error: Optional[Exception] = None
+        for position, tier in enumerate(tiers):
+            is_last = position == len(tiers) - 1
+            started = time.perf_counter()
+            try:
+                answer, confidence = call(tier.model, tier.latency_slo_seconds)
+            except ValidationError as e:
+                # Still invalid after the repair attempt: a stronger model may get the schema right
+                self.observe(tier, time.perf_counter() - started, escalation="invalid_output")
+                last_error = e
+                continue
+            except Exception as e:
+                self.observe(tier, time.perf_counter() - started, error=e)
+                last_error = e
+                logger.warning(f"[MODEL_ROUTER] {self.name} call to {tier.model} failed: {e}")
+                continue
+
+            reason = self.escalation_reason(answer, confidence, check)
+            if reason is None or is_last:
+                self.observe(tier, time.perf_counter() - started)
+                return answer
+            self.observe(tier, time.perf_counter() - started, escalation=reason)
+            logger.info(f"[MODEL_ROUTER] {self.name} escalating from {tier.model}: {reason}")
+            fallback = answer
+
+        if fallback is not None:
+            # The stronger tiers failed outright: an imperfect answer beats none
+            return fallback
+        raise last_error
+
+    def escalation_reason(self, answer: T, confidence: Optional[float], check: Optional[AnswerCheck] = None) -> Optional[str]:
+        """
+        Get why an answer should go to a stronger tier.
+
+        Args:
+            answer: Answer of a tier
+            confidence: Its confidence (0-1), None when unknown
+            check: Caller's validation
+
+        Returns:
+            Reason, or None when the answer is usable
+        """
+        reason = check(answer) if check else None
+        if reason is None and confidence is not None and confidence < settings.AI_MIN_CONFIDENCE:
+            reason = "low_confidence"
+        return reason
+
+    def observe(self, tier: ModelTier, latency: float, escalation: Optional[str] = None, error: Optional[Exception] = None) -> None:
+        """
+        Record the outcome of a call (also for calls made outside generate(), e.g. streams).
+
+        Args:
+            tier: Tier called
+            latency: Seconds the call took
+            escalation: Reason the answer was passed to the next tier
+            error: Error the call raised
+        """
+        with self._lock:
+            stats = self._stats[tier.model]
+            stats.calls += 1
+            stats.latencies.append(latency)
+            if latency > tier.latency_slo_seconds:
+                stats.slo_breaches += 1
+            if error is not None:
+                stats.errors += 1
+                if isinstance(error, httpx.TimeoutException):
+                    stats.timeouts += 1
+            elif escalation is not None:
+                stats.escalations[escalation] += 1
+            else:
+                stats.served += 1
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Get latency and escalation metrics per tier.
+
+        Returns:
+            One dict per tier, cheapest first
+        """
+        with self._lock:
+            return [self._stats[tier.model].report(tier) for tier in self.tiers]
+
+
+# Global instances shared by every GeminiService of the process
+chat_model_router = ModelRouter("chat", parse_tiers(settings.AI_CHAT_MODEL_TIERS))
+image_model_router = ModelRouter("image", parse_tiers(settings.AI_IMAGE_MODEL_TIERS))
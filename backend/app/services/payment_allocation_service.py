@@ -0,0 +1,126 @@
+"""Apply recorded PayOS payments to the ledger exactly once."""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.models.transaction_model import TransactionCreate
+from app.services.allocation_engine import AllocationResult, Payment
+from app.services.ledger_allocation_service import LedgerAllocationService
+from app.services.ledger_unit_of_work import LedgerUnitOfWork, commit_with_replan
+from app.services.payment_event_service import PaymentEventService
+from app.services.transaction_service import TransactionService
+
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentAllocationService:
+    """Background allocator for webhook events recorded in payment_events."""
+
+    def __init__(self):
+        self.payment_event_service = PaymentEventService()
+        self.transaction_service = TransactionService()
+        self.ledger_allocation_service = LedgerAllocationService()
+
+    def apply_event(self, order_code: int, paid_on: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Claim a recorded event and allocate its payment.
+
+        Safe to call any number of times for the same order_code: the claim
+        is a compare-and-set on the event status, and the ledger unit of work
+        skips the entries when the transaction already has some.
+
+        Args:
+            order_code: PayOS order code
+            paid_on: Payment date (YYYY-MM-DD) when known, e.g. from a bank statement; defaults to today
+
+        Returns:
+            Dict with order_code and outcome (applied, skipped or failed)
+        """
+        event = self.payment_event_service.claim(order_code)
+        if not event:
+            logger.info(f"[ALLOCATE] Event not claimable (missing, applied or in progress) - order_code: {order_code}")
+            return {"order_code": order_code, "outcome": "skipped"}
+
+        try:
+            allocated = self._apply_payment(order_code, paid_on)
+        except Exception as e:
+            logger.error(f"[ALLOCATE] Failed to apply payment - order_code: {order_code}, error: {e}", exc_info=True)
+            self.payment_event_service.mark_failed(order_code, str(e))
+            return {"order_code": order_code, "outcome": "failed", "error": str(e)}
+
+        self.payment_event_service.mark_applied(order_code)
+        return {"order_code": order_code, "outcome": "applied" if allocated else "skipped"}
+
+    def replay_pending(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Re-run every event that was never applied, releasing stuck claims first.
+
+        Args:
+            limit: Maximum number of events to replay
+
+        Returns:
+            Outcome per event
+        """
+        released = self.payment_event_service.release_stuck(settings.PAYMENT_EVENT_STUCK_SECONDS)
+        if released:
+            logger.info(f"[ALLOCATE] Released {released} stuck payment event(s)")
+
+        events = self.payment_event_service.get_pending_events(limit=limit)
+        return [self.apply_event(event["order_code"]) for event in events]
+
+    def _apply_payment(self, order_code: int, paid_on: Optional[str] = None) -> bool:
+        paid_on = paid_on or datetime.now().strftime("%Y-%m-%d")
+        transaction = self.transaction_service.get_transaction_by_order_code(order_code)
+        if not transaction:
+            raise ValueError(f"Transaction not found for orderCode: {order_code}")
+
+        transaction_id = transaction.get("id")
+        user_id = transaction.get("user_id")
+        amount = transaction.get("amount")
+        logger.info(f"[ALLOCATE] Transaction details - transaction_id: {transaction_id}, user_id: {user_id}, amount: {amount}")
+
+        if not user_id:
+            raise ValueError(f"Transaction missing user_id - transaction_id: {transaction_id}")
+
+        completed = transaction.get("status") == "COMPLETED"
+
+        def build(replan: bool) -> LedgerUnitOfWork:
+            # Planned on every attempt, so a conflict always gets a fresh plan
+            unit_of_work = LedgerUnitOfWork()
+            unit_of_work.complete_transaction(transaction_id, TransactionCreate(
+                type=transaction.get("type", "INCOME"),
+                amount=amount,
+                user_id=user_id,
+                transaction_date=transaction.get("transaction_date") if completed else paid_on,
+                status="COMPLETED",
+            ))
+            if amount and amount > 0:
+                unit_of_work.add_allocation(self._plan(transaction_id, user_id, amount, paid_on))
+            return unit_of_work
+
+        # Idempotency guard: the commit skips the entries when the transaction already has some,
+        # checked under a row lock in the same database transaction that writes them
+        commit = commit_with_replan(build)[0]
+        already_allocated = commit.already_allocated
+        if already_allocated:
+            logger.info(f"[ALLOCATE] Transaction already allocated, skipping entries - transaction_id: {transaction_id}")
+        else:
+            logger.info(
+                f"[ALLOCATE] Allocated - transaction_id: {transaction_id}, "
+                f"entries: {[(entry['type'], entry['period_month'], entry['amount']) for entry in commit.entries]}, "
+                f"settled_debts: {[debt['id'] for debt in commit.settled_debts]}"
+            )
+        logger.info(f"[ALLOCATE] Payment processing completed - order_code: {order_code}, transaction_id: {transaction_id}")
+        return not already_allocated
+
+    def _plan(self, transaction_id: int, user_id: int, amount: int, paid_on: str) -> AllocationResult:
+        result = self.ledger_allocation_service.plan([Payment(
+            transaction_id=transaction_id,
+            user_id=user_id,
+            amount=amount,
+            as_of_month=paid_on[:7],
+        )])
+        logger.info(f"[ALLOCATE] Planned - transaction_id: {transaction_id}, remaining_amount: {result.remaining.get(transaction_id)}")
+        return result
@@ -0,0 +1,112 @@
+"""Durable log of received PayOS webhook events."""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.base_service import BaseService
+
+
+class PaymentEventService(BaseService):
+    """
+    Store webhook deliveries keyed by order_code and track their processing.
+
+    Status flow: RECEIVED -> PROCESSING -> APPLIED, or FAILED (retryable).
+    """
+
+    def __init__(self):
+        super().__init__(table_name="payment_events")
+
+    def record_event(self, order_code: int, payload: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Durably record a webhook delivery; redeliveries keep the first record.
+
+        Args:
+            order_code: PayOS order code
+            payload: Verified webhook data
+
+        Returns:
+            Tuple of (event, is_new)
+        """
+        response = self.client.table(self.table_name).upsert(
+            {"order_code": order_code, "payload": payload, "status": "RECEIVED"},
+            on_conflict="order_code",
+            ignore_duplicates=True,
+        ).execute()
+        if response.data:
+            self._mark_changed()
+            return response.data[0], True
+        return self.get_by_order_code(order_code), False
+
+    def get_by_order_code(self, order_code: int) -> Optional[Dict[str, Any]]:
+        response = self.client.table(self.table_name).select("*").eq("order_code", order_code).execute()
+        return self._get_first_item(response.data)
+
+    def claim(self, order_code: int) -> Optional[Dict[str, Any]]:
+        """
+        Move an event to PROCESSING if nobody else holds it.
+
+        The status filter makes this a compare-and-set: only one worker can
+        claim a RECEIVED/FAILED event.
+
+        Args:
+            order_code: PayOS order code
+
+        Returns:
+            Claimed event, or None if it is missing, applied or already being processed
+        """
+        event = self.get_by_order_code(order_code)
+        if not event or event.get("status") not in ("RECEIVED", "FAILED"):
+            return None
+
+        response = self.client.table(self.table_name).update({
+            "status": "PROCESSING",
+            "attempts": (event.get("attempts") or 0) + 1,
+            "processing_started_at": self._now(),
+        }).eq("order_code", order_code).eq("status", event.get("status")).execute()
+        return self._get_first_item(response.data)
+
+    def mark_applied(self, order_code: int) -> None:
+        self.client.table(self.table_name).update({
+            "status": "APPLIED",
+            "last_error": None,
+            "applied_at": self._now(),
+        }).eq("order_code", order_code).execute()
+
+    def mark_failed(self, order_code: int, error: str) -> None:
+        self.client.table(self.table_name).update({
+            "status": "FAILED",
+            "last_error": error[:1000],
+        }).eq("order_code", order_code).execute()
+
+    def release_stuck(self, stuck_after_seconds: int) -> int:
+        """
+        Put events stuck in PROCESSING (e.g. worker died) back to RECEIVED.
+
+        Args:
+            stuck_after_seconds: Minimum age of the processing claim
+
+        Returns:
+            Number of released events
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=stuck_after_seconds)).isoformat()
+        response = self.client.table(self.table_name).update({"status": "RECEIVED"}).eq(
+            "status", "PROCESSING"
+        ).lt("processing_started_at", cutoff).execute()
+        return len(response.data)
+
+    def get_pending_events(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get events that still need to be applied, oldest first.
+
+        Args:
+            limit: Maximum number of events
+
+        Returns:
+            RECEIVED and FAILED events
+        """
+        response = self.client.table(self.table_name).select("*").in_(
+            "status", ["RECEIVED", "FAILED"]
+        ).order("received_at").limit(limit).execute()
+        return response.data
+
+    def _now(self) -> str:
+        return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,269 @@
+"""Match PENDING PayOS payments with bank statement lines and complete them."""
+import difflib
+import logging
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.jobs import job_registry
+from app.core.text import normalize_text
+from app.services.member_matcher import MemberMatcher
+from app.services.payment_allocation_service import PaymentAllocationService
+from app.services.payment_event_service import PaymentEventService
+from app.services.statement_parser import StatementLine, detect_encoding, iter_statement_lines
+from app.services.transaction_service import TransactionService
+from app.services.user_directory import user_directory
+
+
+logger = logging.getLogger(__name__)
+
+_DIGITS_RE = re.compile(r"\d{6,}")
+
+
+@dataclass
+class ReconcileCandidate:
+    """A statement line that could settle a pending transaction."""
+    line: StatementLine
+    transaction: Dict[str, Any]
+    score: float
+    reason: str
+
+
+def _ordinal(value: str) -> int:
+    return date.fromisoformat(value[:10]).toordinal()
+
+
+class PendingIndex:
+    """
+    Hash index of PENDING transactions keyed by (amount, date).
+
+    A statement line only looks at the buckets of its exact amount within
+    the date window, so matching n lines against m transactions costs
+    O(n * window) lookups instead of an O(n * m) scan.
+    """
+
+    def __init__(self, transactions: List[Dict[str, Any]], window_days: int):
+        self.window_days = window_days
+        self._buckets: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+        for transaction in transactions:
+            if transaction.get("amount") and transaction.get("transaction_date"):
+                self._buckets[(transaction["amount"], _ordinal(transaction["transaction_date"]))].append(transaction)
+
+    def candidates(self, line: StatementLine) -> List[Dict[str, Any]]:
+        """
+        Pending transactions with the line amount, created from window_days
+        before the line date up to the day after (bank dates can lag either way).
+        """
+        line_day = _ordinal(line.transaction_date)
+        found: List[Dict[str, Any]] = []
+        for day in range(line_day - self.window_days, line_day + 2):
+            found.extend(self._buckets.get((line.amount, day), ()))
+        return found
+
+
+class ReconciliationService:
+    """
+    Complete PENDING payments (PayOS links without a webhook) from a bank statement.
+
+    For every money-in line, candidates come from PendingIndex and are
+    scored:
+    - 1.0 when the line contains the transaction order_code,
+    - otherwise the best of the member name similarity (MemberMatcher) and
+      the similarity between the line and the transaction description.
+    Pairs reaching NAME_MATCH_MIN_SCORE are assigned greedily, best score
+    first, so every line and every transaction is used at most once.
+    Matched transactions are completed through the payment event path
+    (record event + PaymentAllocationService.apply_event), exactly like a
+    late webhook, using the statement date as the payment date.
+    """
+
+    def __init__(self):
+        self.transaction_service = TransactionService()
+        self.payment_event_service = PaymentEventService()
+        self.payment_allocation_service = PaymentAllocationService()
+
+    def reconcile(self, lines: List[StatementLine], dry_run: bool = False, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Match statement lines with PENDING transactions and complete the matches.
+
+        Args:
+            lines: Parsed statement lines (money out is ignored)
+            dry_run: Only report the matches
+            job_id: Job to report progress to
+
+        Returns:
+            Summary with matched, unmatched_lines and unmatched_pending
+        """
+        credits = [line for line in lines if line.amount > 0]
+        pending = self._get_pending_transactions()
+        report = job_registry.reporter(job_id)
+        report(stage="matching", lines=len(credits), pending=len(pending))
+
+        index = PendingIndex(pending, settings.RECONCILE_DATE_WINDOW_DAYS)
+        users = user_directory.get_all()
+        matchers: Dict[int, MemberMatcher] = {}
+
+        candidates: List[ReconcileCandidate] = []
+        for line in credits:
+            for transaction in index.candidates(line):
+                score, reason = self._score(line, transaction, users, matchers)
+                if score >= settings.NAME_MATCH_MIN_SCORE:
+                    candidates.append(ReconcileCandidate(line, transaction, score, reason))
+
+        # Greedy one-to-one assignment; on equal scores the closest dates win
+        candidates.sort(key=lambda candidate: (
+            -candidate.score,
+            abs(_ordinal(candidate.line.transaction_date) - _ordinal(candidate.transaction["transaction_date"])),
+            candidate.line.line_no,
+        ))
+        used_lines, used_transactions = set(), set()
+        matches: List[ReconcileCandidate] = []
+        for candidate in candidates:
+            if candidate.line.line_no in used_lines or candidate.transaction["id"] in used_transactions:
+                continue
+            used_lines.add(candidate.line.line_no)
+            used_transactions.add(candidate.transaction["id"])
+            matches.append(candidate)
+
+        report(stage="completing" if not dry_run else "done", matched=len(matches))
+        # Matching a long statement takes a while: re-read the matched rows so payments a webhook completed meanwhile are left alone
+        current = {} if dry_run else self.transaction_service.get_by_ids(candidate.transaction["id"] for candidate in matches)
+        matched = []
+        for done, candidate in enumerate(matches, start=1):
+            item = {
+                "line_no": candidate.line.line_no,
+                "transaction_id": candidate.transaction["id"],
+                "order_code": candidate.transaction.get("order_code"),
+                "user_id": candidate.transaction.get("user_id"),
+                "amount": candidate.line.amount,
+                "paid_on": candidate.line.transaction_date,
+                "score": round(candidate.score, 3),
+                "reason": candidate.reason,
+            }
+            if not dry_run:
+                still_pending = current.get(candidate.transaction["id"], {}).get("status") == "PENDING"
+                item["outcome"] = self._complete(candidate) if still_pending else "skipped"
+                report(completed=done)
+            matched.append(item)
+
+        if credits:
+            first_day = min(line.transaction_date for line in credits)
+            last_day = max(line.transaction_date for line in credits)
+        else:
+            first_day = last_day = None
+        summary = {
+            "dry_run": dry_run,
+            "lines": len(credits),
+            "pending": len(pending),
+            "matched": matched,
+            "unmatched_lines": [
+                {"line_no": line.line_no, "transaction_date": line.transaction_date, "amount": line.amount,
+                 "sender": line.sender, "description": line.description}
+                for line in credits if line.line_no not in used_lines
+            ],
+            # Pending payments the statement period should have covered
+            "unmatched_pending": [
+                {"transaction_id": transaction["id"], "order_code": transaction.get("order_code"),
+                 "user_id": transaction.get("user_id"), "amount": transaction.get("amount"),
+                 "transaction_date": transaction.get("transaction_date")}
+                for transaction in pending
+                if transaction["id"] not in used_transactions and first_day
+                and first_day <= (transaction.get("transaction_date") or "")[:10] <= last_day
+            ],
+        }
+        logger.info(
+            "Reconciliation %s: %d lines, %d pending, %d matched",
+            "dry run" if dry_run else "done", len(credits), len(pending), len(matched),
+        )
+        return summary
+
+    def reconcile_file(self, path: str, dry_run: bool = False, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Parse a CSV statement and reconcile it.
+
+        Args:
+            path: CSV file path
+            dry_run: Only report the matches
+            job_id: Job to report progress to
+
+        Returns:
+            Reconciliation summary
+        """
+        with open(path, encoding=detect_encoding(path), newline="") as stream:
+            lines = list(iter_statement_lines(stream))
+        return self.reconcile(lines, dry_run=dry_run, job_id=job_id)
+
+    def run_job(self, job_id: str, path: str, dry_run: bool = False) -> None:
+        """
+        Run a reconciliation as a registered background job, then delete the uploaded file.
+
+        Args:
+            job_id: Job created in job_registry
+            path: Uploaded CSV path
+            dry_run: Only report the matches
+        """
+        job_registry.start(job_id)
+        try:
+            job_registry.complete(job_id, self.reconcile_file(path, dry_run=dry_run, job_id=job_id))
+        except Exception as e:
+            logger.error(f"Reconciliation failed - job_id: {job_id}, error: {e}", exc_info=True)
+            job_registry.fail(job_id, str(e))
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _get_pending_transactions(self) -> List[Dict[str, Any]]:
+        return self.transaction_service._fetch_all_pages(
+            lambda: self.transaction_service.client.table("transactions")
+            .select("id, user_id, amount, order_code, description, transaction_date")
+            .eq("type", "INCOME")
+            .eq("status", "PENDING")
+            .not_.is_("order_code", "null")
+            .order("id")
+        )
+
+    def _score(
+        self,
+        line: StatementLine,
+        transaction: Dict[str, Any],
+        users: Dict[int, Dict[str, Any]],
+        matchers: Dict[int, MemberMatcher],
+    ) -> Tuple[float, str]:
+        text = f"{line.sender} {line.description}"
+        order_code = str(transaction.get("order_code") or "")
+        if order_code and order_code in _DIGITS_RE.findall(text):
+            return 1.0, "order_code"
+
+        best, reason = 0.0, "none"
+        user_id = transaction.get("user_id")
+        if user_id in users:
+            matcher = matchers.get(user_id)
+            if matcher is None:
+                matcher = matchers[user_id] = MemberMatcher([users[user_id]])
+            scores = matcher.score(line.sender) + matcher.score(line.description)
+            if scores:
+                best, reason = max(score for _, score in scores), "name"
+
+        description = normalize_text(transaction.get("description") or "")
+        if description:
+            similarity = difflib.SequenceMatcher(None, description, normalize_text(line.description)).ratio()
+            if similarity > best:
+                best, reason = similarity, "description"
+        return best, reason
+
+    def _complete(self, candidate: ReconcileCandidate) -> str:
+        order_code = candidate.transaction["order_code"]
+        self.payment_event_service.record_event(order_code, {
+            "source": "bank_statement",
+            "line_no": candidate.line.line_no,
+            "reference": candidate.line.reference,
+            "amount": candidate.line.amount,
+            "transaction_date": candidate.line.transaction_date,
+        })
+        return self.payment_allocation_service.apply_event(order_code, paid_on=candidate.line.transaction_date)["outcome"]
@@ -0,0 +1,298 @@
+"""Import bank statements as transactions and allocate member payments."""
+import logging
+import os
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.jobs import job_registry
+from app.core.text import normalize_text
+from app.models.transaction_model import TransactionCreate
+from app.services.allocation_engine import Payment
+from app.services.analytics_service import ledger_date
+from app.services.ledger_allocation_service import LedgerAllocationService
+from app.services.ledger_unit_of_work import LedgerCommit, LedgerUnitOfWork, commit_with_replan
+from app.services.member_matcher import MemberMatcher
+from app.services.statement_parser import StatementLine, detect_encoding, iter_statement_lines
+from app.services.transaction_service import TransactionService
+from app.services.user_directory import user_directory
+
+
+logger = logging.getLogger(__name__)
+
+# Rows listed in the summary for unmatched lines and parse errors
+MAX_REPORTED_ROWS = 50
+
+
+def statement_description(line: StatementLine) -> str:
+    """Description stored for an imported line; the bank reference keeps re-imports idempotent."""
+    description = line.description or line.sender or "Sao kê ngân hàng"
+    return f"{description} [Ref: {line.reference}]" if line.reference else description
+
+
+def dedupe_key(transaction_date: Optional[str], amount: Optional[int], description: Optional[str]) -> Tuple[str, int, str]:
+    return ((transaction_date or "")[:10], abs(amount or 0), normalize_text(description or ""))
+
+
+class BookedTransactions:
+    """
+    Transactions already in the ledger, to skip statement lines booked another way.
+
+    A member payment booked by the webhook or from an image has its own
+    description and may be dated a few days off the bank, so lines matched
+    to a member are compared on type, amount and member within a date
+    window: an identical description wins, then the closest date. Each
+    booked payment stands for one line only. Lines without a member still
+    need the same date, amount and description.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], window_days: int):
+        self.window_days = window_days
+        self._member_rows: Dict[Tuple[str, int, int], List[Tuple[date, str]]] = {}
+        self._keys: Set[Tuple[str, int, str]] = set()
+        for row in rows:
+            booked_on = ledger_date(row)
+            if not booked_on:
+                continue
+            self._keys.add(dedupe_key(booked_on, row.get("amount"), row.get("description")))
+            if row.get("user_id") is not None:
+                key = (row.get("type"), abs(row.get("amount") or 0), row["user_id"])
+                self._member_rows.setdefault(key, []).append((date.fromisoformat(booked_on), normalize_text(row.get("description") or "")))
+
+    def take(self, transaction: TransactionCreate) -> bool:
+        """
+        Check whether a transaction is already booked, consuming the booked payment it matches.
+
+        Args:
+            transaction: Transaction built from a statement line
+
+        Returns:
+            True if it is already in the ledger
+        """
+        if transaction.user_id is None:
+            return dedupe_key(transaction.transaction_date, transaction.amount, transaction.description) in self._keys
+
+        candidates = self._member_rows.get((transaction.type, transaction.amount, transaction.user_id))
+        if not candidates:
+            return False
+        line_date = date.fromisoformat(transaction.transaction_date[:10])
+        description = normalize_text(transaction.description or "")
+        in_window = [
+            (booked_description != description, abs((booked_on - line_date).days), position)
+            for position, (booked_on, booked_description) in enumerate(candidates)
+            if abs((booked_on - line_date).days) <= self.window_days
+        ]
+        if not in_window:
+            return False
+        candidates.pop(min(in_window)[2])
+        return True
+
+
+class StatementImportService:
+    """
+    Turn a CSV bank statement into transactions and ledger entries.
+
+    Money in becomes INCOME (matched to a member by sender name/description),
+    money out becomes EXPENSE. Lines already booked (see BookedTransactions)
+    are skipped, so importing overlapping statements, or payments the webhook
+    already recorded, is safe.
+    Member payments then go through the shared allocation engine, in
+    chronological order, exactly like webhook and image payments.
+    """
+
+    def __init__(self):
+        self.transaction_service = TransactionService()
+        self.ledger_allocation_service = LedgerAllocationService()
+
+    def import_file(
+        self,
+        path: str,
+        dry_run: bool = False,
+        include_unmatched: bool = False,
+        job_id: Optional[str] = None,
+        batch_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Import a statement file.
+
+        Args:
+            path: CSV file path
+            dry_run: Report what would be imported without writing
+            include_unmatched: Import money in without a matching member as unassigned income
+            job_id: Job to report progress to
+            batch_size: Rows per insert request (defaults to settings.IMPORT_BATCH_SIZE)
+
+        Returns:
+            Import summary
+        """
+        started = time.perf_counter()
+        batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        report = job_registry.reporter(job_id)
+
+        # 1. Parse
+        errors: List[Tuple[int, str]] = []
+        lines: List[StatementLine] = []
+        with open(path, encoding=detect_encoding(path), newline="") as stream:
+            for line in iter_statement_lines(stream, errors):
+                lines.append(line)
+                if len(lines) % batch_size == 0:
+                    report(stage="parsing", rows_read=len(lines))
+        lines.sort(key=lambda line: (line.transaction_date, line.line_no))
+        report(stage="matching", rows_read=len(lines), rows_invalid=len(errors))
+
+        # 2. Match members, then skip lines repeated in the file or already booked
+        booked = BookedTransactions(self._booked_rows(lines), settings.IMPORT_DEDUPE_WINDOW_DAYS)
+        seen: Set[Tuple[str, int, str]] = set()
+        matcher = MemberMatcher(user_directory.get_all().values())
+        rows: List[Tuple[StatementLine, TransactionCreate]] = []
+        duplicates = 0
+        unmatched_count = 0
+        unmatched: List[Dict[str, Any]] = []
+        for line in lines:
+            description = statement_description(line)
+            key = dedupe_key(line.transaction_date, line.amount, description)
+            user_id = matcher.match(line.sender, line.description) if line.amount > 0 else None
+            transaction = TransactionCreate(
+                type="INCOME" if line.amount > 0 else "EXPENSE",
+                description=description,
+                amount=abs(line.amount),
+                user_id=user_id,
+                transaction_date=line.transaction_date,
+                status="COMPLETED",
+            )
+            if key in seen or booked.take(transaction):
+                duplicates += 1
+                continue
+            seen.add(key)
+
+            if line.amount > 0 and user_id is None:
+                unmatched_count += 1
+                if len(unmatched) < MAX_REPORTED_ROWS:
+                    unmatched.append({
+                        "line_no": line.line_no,
+                        "transaction_date": line.transaction_date,
+                        "amount": line.amount,
+                        "sender": line.sender,
+                        "description": line.description,
+                    })
+                if not include_unmatched:
+                    continue
+
+            rows.append((line, transaction))
+        unassigned = sum(1 for _, transaction in rows if transaction.type == "INCOME" and transaction.user_id is None)
+        report(rows_to_import=len(rows), duplicates=duplicates)
+
+        # 3. Plan member payments in chronological order; line numbers stand in for the ids until insert
+        payments = [
+            Payment(
+                transaction_id=-line.line_no,
+                user_id=transaction.user_id,
+                amount=transaction.amount,
+                as_of_month=transaction.transaction_date[:7],
+            )
+            for line, transaction in rows
+            if transaction.type == "INCOME" and transaction.user_id is not None
+        ]
+        report(stage="planning", payments=len(payments))
+        plan = self.ledger_allocation_service.plan(payments)
+
+        # 4. Write each batch of transactions with its entries and settled debts in one unit of work
+        if not dry_run:
+            report(stage="inserting")
+            inserted = 0
+            entries_created = 0
+            written: List[LedgerCommit] = []
+            for start in range(0, len(rows), batch_size):
+                def build(replan: bool) -> LedgerUnitOfWork:
+                    nonlocal plan
+                    if replan:
+                        # A concurrent payment took planned months: plan the rows not written yet again
+                        remaining = {-line.line_no for line, _ in rows[start:]}
+                        plan = self.ledger_allocation_service.plan([payment for payment in payments if payment.transaction_id in remaining])
+                    unit_of_work = LedgerUnitOfWork()
+                    for line, transaction in rows[start:start + batch_size]:
+                        unit_of_work.add_transaction(transaction)
+                        unit_of_work.add_allocation(plan, transaction_id=-line.line_no)
+                    return unit_of_work
+
+                commits = commit_with_replan(build)
+                written.extend(commits)
+                inserted += len(commits)
+                entries_created += sum(len(commit.entries) for commit in commits)
+                report(rows_inserted=inserted, entries_created=entries_created)
+            entries = [entry for commit in written for entry in commit.entries]
+            settled_debts = sum(len(commit.settled_debts) for commit in written)
+        else:
+            entries, settled_debts = plan.entries, len(plan.settled_debt_ids)
+
+        summary = {
+            "dry_run": dry_run,
+            "rows_read": len(lines) + len(errors),
+            "rows_invalid": len(errors),
+            "duplicates": duplicates,
+            "income_created": sum(1 for _, transaction in rows if transaction.type == "INCOME"),
+            "expense_created": sum(1 for _, transaction in rows if transaction.type == "EXPENSE"),
+            "unmatched_income": unmatched_count,
+            "unassigned_income_created": unassigned,
+            "fund_entries": sum(1 for entry in entries if entry["type"] == "FUND"),
+            "debt_entries": sum(1 for entry in entries if entry["type"] == "DEBT"),
+            "debts_settled": settled_debts,
+            "unmatched": unmatched,
+            "errors": [{"line_no": line_no, "reason": reason} for line_no, reason in errors[:MAX_REPORTED_ROWS]],
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(
+            "Statement import %s: %d rows, %d duplicates, %d income, %d expense, %d unmatched",
+            "dry run" if dry_run else "done", summary["rows_read"], duplicates,
+            summary["income_created"], summary["expense_created"], summary["unmatched_income"],
+        )
+        return summary
+
+    def run_job(self, job_id: str, path: str, dry_run: bool = False, include_unmatched: bool = False) -> None:
+        """
+        Run an import as a registered background job, then delete the uploaded file.
+
+        Args:
+            job_id: Job created in job_registry
+            path: Uploaded CSV path
+            dry_run: Report what would be imported without writing
+            include_unmatched: Import unmatched money in as unassigned income
+        """
+        job_registry.start(job_id)
+        try:
+            result = self.import_file(path, dry_run=dry_run, include_unmatched=include_unmatched, job_id=job_id)
+            job_registry.complete(job_id, result)
+        except Exception as e:
+            logger.error(f"Statement import failed - job_id: {job_id}, error: {e}", exc_info=True)
+            job_registry.fail(job_id, str(e))
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _booked_rows(self, lines: List[StatementLine]) -> List[Dict[str, Any]]:
+        if not lines:
+            return []
+        window = timedelta(days=settings.IMPORT_DEDUPE_WINDOW_DAYS)
+        start_date = (date.fromisoformat(min(line.transaction_date for line in lines)) - window).isoformat()
+        end_date = (date.fromisoformat(max(line.transaction_date for line in lines)) + window).isoformat()
+        columns = "id, type, transaction_date, created_at, amount, user_id, description"
+        dated = self.transaction_service._fetch_all_pages(
+            lambda: self.transaction_service.client.table("transactions")
+            .select(columns)
+            .gte("transaction_date", start_date)
+            .lte("transaction_date", end_date)
+            .order("id")
+        )
+        # Image payments may have been saved without a date
+        undated = self.transaction_service._fetch_all_pages(
+            lambda: self.transaction_service.client.table("transactions")
+            .select(columns)
+            .is_("transaction_date", "null")
+            .gte("created_at", start_date)
+            .lte("created_at", f"{end_date}T23:59:59.999999")
+            .order("id")
+        )
+        return dated + undated
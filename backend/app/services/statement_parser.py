@@ -0,0 +1,231 @@
+"""Streaming parser for bank statements exported as CSV (including Excel "Save as CSV")."""
+import csv
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from app.core.text import normalize_text
+
+
+# Normalized header -> field. Covers the usual Vietnamese bank exports and English ones.
+COLUMN_ALIASES = {
+    "transaction_date": (
+        "date", "transaction date", "posting date", "value date", "ngay", "ngay giao dich",
+        "ngay gd", "ngay hieu luc", "thoi gian", "thoi gian giao dich",
+    ),
+    "amount": ("amount", "so tien", "so tien giao dich", "so tien gd"),
+    "credit": ("credit", "credit amount", "ghi co", "so tien ghi co", "phat sinh co", "tien vao", "so tien vao"),
+    "debit": ("debit", "debit amount", "ghi no", "so tien ghi no", "phat sinh no", "tien ra", "so tien ra"),
+    "description": (
+        "description", "content", "remark", "remarks", "details", "narrative", "noi dung",
+        "noi dung giao dich", "noi dung chuyen khoan", "dien giai", "mo ta", "chi tiet",
+    ),
+    "sender": (
+        "sender", "from", "account name", "counterparty", "nguoi chuyen", "ten nguoi chuyen",
+        "ten tai khoan doi ung", "ten doi ung", "tai khoan doi ung",
+    ),
+    "reference": (
+        "reference", "ref", "reference number", "transaction id", "ma giao dich", "ma gd",
+        "so tham chieu", "so but toan", "so giao dich",
+    ),
+}
+
+_ALIAS_TO_FIELD = {alias: field for field, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y/%m/%d", "%d/%m/%y", "%d-%m-%y")
+
+# Rows scanned for the header line (exports often start with account details)
+HEADER_SCAN_ROWS = 30
+
+_AMOUNT_JUNK_RE = re.compile(r"[^\d,.\-()]")
+
+
+class StatementFormatError(ValueError):
+    """The file does not look like a bank statement."""
+
+
+@dataclass
+class StatementLine:
+    """One parsed statement row. amount is positive for money in, negative for money out."""
+    line_no: int
+    transaction_date: str
+    amount: int
+    description: str = ""
+    sender: str = ""
+    reference: str = ""
+
+
+def parse_amount(value: Optional[str]) -> Optional[int]:
+    """
+    Parse a money amount as written in bank exports.
+
+    Handles "1.000.000", "1,000,000", "200000.00", "1.234,50", "-50,000",
+    "(50.000)" and currency suffixes. Amounts are rounded to whole VND.
+
+    Args:
+        value: Raw cell
+
+    Returns:
+        Amount or None if the cell holds no number
+    """
+    if value is None:
+        return None
+    text = _AMOUNT_JUNK_RE.sub("", value.strip())
+    negative = text.startswith("-") or (text.startswith("(") and text.endswith(")"))
+    text = text.strip("-()")
+    if not text or not any(char.isdigit() for char in text):
+        return None
+
+    last_dot, last_comma = text.rfind("."), text.rfind(",")
+    if last_dot >= 0 and last_comma >= 0:
+        # Both present: the last one is the decimal separator
+        decimal_sep = "." if last_dot > last_comma else ","
+        integer, _, fraction = text.rpartition(decimal_sep)
+        integer = integer.replace(".", "").replace(",", "")
+    else:
+        sep = "." if last_dot >= 0 else ("," if last_comma >= 0 else None)
+        integer, fraction = text, ""
+        if sep:
+            head, _, tail = text.rpartition(sep)
+            # A single separator followed by 1-2 digits is a decimal point
+            if text.count(sep) == 1 and len(tail) in (1, 2):
+                integer, fraction = head, tail
+            else:
+                integer = text.replace(sep, "")
+
+    try:
+        amount = round(float(f"{integer or 0}.{fraction or 0}"))
+    except ValueError:
+        return None
+    return -amount if negative else amount
+
+
+def parse_date(value: Optional[str]) -> Optional[str]:
+    """
+    Parse a statement date (time part ignored).
+
+    Args:
+        value: Raw cell
+
+    Returns:
+        YYYY-MM-DD or None
+    """
+    if not value:
+        return None
+    text = value.strip().replace("T", " ").split(" ")[0]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def detect_encoding(path: str) -> str:
+    """
+    Guess the text encoding of an exported statement.
+
+    Args:
+        path: File path
+
+    Returns:
+        Python codec name
+    """
+    with open(path, "rb") as file:
+        sample = file.read(64 * 1024)
+    if sample.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16"
+    try:
+        sample.decode("utf-8")
+        return "utf-8-sig"
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut by the sample boundary is still UTF-8
+        if e.start >= len(sample) - 3:
+            return "utf-8-sig"
+        return "cp1258"
+
+
+def _map_header(row: List[str]) -> Dict[str, int]:
+    columns: Dict[str, int] = {}
+    for index, cell in enumerate(row):
+        field = _ALIAS_TO_FIELD.get(normalize_text(cell).strip(" :*"))
+        if field and field not in columns:
+            columns[field] = index
+    return columns
+
+
+def _is_header(columns: Dict[str, int]) -> bool:
+    return "transaction_date" in columns and ("amount" in columns or "credit" in columns)
+
+
+def iter_statement_lines(stream: TextIO, errors: Optional[List[Tuple[int, str]]] = None) -> Iterator[StatementLine]:
+    """
+    Parse a statement row by row, without loading the file in memory.
+
+    The delimiter (comma, semicolon or tab) is sniffed from the first lines,
+    and the header row is located by its column names, so preamble lines
+    and Excel exports both work. Rows without a valid date or a non-zero
+    amount (totals, opening balance...) are skipped and reported in errors.
+
+    Args:
+        stream: Text stream positioned at the start of the file
+        errors: Optional list receiving (line_no, reason) for skipped rows
+
+    Yields:
+        StatementLine
+
+    Raises:
+        StatementFormatError: No header row with a date and an amount/credit column
+    """
+    sample = stream.read(8192)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        delimiter = dialect.delimiter
+    except csv.Error:
+        # Preamble lines with another shape can defeat the sniffer: take the most frequent candidate
+        dialect = csv.excel
+        delimiter = max(",;\t", key=sample.count)
+
+    reader = csv.reader(stream, dialect, delimiter=delimiter)
+    columns: Dict[str, int] = {}
+    for row in reader:
+        columns = _map_header(row)
+        if _is_header(columns):
+            break
+        if reader.line_num >= HEADER_SCAN_ROWS:
+            break
+    if not _is_header(columns):
+        raise StatementFormatError("Không tìm thấy dòng tiêu đề có cột ngày và số tiền trong file sao kê")
+
+    def cell(row: List[str], field: str) -> str:
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    for row in reader:
+        if not any(value.strip() for value in row):
+            continue
+        line_no = reader.line_num
+
+        transaction_date = parse_date(cell(row, "transaction_date"))
+        if "amount" in columns:
+            amount = parse_amount(cell(row, "amount"))
+        else:
+            credit = parse_amount(cell(row, "credit")) or 0
+            debit = parse_amount(cell(row, "debit")) or 0
+            amount = abs(credit) - abs(debit)
+
+        if not transaction_date or not amount:
+            if errors is not None:
+                errors.append((line_no, "missing date" if not transaction_date else "missing amount"))
+            continue
+
+        yield StatementLine(
+            line_no=line_no,
+            transaction_date=transaction_date,
+            amount=amount,
+            description=cell(row, "description"),
+            sender=cell(row, "sender"),
+            reference=cell(row, "reference"),
+        )
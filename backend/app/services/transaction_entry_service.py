@@ -1,4 +1,7 @@
+from typing import Any, Dict, List, Optional
+from app.core.event_bus import months_of, publish_event
 from app.services.base_service import BaseService
+from app.services.ledger_changes import ledger_months_changed
 from app.models import TransactionEntry, TransactionEntryCreate
 
 class TransactionEntryService(BaseService):
@@ -6,10 +9,46 @@ class TransactionEntryService(BaseService):
         super().__init__(table_name="transaction_entries")
 
     def create_transaction_entry(self, transaction_entry: TransactionEntryCreate):
-        return self.create(transaction_entry.model_dump())
+        entry = self.create(transaction_entry.model_dump())
+        if entry:
+            self._publish_allocated([entry])
+        return entry
+
+    def create_transaction_entries(self, entries: List[Dict[str, Any]], chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Insert many entries, one request per chunk.
+        
+        Args:
+            entries: Entry rows (TransactionEntryCreate fields)
+            chunk_size: Rows per request (default BULK_CHUNK_SIZE)
+            
+        Returns:
+            Created entries
+        """
+        if not entries:
+            return []
+
+        created = self.create_many(entries, chunk_size=chunk_size)
+        self._publish_allocated(created)
+        return created
+
+    def _publish_allocated(self, entries: List[Dict[str, Any]]) -> None:
+        ledger_months_changed({entry.get("period_month") for entry in entries})
+        if not entries:
+            return
+        # One event per write, however many entries: subscriber queues are small
+        publish_event(
+            "entries.allocated",
+            transaction_ids=sorted({entry.get("transaction_id") for entry in entries if entry.get("transaction_id") is not None}),
+            user_ids=sorted({entry.get("user_id") for entry in entries if entry.get("user_id") is not None}),
+            months=months_of(entry.get("period_month") for entry in entries),
+        )
+        publish_event("stats.changed")
 
     def get_transaction_entry(self, id: int):
         return self.get_by_id(id)
 
     def update_transaction_entry(self, id: int, transaction_entry: TransactionEntryCreate):
-        return self.update(id, transaction_entry.model_dump())
\ No newline at end of file
+        result = self.update(id, transaction_entry.model_dump())
+        ledger_months_changed()
+        return result
\ No newline at end of file
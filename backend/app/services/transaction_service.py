@@ -1,6 +1,11 @@
 """Transaction service for business logic."""
 from typing import Optional, List, Dict, Any
+from app.core.event_bus import months_of, publish_event
+from app.services.balance_snapshot_service import BalanceSnapshotService
 from app.services.base_service import BaseService
+from app.services.food_rollup import food_expenses_deleted, food_expenses_written
+from app.services.ledger_changes import ledger_months_changed
+from app.services.user_directory import user_directory
 from app.models import TransactionCreate
 
 
@@ -35,9 +40,8 @@ class TransactionService(BaseService):
         Returns:
             List of transactions
         """
-        # Join với users table - Supabase tự động detect foreign key relationship
-        # Nếu không work, thử: users!user_id(*) hoặc users!inner(*)
-        query = self.client.table(self.table_name).select("*, users(*)").eq("status", "COMPLETED").order("transaction_date", desc=True)
+        # User được gắn từ user_directory (cache trong bộ nhớ) thay vì join users(*) từng dòng
+        query = self.client.table(self.table_name).select("*").eq("status", "COMPLETED").order("transaction_date", desc=True)
 
         # Filter for amount greater than 0
         query = query.gt("amount", 0)
@@ -56,31 +60,7 @@ class TransactionService(BaseService):
         query = query.range(skip, skip + limit - 1)
         response = query.execute()
         
-        # Transform data: Supabase returns users as array, but we need single user object
-        transformed_data = []
-        for item in response.data:
-            # Handle different response formats from Supabase
-            # Case 1: users is an array (most common)
-            if 'users' in item:
-                if isinstance(item['users'], list):
-                    if len(item['users']) > 0:
-                        item['user'] = item['users'][0]
-                    else:
-                        item['user'] = None
-                # Case 2: users is already an object (shouldn't happen but handle it)
-                elif isinstance(item['users'], dict):
-                    item['user'] = item['users']
-                else:
-                    item['user'] = None
-                # Remove the users key, keep only user object
-                item.pop('users', None)
-            # Case 3: No users field (transaction without user_id)
-            else:
-                item['user'] = None
-            
-            transformed_data.append(item)
-        
-        return transformed_data
+        return user_directory.attach(response.data)
 
     def create_transaction(self, transaction_data: TransactionCreate | List[TransactionCreate]) -> Optional[Dict[str, Any]] | List[Dict[str, Any]]:
         """
@@ -96,13 +76,15 @@ class TransactionService(BaseService):
         if isinstance(transaction_data, TransactionCreate):
             data = transaction_data.model_dump()
             response = self.client.table(self.table_name).insert(data).execute()
+            self._mark_changed()
+            self._publish_created(response.data)
             return self._get_first_item(response.data)
         
         # Handle list of transactions
         if isinstance(transaction_data, list):
-            data_list = [tx.model_dump() for tx in transaction_data]
-            response = self.client.table(self.table_name).insert(data_list).execute()
-            return response.data
+            created = self.create_many([tx.model_dump() for tx in transaction_data])
+            self._publish_created(created)
+            return created
         
         return None
 
@@ -117,8 +99,14 @@ class TransactionService(BaseService):
         Returns:
             Updated transaction or None
         """
+        previous_date = self._get_transaction_date(id)
         # Avoid overwriting existing columns with NULL when not provided
-        return self.update(id, transaction.model_dump(exclude_none=True))
+        result = self.update(id, transaction.model_dump(exclude_none=True))
+        if result:
+            self._publish_updated([result], [previous_date])
+        else:
+            ledger_months_changed([previous_date])
+        return result
 
     def delete_transaction(self, id: int) -> bool:
         """
@@ -130,7 +118,14 @@ class TransactionService(BaseService):
         Returns:
             True if deleted successfully
         """
-        return self.delete(id)
+        previous_date = self._get_transaction_date(id)
+        deleted = self.delete(id)
+        if deleted:
+            ledger_months_changed([previous_date])
+            food_expenses_deleted([id])
+            publish_event("transaction.deleted", ids=[id], months=months_of([previous_date]))
+            publish_event("stats.changed")
+        return deleted
 
     def update_status(self, id: int, status: str, error_msg: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
@@ -147,7 +142,41 @@ class TransactionService(BaseService):
         data = {"status": status}
         if error_msg:
             data["err_message"] = error_msg
-        return self.update(id, data)
+        result = self.update(id, data)
+        if result:
+            ledger_months_changed([result.get("transaction_date")])
+            publish_event("transaction.status_changed", ids=[id], status=status, months=months_of([result.get("transaction_date")]))
+            publish_event("stats.changed")
+        return result
+
+    def _get_transaction_date(self, id: int) -> Optional[str]:
+        response = self.client.table(self.table_name).select("transaction_date").eq("id", id).execute()
+        return (self._get_first_item(response.data) or {}).get("transaction_date")
+
+    def _publish_created(self, rows: List[Dict[str, Any]]) -> None:
+        # One event per write, however many rows: subscriber queues are small
+        ledger_months_changed({row.get("transaction_date") for row in rows})
+        food_expenses_written(rows)
+        if rows:
+            publish_event(
+                "transaction.created",
+                ids=[row.get("id") for row in rows],
+                types=sorted({row.get("type") for row in rows if row.get("type")}),
+                months=months_of(row.get("transaction_date") for row in rows),
+            )
+            publish_event("stats.changed")
+
+    def _publish_updated(self, rows: List[Dict[str, Any]], previous_dates: List[Optional[str]]) -> None:
+        ledger_months_changed({*previous_dates, *(row.get("transaction_date") for row in rows)})
+        food_expenses_written(rows)
+        if rows:
+            publish_event(
+                "transaction.updated",
+                ids=[row.get("id") for row in rows],
+                statuses=sorted({row.get("status") for row in rows if row.get("status")}),
+                months=months_of([*previous_dates, *(row.get("transaction_date") for row in rows)]),
+            )
+            publish_event("stats.changed")
 
     def get_transaction_by_order_code(self, order_code: int) -> Optional[Dict[str, Any]]:
         """
@@ -177,47 +206,39 @@ class TransactionService(BaseService):
         Returns:
             List of incomes
         """
-        query = self.client.table(self.table_name).select("transaction_date, amount, users!inner(*)").order("transaction_date", desc=True)
+        query = self.client.table(self.table_name).select("transaction_date, amount, user_id").order("transaction_date", desc=True)
 
         query = query.eq("type", "INCOME")
         query = query.gt("amount", 0)
+        query = query.not_.is_("user_id", "null")
 
         if start_date:
             query = query.gte("transaction_date", start_date)
         if end_date:
             query = query.lte("transaction_date", end_date)
 
-        query = query.execute()
-        return query.data
+        response = query.execute()
+
+        # Same shape as the former users!inner(*) join: only rows with a known user
+        incomes = [item for item in user_directory.attach(response.data, key="users") if item["users"]]
+        for item in incomes:
+            item.pop("user_id", None)
+        return incomes
 
     def get_dashboard_stats(self) -> Dict[str, Any]:
         """
         Get dashboard statistics.
         
+        Tổng thu = quỹ thành viên đã phân bổ theo tháng + các khoản bonus ngoài thành viên,
+        tổng chi = các transactions EXPENSE, dư quỹ = tổng thu - tổng chi. Totals come
+        from the latest balance snapshot plus the rows written after it.
+        
         Returns:
             Dict with total_income, total_expense, and balance
         """
-        # Tổng thu: quỹ thành viên đã phân bổ theo tháng + các khoản bonus ngoài thành viên
-        transaction_entries_query = self.client.table("transaction_entries").select("amount").eq("type", "FUND")
-        transaction_entries_response = transaction_entries_query.execute()
-        fund_income = sum(item.get("amount", 0) for item in transaction_entries_response.data)
-
-        bonus_query = self.client.table(self.table_name).select("amount").eq("type", "INCOME").is_("user_id", "null").eq("status", "COMPLETED").gt("amount", 0)
-        bonus_response = bonus_query.execute()
-        bonus_income = sum(item.get("amount", 0) for item in bonus_response.data)
-
-        total_income = fund_income + bonus_income
-        
-        # Tổng chi: tổng transactions có type = EXPENSE
-        expense_query = self.client.table(self.table_name).select("amount").eq("type", "EXPENSE").gt("amount", 0)
-        expense_response = expense_query.execute()
-        total_expense = sum(item.get("amount", 0) for item in expense_response.data)
-        
-        # Dư quỹ: Tổng thu - Tổng chi
-        balance = total_income - total_expense
-        
+        balance = BalanceSnapshotService().get_balance()
         return {
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "balance": balance
+            "total_income": balance["total_income"],
+            "total_expense": balance["total_expense"],
+            "balance": balance["balance"]
         }
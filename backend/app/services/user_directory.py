@@ -0,0 +1,101 @@
+"""Process-wide in-memory directory of users."""
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.database import get_fund_client
+from app.core.table_versions import table_versions
+from app.core.tenancy import FundLocal
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserDirectory:
+    """
+    Cache of the (small, rarely changing) users table.
+
+    List endpoints select only their own columns and attach the user object
+    from here instead of joining `users(*)` on every row. The directory is
+    reloaded when the users table version changes (any write through
+    UserService) or when the TTL expires.
+    """
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self._users: Dict[int, Dict[str, Any]] = {}
+        self._loaded_at = 0.0
+        self._loaded_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _is_stale(self) -> bool:
+        return (
+            self._loaded_version != table_versions.get("users")
+            or time.monotonic() - self._loaded_at > self.ttl
+        )
+
+    def _refresh(self) -> None:
+        version = table_versions.get("users")
+        response = get_fund_client().table("users").select("*").order("id").execute()
+        self._users = {user["id"]: user for user in response.data}
+        self._loaded_at = time.monotonic()
+        self._loaded_version = version
+        logger.info("User directory loaded: %d users", len(self._users))
+
+    def get_all(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Get all users (active and inactive) keyed by id.
+
+        Returns:
+            Dict of user_id -> user row (treat as read-only)
+        """
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._refresh()
+        return self._users
+
+    def get(self, user_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Get a single user.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Copy of the user row or None
+        """
+        if user_id is None:
+            return None
+        user = self.get_all().get(user_id)
+        return dict(user) if user else None
+
+    def attach(self, rows: List[Dict[str, Any]], key: str = "user") -> List[Dict[str, Any]]:
+        """
+        Attach the user object to every row by its user_id.
+
+        Args:
+            rows: Rows with a user_id column (modified in place)
+            key: Name of the attached field
+
+        Returns:
+            The same rows
+        """
+        users = self.get_all()
+        for row in rows:
+            user = users.get(row.get("user_id"))
+            row[key] = dict(user) if user else None
+        return rows
+
+    def invalidate(self) -> None:
+        """Force a reload on next access."""
+        self._loaded_version = None
+
+
+# Global instance shared by every service in the process, one directory per fund
+user_directory: FundLocal[UserDirectory] = FundLocal(
+    lambda: UserDirectory(ttl=settings.USER_DIRECTORY_TTL_SECONDS),
+    max_funds=settings.FUND_CACHE_MAX_FUNDS,
+)
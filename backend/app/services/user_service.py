@@ -1,17 +1,24 @@
 """User service for business logic."""
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from app.core.config import settings
 from app.services.base_service import BaseService
 from app.models import UserCreate
+from app.services.fund_service import FundService
 from app.services.member_fee_service import MemberFeeService
+from app.services.user_directory import user_directory
 
 
 class UserService(BaseService):
     """Service for user operations."""
     
+    query_cache_ttl = settings.QUERY_CACHE_USERS_TTL_SECONDS
+    query_cache_max_entries = settings.QUERY_CACHE_MAX_ENTRIES
+    
     def __init__(self):
         super().__init__(table_name="users")
         self.member_fee_service = MemberFeeService()
+        self.fund_service = FundService()
 
     def _get_months_between(self, start_month: str, end_month: str) -> List[str]:
         start_year, start_month_number = [int(part) for part in start_month.split("-")]
@@ -28,6 +35,21 @@ class UserService(BaseService):
 
         return months
 
+    def _get_debt_amount(
+        self,
+        user_id: int,
+        fund_shortfall: int,
+        debt_entry: Optional[Dict[str, Any]],
+        admin_user_id: Optional[int],
+    ) -> int:
+        debt_total = debt_entry.get('amount', 0) if debt_entry else 0
+        debt_amount = -(fund_shortfall + debt_total)
+
+        # Admin debt is 0
+        if (user_id == admin_user_id or debt_amount > 0):
+            debt_amount = 0
+        return debt_amount
+
     def get_all_member_names(self) -> str:
         """
         Get all active member names as comma-separated string.
@@ -36,9 +58,8 @@ class UserService(BaseService):
             Comma-separated string of member names
         """
         try:
-            response = self.client.table(self.table_name).select("name", "id").execute()
-            print('response: ', response.data)
-            names = [{ "id": user['id'], "name": user['name'] } for user in response.data]
+            users = user_directory.get_all().values()
+            names = [{ "id": user['id'], "name": user['name'] } for user in users]
             return "[" + ", ".join([f"{{'id': {user['id']}, 'name': '{user['name']}'}}" for user in names]) + "]"
         except Exception:
             return ""
@@ -103,6 +124,7 @@ class UserService(BaseService):
     
         user_ids = [user.get("id") for user in users if user.get("id")]
         fee_schedules = self.member_fee_service.get_fee_schedules(user_ids)
+        admin_user_id = self.fund_service.get_admin_user_id()
 
         # Group transactions by user_id and type
         total_user_amount: Dict[int, Dict[str, Any]] = {}
@@ -172,15 +194,9 @@ class UserService(BaseService):
             
             # O(1) lookup for debt entry
             debt_entry = debt_by_user.get(user_id)
-            debt_total = debt_entry.get('amount', 0) if debt_entry else 0
+            debt_amount = self._get_debt_amount(user_id, fund_shortfall, debt_entry, admin_user_id)
             debt_description = debt_entry.get('description', '') if debt_entry else ''
 
-            debt_amount = -(fund_shortfall + debt_total)
-
-            # Admin debt is 0
-            if (user_id == 9 or debt_amount > 0):
-                debt_amount = 0
-
             result.append({
                 'id': str(user_id),
                 'name': user.get('name', ''),
@@ -195,3 +211,127 @@ class UserService(BaseService):
             })
         
         return result
+
+    def get_contribution_matrix(self, from_year: int, to_year: int) -> Dict[str, Any]:
+        """
+        Get the paid/exempt/shortfall grid of every member for a range of years.
+        
+        Users, fund entries, unpaid debts and fee schedules are each loaded once
+        for the whole range. The result is columnar: the month axis is sent once
+        and every per-user array is aligned with it (and with users.id).
+        
+        Status codes per month: P = paid, E = exempt, S = shortfall (due but not
+        fully paid), - = not due (before the member's first fee month or in the future).
+        
+        Args:
+            from_year: First year (inclusive)
+            to_year: Last year (inclusive)
+            
+        Returns:
+            Dict with months, legend, users (columns) and per-user status/paid/fee/shortfall rows
+        """
+        users = self.get_users()
+
+        now = datetime.now()
+        current_period_month = now.strftime("%Y-%m")
+        first_month = f"{from_year}-01"
+        last_month = f"{to_year}-12"
+        months = self._get_months_between(first_month, last_month)
+
+        entries = self._fetch_all_pages(
+            lambda: self.client.table("transaction_entries")
+            .select("id, user_id, type, amount, period_month")
+            .in_("type", ["FUND", "EXEMPT"])
+            .gte("period_month", first_month)
+            .lte("period_month", last_month)
+            .order("id")
+        )
+        debts = self.client.table("debts").select("*").eq("is_fully_paid", False).execute().data
+
+        debt_by_user: Dict[int, Dict[str, Any]] = {}
+        for debt in debts:
+            if debt.get('user_id'):
+                debt_by_user[debt['user_id']] = debt
+
+        user_ids = [user.get("id") for user in users if user.get("id")]
+        fee_schedules = self.member_fee_service.get_fee_schedules(user_ids)
+        admin_user_id = self.fund_service.get_admin_user_id()
+
+        # (user_id, period_month) -> paid amount / exempt flag
+        paid_by_cell: Dict[tuple, int] = {}
+        exempt_cells = set()
+        for entry in entries:
+            cell = (entry.get('user_id'), entry.get('period_month'))
+            if entry.get('type') == "FUND":
+                paid_by_cell[cell] = paid_by_cell.get(cell, 0) + (entry.get('amount') or 0)
+            else:
+                exempt_cells.add(cell)
+
+        columns: Dict[str, List[Any]] = {
+            "id": [], "name": [], "avatar": [], "created_at": [],
+            "monthly_fee": [], "fund_shortfall": [], "debt_amount": [], "debt_description": [],
+        }
+        status_rows: List[str] = []
+        paid_rows: List[List[int]] = []
+        fee_rows: List[List[int]] = []
+        shortfall_rows: List[List[int]] = []
+
+        for user in users:
+            user_id = user.get('id')
+            created_at = user.get('created_at', '')
+            first_fee_month = self.member_fee_service.get_first_effective_month(user_id, fee_schedules)
+            start_month = max(first_month, first_fee_month) if first_fee_month else first_month
+            fees = self.member_fee_service.get_monthly_fee_series(user_id, months, fee_schedules)
+
+            statuses = []
+            paid_row = []
+            shortfall_row = []
+            fund_shortfall = 0
+            for period_month, monthly_fee in zip(months, fees):
+                paid_amount = paid_by_cell.get((user_id, period_month), 0)
+                is_due = start_month <= period_month <= current_period_month
+                shortfall = 0
+
+                if (user_id, period_month) in exempt_cells:
+                    status = "E"
+                elif is_due:
+                    status = "P" if paid_amount >= monthly_fee else "S"
+                    shortfall = max(monthly_fee - paid_amount, 0)
+                elif paid_amount and paid_amount >= monthly_fee:
+                    # Prepaid month (e.g. next month paid in advance)
+                    status = "P"
+                else:
+                    status = "-"
+
+                statuses.append(status)
+                paid_row.append(paid_amount)
+                shortfall_row.append(shortfall)
+                fund_shortfall += shortfall
+
+            debt_entry = debt_by_user.get(user_id)
+            columns["id"].append(str(user_id))
+            columns["name"].append(user.get('name', ''))
+            columns["avatar"].append(user.get('avatar', ''))
+            columns["created_at"].append(created_at[:7] if created_at else '')
+            columns["monthly_fee"].append(
+                self.member_fee_service.get_monthly_fee(user_id, min(last_month, current_period_month), fee_schedules)
+            )
+            columns["fund_shortfall"].append(fund_shortfall)
+            columns["debt_amount"].append(self._get_debt_amount(user_id, fund_shortfall, debt_entry, admin_user_id))
+            columns["debt_description"].append(debt_entry.get('description', '') if debt_entry else '')
+            status_rows.append("".join(statuses))
+            paid_rows.append(paid_row)
+            fee_rows.append(fees)
+            shortfall_rows.append(shortfall_row)
+
+        return {
+            "from_year": from_year,
+            "to_year": to_year,
+            "months": months,
+            "legend": {"P": "paid", "E": "exempt", "S": "shortfall", "-": "not_due"},
+            "users": columns,
+            "status": status_rows,
+            "paid": paid_rows,
+            "fee": fee_rows,
+            "shortfall": shortfall_rows,
+        }
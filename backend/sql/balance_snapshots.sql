@@ -0,0 +1,14 @@
+create table if not exists balance_snapshots (
+  id bigserial primary key,
+  -- Totals are cumulative through the end of this month (YYYY-MM)
+  period_month text not null unique,
+  fund_income bigint not null default 0,
+  bonus_income bigint not null default 0,
+  total_income bigint not null default 0,
+  total_expense bigint not null default 0,
+  balance bigint not null default 0,
+  created_at timestamptz not null default now()
+);
+
+create index if not exists idx_balance_snapshots_period_month
+  on balance_snapshots(period_month desc);
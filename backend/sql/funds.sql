@@ -0,0 +1,36 @@
+-- Funds (tenants). Existing data becomes fund 1 (settings.DEFAULT_FUND_ID),
+-- whose admin keeps the previous hard-coded admin member.
+create table if not exists funds (
+  id bigserial primary key,
+  name text not null,
+  -- Member whose own fund shortfall is never reported as debt
+  admin_user_id bigint null,
+  created_at timestamptz not null default now()
+);
+
+insert into funds (id, name, admin_user_id)
+values (1, 'Default fund', 9)
+on conflict (id) do nothing;
+
+select setval(pg_get_serial_sequence('funds', 'id'), greatest((select max(id) from funds), 1));
+
+alter table users add column if not exists fund_id bigint not null default 1 references funds(id);
+alter table transactions add column if not exists fund_id bigint not null default 1 references funds(id);
+alter table transaction_entries add column if not exists fund_id bigint not null default 1 references funds(id);
+alter table debts add column if not exists fund_id bigint not null default 1 references funds(id);
+alter table member_fee_schedules add column if not exists fund_id bigint not null default 1 references funds(id);
+alter table payment_events add column if not exists fund_id bigint not null default 1 references funds(id);
+alter table balance_snapshots add column if not exists fund_id bigint not null default 1 references funds(id);
+
+create index if not exists idx_users_fund on users(fund_id, id);
+create index if not exists idx_transactions_fund_date on transactions(fund_id, transaction_date);
+create index if not exists idx_transactions_fund_type on transactions(fund_id, type, id);
+create index if not exists idx_transaction_entries_fund_month on transaction_entries(fund_id, period_month);
+create index if not exists idx_transaction_entries_fund_user on transaction_entries(fund_id, user_id);
+create index if not exists idx_debts_fund_user on debts(fund_id, user_id);
+create index if not exists idx_member_fee_schedules_fund_user on member_fee_schedules(fund_id, user_id);
+create index if not exists idx_payment_events_fund_status on payment_events(fund_id, status);
+
+-- Snapshots are per fund: one row per (fund, month)
+alter table balance_snapshots drop constraint if exists balance_snapshots_period_month_key;
+create unique index if not exists uq_balance_snapshots_fund_month on balance_snapshots(fund_id, period_month);
@@ -0,0 +1,18 @@
+-- Background jobs (statement imports, reconciliations, ?async=true AI requests)
+-- shared by every worker, so GET /api/jobs/{job_id} works whichever worker
+-- answers the poll. Used when JOBS_BACKEND=table; times are epoch seconds.
+create table if not exists jobs (
+  id text primary key,
+  fund_id bigint not null references funds(id),
+  kind text not null,
+  status text not null default 'PENDING' check (status in ('PENDING', 'RUNNING', 'COMPLETED', 'FAILED')),
+  params jsonb not null default '{}'::jsonb,
+  progress jsonb not null default '{}'::jsonb,
+  result jsonb null,
+  error text null,
+  created_at double precision not null,
+  updated_at double precision not null
+);
+
+-- Pruning of finished jobs
+create index if not exists idx_jobs_updated_at on jobs(updated_at);
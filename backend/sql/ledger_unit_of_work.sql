@@ -0,0 +1,147 @@
+-- Commit the ledger writes of a batch of payments in a single transaction:
+-- per payment, its transaction row (created, or an existing PENDING one
+-- completed), its allocation entries and the debts they settle.
+-- Called through RPC by LedgerUnitOfWork; everything or nothing is written.
+--
+-- Allocations are planned by the app before this call, so two payments of
+-- the same member (webhook and image upload, import and webhook) can plan
+-- the same months. The function takes a per-member lock and rejects a plan
+-- whose months or debts were taken meanwhile (SQLSTATE PT409, HTTP 409);
+-- the app then plans again. The unique index below backs this up.
+drop function if exists commit_ledger_payment(bigint, jsonb, jsonb, bigint[]);
+
+-- One FUND/EXEMPT entry per member and month. Creating it fails while duplicates exist; list them with
+--   select fund_id, user_id, period_month, count(*) from transaction_entries
+--   where type in ('FUND', 'EXEMPT') group by 1, 2, 3 having count(*) > 1;
+create unique index if not exists transaction_entries_member_month_key
+  on transaction_entries (fund_id, user_id, period_month)
+  where type in ('FUND', 'EXEMPT');
+
+-- p_payments: [{"transaction": {...}, "transaction_id": null | id, "entries": [...], "settle_debt_ids": [...]}]
+create or replace function commit_ledger_payments(
+  p_fund_id bigint,
+  p_payments jsonb
+) returns jsonb
+language plpgsql
+as $$
+declare
+  v_payment jsonb;
+  v_row transactions%rowtype;
+  v_transaction jsonb;
+  v_entries jsonb;
+  v_debts jsonb;
+  v_already_allocated boolean;
+  v_previous_date date;
+  v_user_id bigint;
+  v_results jsonb := '[]'::jsonb;
+begin
+  -- Serialize payments of the same members; ascending order so two batches cannot deadlock
+  for v_user_id in
+    select distinct member.user_id from (
+      select (p.value->'transaction'->>'user_id')::bigint as user_id from jsonb_array_elements(p_payments) p
+      union
+      select (e.value->>'user_id')::bigint from jsonb_array_elements(p_payments) p,
+        jsonb_array_elements(coalesce(p.value->'entries', '[]'::jsonb)) e
+    ) member
+    where member.user_id is not null
+    order by member.user_id
+  loop
+    perform pg_advisory_xact_lock(p_fund_id::int, v_user_id::int);
+  end loop;
+
+  for v_payment in select value from jsonb_array_elements(p_payments)
+  loop
+    v_already_allocated := false;
+    v_previous_date := null;
+
+    if v_payment->>'transaction_id' is not null then
+      -- Completing an existing transaction: the row lock serializes redelivered webhooks
+      select * into v_row from transactions
+      where id = (v_payment->>'transaction_id')::bigint and fund_id = p_fund_id
+      for update;
+      if not found then
+        raise exception 'transaction % not found', v_payment->>'transaction_id';
+      end if;
+
+      -- Entries are only ever written together with their debts, so any entry means a complete allocation
+      v_already_allocated := exists (select 1 from transaction_entries where transaction_id = v_row.id);
+      v_previous_date := v_row.transaction_date;
+
+      update transactions t set
+        (type, description, amount, user_id, transaction_date, status) = (
+          select n.type, n.description, n.amount, n.user_id, n.transaction_date, n.status
+          from jsonb_populate_record(v_row, v_payment->'transaction') n
+        )
+      where t.id = v_row.id
+      returning * into v_row;
+      v_transaction := to_jsonb(v_row);
+    else
+      with inserted as (
+        insert into transactions (
+          fund_id, type, description, amount, user_id, transaction_date, status,
+          order_code, food_name, restaurant_name, source_url, image_url
+        )
+        select
+          p_fund_id, t.type, t.description, t.amount, t.user_id, t.transaction_date, t.status,
+          t.order_code, t.food_name, t.restaurant_name, t.source_url, t.image_url
+        from jsonb_populate_record(null::transactions, v_payment->'transaction') t
+        returning *
+      )
+      select to_jsonb(inserted) into v_transaction from inserted;
+    end if;
+
+    v_entries := '[]'::jsonb;
+    v_debts := '[]'::jsonb;
+    if not v_already_allocated then
+      -- The plan was made before the lock: a concurrent payment may have covered its months or settled its debts
+      if exists (
+        select 1
+        from jsonb_populate_recordset(null::transaction_entries, coalesce(v_payment->'entries', '[]'::jsonb)) n
+        where (
+          n.type in ('FUND', 'EXEMPT') and exists (
+            select 1 from transaction_entries e
+            where e.fund_id = p_fund_id and e.user_id = n.user_id
+              and e.period_month = n.period_month and e.type in ('FUND', 'EXEMPT')
+          )
+        ) or (
+          n.type = 'DEBT' and exists (
+            select 1 from debts d where d.fund_id = p_fund_id and d.id = n.debt_id and d.is_fully_paid
+          )
+        )
+      ) then
+        raise exception using
+          errcode = 'PT409',
+          message = 'ledger months or debts already allocated',
+          hint = 'plan the allocation again';
+      end if;
+
+      with inserted as (
+        insert into transaction_entries (fund_id, transaction_id, debt_id, user_id, amount, type, period_month)
+        select p_fund_id, (v_transaction->>'id')::bigint, e.debt_id, e.user_id, e.amount, e.type, e.period_month
+        from jsonb_populate_recordset(null::transaction_entries, coalesce(v_payment->'entries', '[]'::jsonb)) e
+        returning *
+      )
+      select coalesce(jsonb_agg(to_jsonb(inserted) order by inserted.id), '[]'::jsonb) into v_entries from inserted;
+
+      with settled as (
+        update debts set is_fully_paid = true
+        where fund_id = p_fund_id
+          and id in (select jsonb_array_elements_text(coalesce(v_payment->'settle_debt_ids', '[]'::jsonb))::bigint)
+          and not is_fully_paid
+        returning *
+      )
+      select coalesce(jsonb_agg(to_jsonb(settled) order by settled.id), '[]'::jsonb) into v_debts from settled;
+    end if;
+
+    v_results := v_results || jsonb_build_array(jsonb_build_object(
+      'transaction', v_transaction,
+      'entries', v_entries,
+      'debts', v_debts,
+      'already_allocated', v_already_allocated,
+      'previous_transaction_date', v_previous_date
+    ));
+  end loop;
+
+  return v_results;
+end;
+$$;
@@ -0,0 +1,14 @@
+create table if not exists payment_events (
+  id bigserial primary key,
+  order_code bigint not null unique,
+  payload jsonb null,
+  status text not null default 'RECEIVED' check (status in ('RECEIVED', 'PROCESSING', 'APPLIED', 'FAILED')),
+  attempts integer not null default 0,
+  last_error text null,
+  received_at timestamptz not null default now(),
+  processing_started_at timestamptz null,
+  applied_at timestamptz null
+);
+
+create index if not exists idx_payment_events_status
+  on payment_events(status, received_at);
@@ -0,0 +1,34 @@
+"""Test setup: the settings the app needs at import time, without real services."""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Never reached: tests that touch the database install an in-memory client
+for name, value in {
+    "SUPABASE_URL": "http://127.0.0.1:9",
+    "SUPABASE_KEY": "test.test.test",
+    "GOOGLE_API_KEY": "test",
+    "PAYOS_CLIENT_ID": "test",
+    "PAYOS_API_KEY": "test",
+    "PAYOS_CHECKSUM_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Route every database call of the app to a fresh in-memory client."""
+    import app.core.database as database
+    from app.core.table_versions import table_versions
+    from fake_supabase import FakeSupabase, commit_ledger_payments
+
+    db = FakeSupabase()
+    db.functions["commit_ledger_payments"] = commit_ledger_payments
+    monkeypatch.setattr(database.fund_client, "_client", db)
+    monkeypatch.setattr(database, "supabase", db)
+    # Drop what earlier tests cached in this process
+    table_versions.bump(*database.FUND_SCOPED_TABLES)
+    return db
@@ -0,0 +1,316 @@
+"""In-memory stand-in for the Supabase client, covering the query builder calls the services make."""
+import copy
+import itertools
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+
+
+def _split_top_level(spec: str) -> List[str]:
+    parts, depth, current = [], 0, ""
+    for char in spec:
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        current += char
+    return parts + [current] if current else parts
+
+
+def _comparable(stored: Any, value: str) -> tuple:
+    # Filter values arrive as text; numbers compare as numbers
+    if isinstance(stored, (int, float)) and not isinstance(stored, bool):
+        return stored, type(stored)(value)
+    return str(stored), value
+
+
+class FakeResponse:
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    """One PostgREST request: filters are Python predicates over the stored rows."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.operation = "select"
+        self.payload: Any = None
+        self.columns = "*"
+        self.filters: List[Callable[[Dict[str, Any]], bool]] = []
+        self.ordering: List[tuple] = []
+        self.row_range: Optional[tuple] = None
+        self.row_limit: Optional[int] = None
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self.negate = False
+
+    def select(self, *columns: str, count: Optional[str] = None) -> "FakeQuery":
+        self.columns = ",".join(columns) or "*"
+        return self
+
+    def insert(self, data: Any, **kwargs: Any) -> "FakeQuery":
+        self.operation, self.payload = "insert", data
+        return self
+
+    def upsert(self, data: Any, on_conflict: Optional[str] = None, ignore_duplicates: bool = False, **kwargs: Any) -> "FakeQuery":
+        self.operation, self.payload = "upsert", data
+        self.on_conflict, self.ignore_duplicates = on_conflict, ignore_duplicates
+        return self
+
+    def update(self, data: Dict[str, Any], **kwargs: Any) -> "FakeQuery":
+        self.operation, self.payload = "update", data
+        return self
+
+    def delete(self, **kwargs: Any) -> "FakeQuery":
+        self.operation = "delete"
+        return self
+
+    @property
+    def not_(self) -> "FakeQuery":
+        self.negate = True
+        return self
+
+    def _filter(self, predicate: Callable[[Dict[str, Any]], bool]) -> "FakeQuery":
+        negate, self.negate = self.negate, False
+        self.filters.append((lambda row: not predicate(row)) if negate else predicate)
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(lambda row: row.get(column) == value)
+
+    def neq(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(lambda row: row.get(column) != value)
+
+    def gt(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(lambda row: row.get(column) is not None and row[column] > value)
+
+    def gte(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(lambda row: row.get(column) is not None and row[column] >= value)
+
+    def lt(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(lambda row: row.get(column) is not None and row[column] < value)
+
+    def lte(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(lambda row: row.get(column) is not None and row[column] <= value)
+
+    def in_(self, column: str, values: Any) -> "FakeQuery":
+        values = list(values)
+        return self._filter(lambda row: row.get(column) in values)
+
+    def is_(self, column: str, value: Any) -> "FakeQuery":
+        return self._filter(lambda row: row.get(column) is None if value in ("null", None) else row.get(column) == value)
+
+    def ilike(self, column: str, pattern: str) -> "FakeQuery":
+        regex = re.compile("^" + re.escape(pattern).replace("%", ".*") + "$", re.I)
+        return self._filter(lambda row: row.get(column) is not None and bool(regex.match(str(row[column]))))
+
+    def or_(self, spec: str) -> "FakeQuery":
+        conditions = [self._condition(part) for part in _split_top_level(spec)]
+        return self._filter(lambda row: any(condition(row) for condition in conditions))
+
+    @classmethod
+    def _condition(cls, part: str) -> Callable[[Dict[str, Any]], bool]:
+        if part.startswith("and(") and part.endswith(")"):
+            conditions = [cls._condition(inner) for inner in _split_top_level(part[4:-1])]
+            return lambda row: all(condition(row) for condition in conditions)
+        column, operator, value = part.split(".", 2)
+        if operator == "is" and value == "null":
+            return lambda row: row.get(column) is None
+        if operator == "not" and value == "is.null":
+            return lambda row: row.get(column) is not None
+        compare = {
+            "eq": lambda a, b: a == b,
+            "gt": lambda a, b: a > b,
+            "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b,
+        }[operator]
+        return lambda row: row.get(column) is not None and compare(*_comparable(row[column], value))
+
+    def order(self, column: str, desc: bool = False, **kwargs: Any) -> "FakeQuery":
+        self.ordering.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self.row_range = (start, end)
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        self.row_limit = count
+        return self
+
+    def execute(self) -> FakeResponse:
+        self.db.requests.append((self.table, self.operation))
+        if self.db.fail_on and self.db.fail_on(self.table, self.operation):
+            raise APIError({"message": f"injected failure on {self.operation} {self.table}", "code": "XX000"})
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.operation in ("insert", "upsert"):
+            return FakeResponse(self._write(rows))
+
+        matched = [row for row in rows if all(predicate(row) for predicate in self.filters)]
+        if self.operation == "update":
+            for row in matched:
+                row.update(copy.deepcopy(self.payload))
+            return FakeResponse(copy.deepcopy(matched))
+        if self.operation == "delete":
+            for row in matched:
+                rows.remove(row)
+            return FakeResponse(copy.deepcopy(matched))
+
+        for column, desc in reversed(self.ordering):
+            matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        count = len(matched)
+        if self.row_range:
+            matched = matched[self.row_range[0]:self.row_range[1] + 1]
+        if self.row_limit is not None:
+            matched = matched[:self.row_limit]
+        return FakeResponse([self._project(row) for row in matched], count=count)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        items = self.payload if isinstance(self.payload, list) else [self.payload]
+        written = []
+        for item in items:
+            item = copy.deepcopy(item)
+            if self.operation == "upsert" and self.on_conflict:
+                keys = self.on_conflict.split(",")
+                existing = [row for row in rows if all(row.get(key) == item.get(key) for key in keys)]
+                if existing:
+                    if not self.ignore_duplicates:
+                        existing[0].update(item)
+                        written.append(copy.deepcopy(existing[0]))
+                    continue
+            if item.get("id") is None:
+                item["id"] = next(self.db.ids)
+            item.setdefault("created_at", self.db.now)
+            rows.append(item)
+            written.append(copy.deepcopy(item))
+        return written
+
+    def _project(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = copy.deepcopy(row)
+        columns = [column.strip() for column in self.columns.split(",")]
+        if any(column.startswith("users") for column in columns):
+            users = [user for user in self.db.tables.get("users", []) if user["id"] == row.get("user_id")]
+            row["users"] = copy.deepcopy(users[0]) if users else None
+        if "*" in columns:
+            return row
+        projected = {column: row.get(column) for column in columns if "(" not in column and "!" not in column}
+        if "users" in row:
+            projected["users"] = row["users"]
+        return projected
+
+
+class FakeRPC:
+    def __init__(self, db: "FakeSupabase", function: str, params: Dict[str, Any]):
+        self.db = db
+        self.function = function
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        self.db.requests.append((self.function, "rpc"))
+        if self.db.fail_on and self.db.fail_on(self.function, "rpc"):
+            raise APIError({"message": f"injected failure on rpc {self.function}", "code": "XX000"})
+        if self.function not in self.db.functions:
+            # What PostgREST answers when the SQL function was never applied
+            raise APIError({"message": f"Could not find the function public.{self.function}", "code": "PGRST202"})
+        return FakeResponse(self.db.functions[self.function](self.db, self.params))
+
+
+class FakeSupabase:
+    """
+    Tables are lists of dicts; ids come from one shared counter.
+
+    Args:
+        tables: Initial rows per table
+        now: created_at stamped on inserted rows
+    """
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None, now: str = "2026-03-15T08:00:00+00:00"):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.now = now
+        self.ids = itertools.count(1000)
+        self.requests: List[tuple] = []
+        self.functions: Dict[str, Callable[["FakeSupabase", Dict[str, Any]], Any]] = {}
+        # (table, operation) or (function, "rpc") -> True to make that request fail
+        self.fail_on: Optional[Callable[[str, str], bool]] = None
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, function: str, params: Optional[Dict[str, Any]] = None) -> FakeRPC:
+        return FakeRPC(self, function, params or {})
+
+    def rows(self, table: str, **where: Any) -> List[Dict[str, Any]]:
+        return [row for row in self.tables.get(table, []) if all(row.get(key) == value for key, value in where.items())]
+
+
+# Columns commit_ledger_payments copies into a new transaction and over an existing one
+_INSERTED_COLUMNS = (
+    "type", "description", "amount", "user_id", "transaction_date", "status",
+    "order_code", "food_name", "restaurant_name", "source_url", "image_url",
+)
+_COMPLETED_COLUMNS = ("type", "description", "amount", "user_id", "transaction_date", "status")
+
+
+def commit_ledger_payments(db: FakeSupabase, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Python twin of sql/ledger_unit_of_work.sql; a single-threaded fake needs no member locks."""
+    fund_id = params["p_fund_id"]
+    transactions = db.tables.setdefault("transactions", [])
+    entries = db.tables.setdefault("transaction_entries", [])
+    debts = db.tables.setdefault("debts", [])
+    # Roll everything back when a payment fails, like the database transaction
+    snapshot = copy.deepcopy(db.tables)
+    results = []
+    try:
+        for payment in params["p_payments"]:
+            already_allocated, previous_date = False, None
+            if payment.get("transaction_id") is not None:
+                rows = [row for row in transactions if row["id"] == payment["transaction_id"] and row.get("fund_id") == fund_id]
+                if not rows:
+                    raise APIError({"message": f"transaction {payment['transaction_id']} not found", "code": "P0001"})
+                row = rows[0]
+                already_allocated = any(entry["transaction_id"] == row["id"] for entry in entries)
+                previous_date = row.get("transaction_date")
+                row.update({column: payment["transaction"][column] for column in _COMPLETED_COLUMNS if column in payment["transaction"]})
+            else:
+                row = {column: payment["transaction"].get(column) for column in _INSERTED_COLUMNS}
+                row.update(id=next(db.ids), fund_id=fund_id, created_at=db.now)
+                transactions.append(row)
+
+            written, settled = [], []
+            if not already_allocated:
+                for entry in payment.get("entries") or []:
+                    covered = entry["type"] in ("FUND", "EXEMPT") and any(
+                        existing.get("fund_id") == fund_id and existing["type"] in ("FUND", "EXEMPT")
+                        and (existing["user_id"], existing["period_month"]) == (entry["user_id"], entry["period_month"])
+                        for existing in entries
+                    )
+                    paid = entry["type"] == "DEBT" and any(
+                        debt.get("fund_id") == fund_id and debt["id"] == entry.get("debt_id") and debt.get("is_fully_paid") for debt in debts
+                    )
+                    if covered or paid:
+                        raise APIError({"message": "ledger months or debts already allocated", "code": "PT409"})
+                for entry in payment.get("entries") or []:
+                    written.append({**entry, "id": next(db.ids), "fund_id": fund_id, "transaction_id": row["id"], "created_at": db.now})
+                entries.extend(written)
+                for debt in debts:
+                    if debt.get("fund_id") == fund_id and debt["id"] in (payment.get("settle_debt_ids") or []) and not debt.get("is_fully_paid"):
+                        debt["is_fully_paid"] = True
+                        settled.append(debt)
+            results.append({
+                "transaction": copy.deepcopy(row),
+                "entries": copy.deepcopy(written),
+                "debts": copy.deepcopy(sorted(settled, key=lambda debt: debt["id"])),
+                "already_allocated": already_allocated,
+                "previous_transaction_date": previous_date,
+            })
+    except Exception:
+        db.tables.clear()
+        db.tables.update(snapshot)
+        raise
+    return results
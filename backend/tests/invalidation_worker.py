@@ -0,0 +1,76 @@
+"""
+Worker process for test_invalidation: one command per stdin line, one JSON answer per stdout line.
+
+Commands: load (read through the query cache), publish (announce a write to users),
+listen (connect an /api/events subscriber), event (publish a change event),
+events (drain what the subscriber received), quit.
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.event_bus import event_broker, publish_event  # noqa: E402
+from app.core.invalidation import invalidation_bus  # noqa: E402
+from app.core.query_cache import query_cache  # noqa: E402
+from app.core.table_versions import table_versions  # noqa: E402
+
+loads = 0
+
+
+def load():
+    global loads
+    loads += 1
+    return [{"id": 1, "name": f"load {loads}"}]
+
+
+def listen():
+    """Subscribe from an event loop running in a thread, like the SSE endpoint does."""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    async def subscribe():
+        return event_broker.subscribe()
+
+    return loop, asyncio.run_coroutine_threadsafe(subscribe(), loop).result()
+
+
+def drain(loop, subscriber):
+    async def get_all():
+        events = []
+        while not subscriber.queue.empty():
+            events.append(subscriber.queue.get_nowait())
+        return events
+
+    return asyncio.run_coroutine_threadsafe(get_all(), loop).result()
+
+
+def main() -> None:
+    invalidation_bus.start()
+    loop = subscriber = None
+    print(json.dumps({"ready": invalidation_bus.backend.name}), flush=True)
+    for line in sys.stdin:
+        command = line.strip()
+        if command == "load":
+            rows = query_cache.get_or_load("users", ("all",), load, ttl=300, max_entries=10)
+            print(json.dumps({"version": table_versions.get("users"), "loads": loads, "rows": rows}), flush=True)
+        elif command == "publish":
+            invalidation_bus.publish("users")
+            print(json.dumps({"published": True}), flush=True)
+        elif command == "listen":
+            loop, subscriber = listen()
+            print(json.dumps({"listening": True}), flush=True)
+        elif command == "event":
+            publish_event("transaction.created", ids=[os.getpid()])
+            print(json.dumps({"published": True}), flush=True)
+        elif command == "events":
+            print(json.dumps({"events": [[event["type"], event["data"]["ids"]] for event in drain(loop, subscriber)]}), flush=True)
+        elif command == "quit":
+            return
+
+
+if __name__ == "__main__":
+    main()
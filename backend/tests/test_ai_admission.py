@@ -0,0 +1,74 @@
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core import ai_scheduler as scheduler_module
+from app.core.ai_scheduler import BACKGROUND, BATCH, INTERACTIVE, AIScheduler, admit_ai_requests
+from app.core.config import settings
+
+
+def make_scheduler(max_admitted):
+    return AIScheduler(
+        1,
+        {
+            INTERACTIVE: {"weight": 6, "max_concurrency": 1},
+            BATCH: {"weight": 2, "max_concurrency": 1},
+            BACKGROUND: {"weight": 1, "max_concurrency": 1},
+        },
+        max_admitted=max_admitted,
+    )
+
+
+def test_admission_is_bounded_and_released_once():
+    scheduler = make_scheduler(max_admitted=2)
+    first, second = scheduler.try_admit(), scheduler.try_admit()
+
+    assert scheduler.try_admit() is None
+    assert scheduler.rejected == 1
+
+    first.release()
+    first.release()
+    assert scheduler.admitted == 1
+    assert scheduler.try_admit() is not None
+    second.release()
+
+
+def admission_app():
+    app = FastAPI()
+    app.middleware("http")(admit_ai_requests)
+
+    @app.post("/api/chat")
+    async def chat():
+        return {"admitted": scheduler_module.ai_scheduler.admitted}
+
+    @app.post("/api/chat/stream")
+    async def stream():
+        async def body():
+            yield f"admitted={scheduler_module.ai_scheduler.admitted}"
+        return StreamingResponse(body())
+
+    @app.post("/api/other")
+    async def other():
+        return {"admitted": scheduler_module.ai_scheduler.admitted}
+
+    return app
+
+
+def test_full_worker_answers_503_with_retry_after(monkeypatch):
+    scheduler = make_scheduler(max_admitted=1)
+    monkeypatch.setattr(scheduler_module, "ai_scheduler", scheduler)
+    client = TestClient(admission_app())
+
+    held = scheduler.try_admit()
+    response = client.post("/api/chat")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(settings.AI_RETRY_AFTER_SECONDS)
+
+    # Non-AI routes are not limited
+    assert client.post("/api/other").status_code == 200
+
+    held.release()
+    assert client.post("/api/chat").json() == {"admitted": 1}
+    assert client.post("/api/chat/stream").text == "admitted=1"
+    assert scheduler.admitted == 0
+    assert scheduler.rejected == 1
@@ -0,0 +1,64 @@
+import asyncio
+
+from app.core.ai_scheduler import BACKGROUND, BATCH, INTERACTIVE, AIScheduler
+
+
+def make_scheduler(max_concurrency=1):
+    return AIScheduler(
+        max_concurrency,
+        {
+            INTERACTIVE: {"weight": 6, "max_concurrency": max_concurrency},
+            BATCH: {"weight": 2, "max_concurrency": max_concurrency},
+            BACKGROUND: {"weight": 1, "max_concurrency": 1},
+        },
+    )
+
+
+async def run_all(scheduler, requests):
+    """Queue requests behind a held slot, release it and return the grant order."""
+    order = []
+
+    async def request(lane, user):
+        async with scheduler.slot(lane, user):
+            order.append((lane, user))
+            await asyncio.sleep(0)
+
+    async with scheduler.slot(BACKGROUND, "holder"):
+        tasks = [asyncio.create_task(request(lane, user)) for lane, user in requests]
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_lanes_share_slots_by_weight():
+    scheduler = make_scheduler()
+    order = asyncio.run(run_all(scheduler, [(BATCH, "bulk")] * 8 + [(INTERACTIVE, "user")] * 6))
+
+    # Interactive (weight 6) gets three grants for each batch (weight 2) one
+    assert [lane for lane, _ in order[:4]].count(INTERACTIVE) == 3
+    assert [lane for lane, _ in order].index(BATCH) < 4
+    assert scheduler.running == 0
+
+
+def test_users_of_a_lane_take_turns():
+    scheduler = make_scheduler()
+    order = asyncio.run(run_all(scheduler, [(BATCH, "bulk")] * 6 + [(BATCH, "other")] * 2))
+
+    users = [user for _, user in order]
+    assert users.index("other") <= 1
+    assert users[:4].count("other") == 2
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = make_scheduler()
+        async with scheduler.slot(BATCH, "holder"):
+            waiter = asyncio.create_task(scheduler.slot(BATCH, "gone").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            assert scheduler.lanes[BATCH].depth == 0
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.running == 0
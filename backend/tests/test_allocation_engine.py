@@ -0,0 +1,144 @@
+from app.services.allocation_engine import (
+    FeeTable,
+    Payment,
+    allocate_payments,
+    default_start_for,
+    index_to_month,
+    latest_paid_months,
+    month_to_index,
+)
+
+FEE = 100
+
+
+def payment(amount, as_of_month="2026-03", transaction_id=1, user_id=7, **kwargs):
+    return Payment(transaction_id=transaction_id, user_id=user_id, amount=amount, as_of_month=as_of_month, **kwargs)
+
+
+def fund_months(result, transaction_id=None):
+    return [
+        entry["period_month"] for entry in result.entries
+        if entry["type"] == "FUND" and (transaction_id is None or entry["transaction_id"] == transaction_id)
+    ]
+
+
+def test_month_index_round_trip():
+    assert month_to_index("2026-01") == 2026 * 12
+    assert month_to_index("2026-12-31") == 2026 * 12 + 11
+    assert index_to_month(month_to_index("2025-12") + 1) == "2026-01"
+
+
+def test_fee_table_latest_effective_schedule_wins():
+    fees = FeeTable([
+        {"id": 1, "user_id": 7, "effective_from_month": "2026-01", "monthly_fee": 150},
+        {"id": 2, "user_id": 7, "effective_from_month": "2026-03", "effective_to_month": "2026-04", "monthly_fee": 0},
+    ], default_fee=FEE)
+
+    assert fees.fee(7, month_to_index("2025-12")) == FEE
+    assert fees.fee(7, month_to_index("2026-02")) == 150
+    assert fees.fee(7, month_to_index("2026-03")) == 0
+    assert fees.fee(7, month_to_index("2026-05")) == 150
+    assert fees.fee(8, month_to_index("2026-03")) == FEE
+
+
+def test_latest_paid_months_ignores_debt_entries():
+    latest = latest_paid_months([
+        {"user_id": 7, "type": "FUND", "period_month": "2026-01"},
+        {"user_id": 7, "type": "EXEMPT", "period_month": "2026-02"},
+        {"user_id": 7, "type": "DEBT", "period_month": "2026-05"},
+    ])
+    assert latest == {7: month_to_index("2026-02")}
+
+
+def test_arrears_are_paid_from_the_month_after_the_latest_entry():
+    result = allocate_payments(
+        [payment(3 * FEE, as_of_month="2026-04")],
+        [],
+        [{"user_id": 7, "type": "FUND", "period_month": "2026-01"}],
+        [],
+        default_fee=FEE,
+    )
+    assert fund_months(result) == ["2026-02", "2026-03", "2026-04"]
+    assert result.remaining == {1: 0}
+
+
+def test_member_without_entries_starts_in_january():
+    assert default_start_for("2026-03-15") == "2026-01"
+
+    result = allocate_payments([payment(3 * FEE, as_of_month="2026-03")], [], [], [], default_fee=FEE)
+    assert fund_months(result) == ["2026-01", "2026-02", "2026-03"]
+
+
+def test_overpayment_prepays_only_the_next_month():
+    existing = [{"user_id": 7, "type": "FUND", "period_month": "2026-02"}]
+    result = allocate_payments([payment(3 * FEE + FEE // 2)], [], existing, [], default_fee=FEE)
+
+    assert fund_months(result) == ["2026-03", "2026-04"]
+    assert result.remaining == {1: FEE + FEE // 2}
+    assert result.insufficient_fee == {}
+
+
+def test_member_already_paid_ahead_prepays_nothing():
+    existing = [{"user_id": 7, "type": "FUND", "period_month": "2026-06"}]
+    result = allocate_payments([payment(FEE)], [], existing, [], default_fee=FEE)
+    assert result.entries == []
+    assert result.remaining == {1: FEE}
+
+
+def test_insufficient_amount_is_reported_with_the_fee_due():
+    result = allocate_payments([payment(FEE - 1)], [], [], [], default_fee=FEE)
+    assert result.entries == []
+    assert result.insufficient_fee == {1: FEE}
+    assert result.remaining == {1: FEE - 1}
+
+    partly_paid = allocate_payments([payment(FEE + FEE // 2, as_of_month="2026-02")], [], [], [], default_fee=FEE)
+    assert fund_months(partly_paid) == ["2026-01"]
+    assert partly_paid.insufficient_fee == {1: FEE}
+
+
+def test_debt_is_settled_only_when_fully_covered():
+    debts = [{"id": 5, "user_id": 7, "amount": 50, "created_at": "2026-01-01"}]
+    existing = [{"user_id": 7, "type": "FUND", "period_month": "2026-03"}]
+
+    settled = allocate_payments([payment(50 + FEE)], [], existing, debts, default_fee=FEE)
+    assert settled.settled_debt_ids == [5]
+    assert [(entry["type"], entry["debt_id"], entry["amount"]) for entry in settled.entries] == [
+        ("DEBT", 5, 50),
+        ("FUND", None, FEE),
+    ]
+
+    too_small = allocate_payments([payment(40)], [], existing, debts, default_fee=FEE)
+    assert too_small.settled_debt_ids == []
+    assert too_small.remaining == {1: 40}
+
+
+def test_payments_of_a_batch_see_each_other():
+    existing = [{"user_id": 7, "type": "FUND", "period_month": "2026-01"}]
+    result = allocate_payments(
+        [payment(FEE, transaction_id=1), payment(FEE, transaction_id=2)],
+        [],
+        existing,
+        [],
+        default_fee=FEE,
+    )
+    assert fund_months(result, 1) == ["2026-02"]
+    assert fund_months(result, 2) == ["2026-03"]
+
+
+def test_arrears_come_before_prepayment_in_a_batch():
+    result = allocate_payments(
+        [payment(2 * FEE, as_of_month="2026-01", transaction_id=1), payment(2 * FEE, as_of_month="2026-03", transaction_id=2)],
+        [],
+        [],
+        [],
+        default_fee=FEE,
+    )
+    assert fund_months(result, 1) == ["2026-01", "2026-02"]
+    assert fund_months(result, 2) == ["2026-03", "2026-04"]
+
+
+def test_zero_fee_months_are_always_taken():
+    schedules = [{"id": 1, "user_id": 7, "effective_from_month": "2026-02", "effective_to_month": "2026-02", "monthly_fee": 0}]
+    existing = [{"user_id": 7, "type": "FUND", "period_month": "2026-01"}]
+    result = allocate_payments([payment(FEE)], schedules, existing, [], default_fee=FEE)
+    assert [(entry["period_month"], entry["amount"]) for entry in result.entries] == [("2026-02", 0), ("2026-03", FEE)]
@@ -0,0 +1,72 @@
+import pytest
+
+from app.services import balance_snapshot_service as snapshots_module
+from app.services.balance_snapshot_service import BalanceSnapshotService, take_missing_snapshots
+from app.services.ledger_changes import ledger_months_changed
+
+
+def transaction(transaction_id, transaction_type, amount, transaction_date, **extra):
+    return {
+        "id": transaction_id, "fund_id": 1, "type": transaction_type, "amount": amount, "user_id": None,
+        "status": "COMPLETED", "transaction_date": transaction_date, "created_at": f"{transaction_date or '2026-03-15'}T08:00:00+00:00",
+        **extra,
+    }
+
+
+@pytest.fixture
+def ledger(fake_db, monkeypatch):
+    monkeypatch.setattr(snapshots_module, "_complete_through", {})
+    monkeypatch.setattr(snapshots_module, "last_closed_month", lambda: "2026-03")
+    fake_db.tables["transactions"] = [
+        transaction(1, "INCOME", 1000, "2026-01-10"),
+        transaction(2, "EXPENSE", 100, "2026-02-10"),
+        # Saved from an image without a date: counts from created_at
+        transaction(3, "EXPENSE", 50, None, created_at="2026-03-20T08:00:00+00:00"),
+    ]
+    return fake_db
+
+
+def test_balance_read_does_not_write_snapshots(ledger):
+    assert BalanceSnapshotService().get_balance()["balance"] == 850
+    assert ledger.rows("balance_snapshots") == []
+
+    take_missing_snapshots()
+    assert [row["period_month"] for row in ledger.rows("balance_snapshots")] == ["2026-01", "2026-02", "2026-03"]
+    assert ledger.rows("balance_snapshots")[-1]["balance"] == 850
+
+    requests = len(ledger.requests)
+    take_missing_snapshots()
+    assert len(ledger.requests) == requests
+
+
+def test_undated_rows_after_the_latest_snapshot_are_counted(ledger):
+    BalanceSnapshotService().take_snapshots("2026-02")
+    balance = BalanceSnapshotService().get_balance()
+
+    assert balance["snapshot_month"] == "2026-02"
+    assert balance["total_expense"] == 150
+
+
+def test_history_without_snapshots_matches_history_with_them(ledger):
+    without = BalanceSnapshotService().get_balance_history("2026-02", "2026-04")
+    take_missing_snapshots()
+    with_snapshots = BalanceSnapshotService().get_balance_history("2026-02", "2026-04")
+
+    assert without == with_snapshots
+    assert [point["balance"] for point in without["points"]] == [900, 850, 850]
+
+
+def test_snapshots_computed_during_a_ledger_write_are_dropped(ledger, monkeypatch):
+    service = BalanceSnapshotService()
+    compute_months = service.analytics_service._compute_months
+
+    def write_while_reading(from_month, to_month):
+        totals = compute_months(from_month, to_month)
+        ledger.tables["transactions"].append(transaction(4, "EXPENSE", 10, "2026-01-20"))
+        ledger_months_changed(["2026-01-20"])
+        return totals
+
+    monkeypatch.setattr(service.analytics_service, "_compute_months", write_while_reading)
+
+    assert service.take_snapshots() == []
+    assert ledger.rows("balance_snapshots") == []
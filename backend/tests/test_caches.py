@@ -0,0 +1,38 @@
+from app.core.query_cache import QueryCache, query_key
+from app.core.table_versions import table_versions
+from app.core.tenancy import use_fund
+
+
+def test_query_key_ignores_keyword_and_set_order():
+    assert query_key("get", filters={"a": 1, "b": 2}, ids={3, 1}) == query_key("get", ids={1, 3}, filters={"b": 2, "a": 1})
+    assert query_key("get", ids=[1, 3]) != query_key("get", ids=[3, 1])
+
+
+def test_query_cache_serves_copies_until_the_table_changes():
+    cache = QueryCache()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [{"id": 1}]
+
+    with use_fund(901):
+        first = cache.get_or_load("test_query_cache", ("all",), load, ttl=60, max_entries=10)
+        first.append({"id": 2})
+        assert cache.get_or_load("test_query_cache", ("all",), load, ttl=60, max_entries=10) == [{"id": 1}]
+        assert len(loads) == 1
+
+        table_versions.bump("test_query_cache")
+        cache.get_or_load("test_query_cache", ("all",), load, ttl=60, max_entries=10)
+        assert len(loads) == 2
+
+
+def test_query_cache_is_partitioned_by_fund():
+    cache = QueryCache()
+    with use_fund(902):
+        cache.get_or_load("test_query_cache_funds", ("all",), lambda: "fund 902", ttl=60, max_entries=10)
+    with use_fund(903):
+        assert cache.get_or_load("test_query_cache_funds", ("all",), lambda: "fund 903", ttl=60, max_entries=10) == "fund 903"
+
+    stats = cache.stats()["test_query_cache_funds"]
+    assert (stats["misses"], stats["funds"]) == (2, 2)
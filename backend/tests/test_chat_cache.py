@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from app.core.cache import TTLCache
+from app.models.extraction_model import IncomeExtraction
+from app.services import gemini_service as gemini_module
+from app.services.transaction_service import TransactionService
+from app.services.user_service import UserService
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.evictions == 1
+
+
+def test_ttl_cache_entries_expire():
+    cache = TTLCache(ttl=0.01)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=60)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+
+@pytest.fixture
+def gemini(fake_db, monkeypatch):
+    """GeminiService whose model answers are counted instead of requested."""
+    fake_db.tables["users"] = [{"id": 1, "fund_id": 1, "name": "An"}]
+    service = gemini_module.GeminiService()
+    service.calls = 0
+
+    def generate(call, check=None):
+        service.calls += 1
+        return IncomeExtraction(description=f"answer {service.calls}")
+
+    monkeypatch.setattr(service, "_get_system_prompt", lambda type="INCOME": "prompt")
+    monkeypatch.setattr(gemini_module.chat_model_router, "generate", generate)
+    gemini_module.chat_cache.current().clear()
+    return service
+
+
+def test_same_message_is_answered_from_the_cache(gemini):
+    first = gemini.chat_with_ai("An chuyen 200k")
+
+    assert gemini.chat_with_ai("  AN   chuyển 200K ") == first
+    assert gemini.calls == 1
+
+
+def test_no_cache_asks_the_model_again(gemini):
+    gemini.chat_with_ai("An chuyen 200k")
+    gemini.chat_with_ai("An chuyen 200k", use_cache=False)
+
+    assert gemini.calls == 2
+
+
+def test_users_change_invalidates_every_answer(gemini):
+    gemini.chat_with_ai("An chuyen 200k")
+    UserService().update(1, {"name": "An Nguyen"})
+
+    assert gemini.chat_with_ai("An chuyen 200k")["description"] == "answer 2"
+
+
+def test_ledger_change_only_invalidates_questions(gemini):
+    gemini.chat_with_ai("An chuyen 200k")
+    gemini.chat_with_ai("Quy con bao nhieu?")
+    TransactionService().create_many([{"type": "INCOME", "status": "PENDING", "amount": 1}])
+
+    assert gemini.chat_with_ai("An chuyen 200k")["description"] == "answer 1"
+    assert gemini.chat_with_ai("Quy con bao nhieu?")["description"] == "answer 3"
@@ -0,0 +1,57 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.conditional import conditional_get
+from app.core.tenancy import FUND_HEADER
+from app.services.fund_service import select_fund
+from app.services.user_service import UserService
+
+
+def users_app():
+    app = FastAPI()
+    app.middleware("http")(select_fund)
+    app.state.reads = 0
+
+    @app.get("/users", dependencies=[Depends(conditional_get("users"))])
+    async def users():
+        app.state.reads += 1
+        return UserService().get_all()
+
+    return app
+
+
+def test_matching_if_none_match_answers_304_without_reading(fake_db):
+    app = users_app()
+    client = TestClient(app)
+
+    first = client.get("/users")
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    again = client.get("/users", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert client.get("/users", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert app.state.reads == 1
+
+
+def test_write_to_a_read_table_changes_the_etag(fake_db):
+    fake_db.tables["users"] = [{"id": 1, "fund_id": 1, "name": "An"}]
+    client = TestClient(users_app())
+    etag = client.get("/users").headers["ETag"]
+
+    UserService().update(1, {"name": "An Nguyen"})
+
+    response = client.get("/users", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["name"] == "An Nguyen"
+
+
+def test_etag_depends_on_the_query_and_the_fund(fake_db):
+    fake_db.tables["funds"] = [{"id": 2, "name": "Two"}]
+    client = TestClient(users_app())
+
+    etag = client.get("/users?a=1&b=2").headers["ETag"]
+    assert client.get("/users?b=2&a=1").headers["ETag"] == etag
+    assert client.get("/users?a=1&b=2", headers={FUND_HEADER: "2"}).headers["ETag"] != etag
@@ -0,0 +1,56 @@
+import asyncio
+
+from app.core import event_bus
+from app.core.event_bus import EventBroker
+from app.models import TransactionCreate
+from app.services.allocation_engine import AllocationResult
+from app.services.ledger_unit_of_work import LedgerUnitOfWork
+from app.services.payment_allocation_service import PaymentAllocationService
+
+
+def published(monkeypatch, write):
+    """Run a write with one subscriber connected; return (events received, subscriber dropped)."""
+    broker = EventBroker(buffer_size=8)
+    monkeypatch.setattr(event_bus, "event_broker", broker)
+
+    async def run():
+        subscriber = broker.subscribe()
+        write()
+        events = []
+        while not subscriber.queue.empty():
+            events.append(subscriber.queue.get_nowait())
+        return events, subscriber.dropped
+
+    return asyncio.run(run())
+
+
+def test_large_write_publishes_one_event_per_kind(fake_db, monkeypatch):
+    count = 100
+
+    def write():
+        unit_of_work = LedgerUnitOfWork()
+        for user_id in range(1, count + 1):
+            unit_of_work.add_transaction(TransactionCreate(type="INCOME", amount=100, user_id=user_id, transaction_date="2026-03-05", status="COMPLETED"))
+            unit_of_work.add_allocation(AllocationResult(entries=[
+                {"transaction_id": 0, "user_id": user_id, "amount": 100, "type": "FUND", "period_month": "2026-03", "debt_id": None},
+            ]))
+        unit_of_work.commit()
+
+    events, dropped = published(monkeypatch, write)
+
+    assert not dropped
+    by_type = {event["type"]: event["data"] for event in events if event["type"] != "stats.changed"}
+    assert len(by_type["transaction.created"]["ids"]) == count
+    assert by_type["transaction.created"]["months"] == ["2026-03"]
+    assert len(by_type["entries.allocated"]["transaction_ids"]) == count
+
+
+def test_webhook_payment_publishes_a_single_transaction_event(fake_db, monkeypatch):
+    fake_db.tables["transactions"] = [{"id": 1, "fund_id": 1, "type": "INCOME", "amount": 0, "user_id": 7, "status": "PENDING", "order_code": 42}]
+
+    events, _ = published(monkeypatch, lambda: PaymentAllocationService()._apply_payment(42, paid_on="2026-03-05"))
+
+    transaction_events = [event for event in events if event["type"].startswith("transaction.")]
+    assert [(event["type"], event["data"]["ids"], event["data"]["statuses"]) for event in transaction_events] == [
+        ("transaction.updated", [1], ["COMPLETED"]),
+    ]
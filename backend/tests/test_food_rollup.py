@@ -0,0 +1,119 @@
+from app.core.invalidation import Invalidation
+from app.core.tenancy import FundLocal
+from app.services import food_rollup as food_rollup_module
+from app.services.food_rollup import FOOD_EXPENSES, FoodRollup, food_expenses_written
+
+
+def expense(id, amount=50_000, food_name="Phở bò", restaurant_name="Phở Thìn", transaction_date="2026-03-05"):
+    return {
+        "id": id, "fund_id": 1, "type": "EXPENSE", "amount": amount, "description": food_name,
+        "food_name": food_name, "restaurant_name": restaurant_name, "transaction_date": transaction_date,
+    }
+
+
+def loaded_rollup(monkeypatch, fake_db, rows):
+    fake_db.tables["transactions"] = rows
+    rollups = FundLocal(lambda: FoodRollup(ttl=3600))
+    monkeypatch.setattr(food_rollup_module, "food_rollup", rollups)
+    rollup = rollups.for_fund(1)
+    rollup.dishes()
+    fake_db.requests.clear()
+    return rollup
+
+
+def remote(*names, keys=None):
+    return Invalidation(fund_id=1, names=names, keys=keys, remote=True)
+
+
+def test_remote_expense_write_reads_only_its_rows(fake_db, monkeypatch):
+    rollup = loaded_rollup(monkeypatch, fake_db, [expense(1), expense(2)])
+    fake_db.rows("transactions", id=2)[0]["amount"] = 70_000
+    fake_db.tables["transactions"].append(expense(3, restaurant_name="Bún Chả Hương Liên", food_name="Bún chả"))
+
+    food_rollup_module._on_invalidation(remote("transactions", FOOD_EXPENSES, keys=("2", "3")))
+
+    assert fake_db.requests == [("transactions", "select")]
+    restaurants = {row["restaurant"]: (row["count"], row["total"]) for row in rollup.restaurants()}
+    assert restaurants == {"Phở Thìn": (2, 120_000), "Bún Chả Hương Liên": (1, 50_000)}
+
+
+def test_remote_deletes_and_income_writes(fake_db, monkeypatch):
+    rollup = loaded_rollup(monkeypatch, fake_db, [expense(1), expense(2)])
+    fake_db.tables["transactions"] = [expense(1)]
+
+    food_rollup_module._on_invalidation(remote("transactions"))
+    assert fake_db.requests == []
+
+    food_rollup_module._on_invalidation(remote(FOOD_EXPENSES, keys=("2",)))
+    assert [(row["dish"], row["count"]) for row in rollup.dishes()] == [("Phở bò", 1)]
+
+
+def test_only_food_writes_are_announced(fake_db, monkeypatch):
+    loaded_rollup(monkeypatch, fake_db, [expense(1)])
+    published = []
+    monkeypatch.setattr(food_rollup_module.invalidation_bus, "publish", lambda *names, keys=None: published.append((names, keys)))
+
+    food_expenses_written([{"id": 7, "type": "INCOME", "amount": 200_000}])
+    # The expense became income: the other workers must drop it
+    food_expenses_written([{**expense(1), "type": "INCOME"}])
+
+    assert published == [((FOOD_EXPENSES,), ["1"])]
+
+
+def by_key(rows, name):
+    return {row[name]: (row["count"], row["total"], row["last_at"]) for row in rows}
+
+
+def test_apply_adds_and_replaces_contributions(fake_db, monkeypatch):
+    rollup = loaded_rollup(monkeypatch, fake_db, [expense(1, transaction_date="2026-03-01")])
+
+    rollup.apply([expense(2, amount=30_000, transaction_date="2026-03-09")])
+    assert by_key(rollup.dishes(), "dish") == {"Phở bò": (2, 80_000, "2026-03-09")}
+
+    # Moving the latest expense back in time and to another restaurant
+    rollup.apply([expense(2, amount=40_000, restaurant_name="Phở Lý Quốc Sư", transaction_date="2026-02-20")])
+    assert by_key(rollup.dishes(), "dish") == {"Phở bò": (2, 90_000, "2026-03-01")}
+    assert by_key(rollup.restaurants(), "restaurant") == {
+        "Phở Thìn": (1, 50_000, "2026-03-01"),
+        "Phở Lý Quốc Sư": (1, 40_000, "2026-02-20"),
+    }
+    assert sorted((row["restaurant"], row["month"], row["count"], row["total"]) for row in rollup.restaurant_months()) == [
+        ("Phở Lý Quốc Sư", "2026-02", 1, 40_000),
+        ("Phở Thìn", "2026-03", 1, 50_000),
+    ]
+
+
+def test_remove_rolls_back_totals_and_last_visit(fake_db, monkeypatch):
+    rollup = loaded_rollup(monkeypatch, fake_db, [
+        expense(1, transaction_date="2026-03-01"),
+        expense(2, amount=30_000, transaction_date="2026-04-09"),
+        expense(3, food_name="Bún chả", restaurant_name="Bún Chả Hương Liên"),
+    ])
+
+    rollup.remove(2)
+    rollup.remove(3)
+    # Not a food expense: nothing to remove
+    rollup.remove(99)
+
+    assert by_key(rollup.dishes(), "dish") == {"Phở bò": (1, 50_000, "2026-03-01")}
+    assert by_key(rollup.restaurants(), "restaurant") == {"Phở Thìn": (1, 50_000, "2026-03-01")}
+    assert [(row["month"], row["count"]) for row in rollup.restaurant_months()] == [("2026-03", 1)]
+
+
+def test_incremental_updates_match_a_full_reload(fake_db, monkeypatch):
+    rollup = loaded_rollup(monkeypatch, fake_db, [expense(id, amount=id * 1000, transaction_date=f"2026-0{id % 5 + 1}-1{id}") for id in range(1, 8)])
+
+    rollup.apply([expense(8, food_name="Bún chả", restaurant_name="Bún Chả Hương Liên")])
+    rollup.apply([{**expense(3), "type": "INCOME"}])
+    rollup.apply([expense(5, amount=1, transaction_date="2026-01-01")])
+    rollup.remove(6)
+    fake_db.tables["transactions"] = [
+        *[expense(id, amount=id * 1000, transaction_date=f"2026-0{id % 5 + 1}-1{id}") for id in (1, 2, 4, 7)],
+        expense(5, amount=1, transaction_date="2026-01-01"),
+        expense(8, food_name="Bún chả", restaurant_name="Bún Chả Hương Liên"),
+    ]
+
+    reloaded = FoodRollup(ttl=3600)
+    assert sorted(rollup.dishes(), key=str) == sorted(reloaded.dishes(), key=str)
+    assert sorted(rollup.restaurants(), key=str) == sorted(reloaded.restaurants(), key=str)
+    assert sorted(rollup.restaurant_months(), key=str) == sorted(reloaded.restaurant_months(), key=str)
@@ -0,0 +1,93 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.core.config import Settings
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "invalidation_worker.py")
+
+
+class Worker:
+    def __init__(self, env):
+        self.process = subprocess.Popen(
+            [sys.executable, WORKER], env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        assert self.read() == {"ready": "unix"}
+
+    def send(self, command):
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+        return self.read()
+
+    def read(self):
+        return json.loads(self.process.stdout.readline())
+
+    def stop(self):
+        self.process.stdin.write("quit\n")
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+
+def wait_for_version(worker, version, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        answer = worker.send("load")
+        if answer["version"] > version or time.monotonic() > deadline:
+            return answer
+        time.sleep(0.05)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork") or sys.platform == "win32", reason="unix sockets")
+def test_unix_backend_invalidates_the_other_worker(tmp_path):
+    env = {**os.environ, "INVALIDATION_BACKEND": "unix", "INVALIDATION_SOCKET_DIR": str(tmp_path / "bus")}
+    first, second = Worker(env), Worker(env)
+    try:
+        for reader, writer in ((first, second), (second, first)):
+            cached = reader.send("load")
+            assert reader.send("load")["loads"] == cached["loads"]
+
+            writer.send("publish")
+            answer = wait_for_version(reader, cached["version"])
+
+            assert answer["version"] == cached["version"] + 1
+            assert answer["loads"] == cached["loads"] + 1
+    finally:
+        first.stop()
+        second.stop()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork") or sys.platform == "win32", reason="unix sockets")
+def test_change_events_reach_subscribers_of_every_worker(tmp_path):
+    env = {**os.environ, "INVALIDATION_BACKEND": "unix", "INVALIDATION_SOCKET_DIR": str(tmp_path / "bus")}
+    writer, reader = Worker(env), Worker(env)
+    try:
+        reader.send("listen")
+        writer.send("event")
+
+        deadline = time.monotonic() + 5
+        events = reader.send("events")["events"]
+        while not events and time.monotonic() < deadline:
+            time.sleep(0.05)
+            events = reader.send("events")["events"]
+
+        assert [event_type for event_type, _ in events] == ["transaction.created"]
+        assert events[0][1] == [writer.process.pid]
+    finally:
+        writer.stop()
+        reader.stop()
+
+
+def test_several_workers_need_a_shared_backend(monkeypatch):
+    monkeypatch.setattr(Settings, "WEB_CONCURRENCY", 4)
+    monkeypatch.setattr(Settings, "JOBS_BACKEND", "table")
+    monkeypatch.setattr(Settings, "INVALIDATION_BACKEND", "local")
+    with pytest.raises(ValueError, match="INVALIDATION_BACKEND"):
+        Settings.validate()
+
+    monkeypatch.setattr(Settings, "INVALIDATION_BACKEND", "unix")
+    Settings.validate()
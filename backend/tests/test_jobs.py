@@ -0,0 +1,52 @@
+import pytest
+
+from app.core.config import Settings
+from app.core.jobs import JobRegistry, MemoryJobStore, TableJobStore
+
+
+def test_table_jobs_are_visible_to_every_worker(fake_db):
+    running = JobRegistry(TableJobStore(retention_seconds=3600), progress_interval=3600)
+    polled = JobRegistry(TableJobStore(retention_seconds=3600))
+
+    job = running.create("bank_statement_import", filename="march.csv")
+    running.start(job["id"])
+    running.progress(job["id"], rows_inserted=100)
+    running.progress(job["id"], rows_inserted=200)
+
+    seen = polled.get(job["id"])
+    assert (seen["status"], seen["progress"], seen["params"]) == ("RUNNING", {"rows_inserted": 100}, {"filename": "march.csv"})
+
+    running.complete(job["id"], {"income_created": 2})
+    seen = polled.get(job["id"])
+    assert (seen["status"], seen["progress"], seen["result"]) == ("COMPLETED", {"rows_inserted": 200}, {"income_created": 2})
+    assert polled.get("missing") is None
+
+
+def test_old_table_jobs_are_pruned(fake_db):
+    fake_db.tables["jobs"] = [{"id": "old", "fund_id": 1, "status": "COMPLETED", "created_at": 0.0, "updated_at": 0.0}]
+
+    job = JobRegistry(TableJobStore(retention_seconds=3600)).create("payment_reconciliation")
+
+    assert [row["id"] for row in fake_db.rows("jobs")] == [job["id"]]
+
+
+def test_memory_jobs_keep_the_most_recent():
+    registry = JobRegistry(MemoryJobStore(max_jobs=2))
+    first, second, third = (registry.create("chat") for _ in range(3))
+
+    registry.progress(third["id"], done=1)
+
+    assert registry.get(first["id"]) is None
+    assert registry.get(second["id"])["status"] == "PENDING"
+    assert registry.get(third["id"])["progress"] == {"done": 1}
+
+
+def test_several_workers_need_shared_jobs(monkeypatch):
+    monkeypatch.setattr(Settings, "WEB_CONCURRENCY", 4)
+    monkeypatch.setattr(Settings, "INVALIDATION_BACKEND", "unix")
+    monkeypatch.setattr(Settings, "JOBS_BACKEND", "memory")
+    with pytest.raises(ValueError, match="JOBS_BACKEND"):
+        Settings.validate()
+
+    monkeypatch.setattr(Settings, "JOBS_BACKEND", "table")
+    Settings.validate()
@@ -0,0 +1,151 @@
+import pytest
+
+from app.constants import MONTHLY_FEE
+from app.core.config import settings
+from app.models import TransactionCreate
+from app.services.allocation_engine import AllocationResult
+from app.services.ledger_unit_of_work import LedgerConflictError, LedgerUnitOfWork
+from app.services.payment_allocation_service import PaymentAllocationService
+
+
+def income(amount=100, user_id=7, transaction_date="2026-03-05"):
+    return TransactionCreate(type="INCOME", amount=amount, user_id=user_id, transaction_date=transaction_date, status="COMPLETED")
+
+
+def allocation(transaction_id=0, debt_id=None):
+    result = AllocationResult(entries=[{
+        "transaction_id": transaction_id, "user_id": 7, "amount": 100, "type": "FUND", "period_month": "2026-03", "debt_id": None,
+    }])
+    if debt_id:
+        result.entries.insert(0, {
+            "transaction_id": transaction_id, "user_id": 7, "amount": 50, "type": "DEBT", "period_month": "2026-03", "debt_id": debt_id,
+        })
+        result.settled_debt_ids.append(debt_id)
+    return result
+
+
+@pytest.mark.parametrize("sequential", [False, True])
+def test_commit_links_each_payment_to_its_entries(fake_db, monkeypatch, sequential):
+    monkeypatch.setattr(settings, "LEDGER_COMMIT_SEQUENTIAL", sequential)
+    fake_db.tables["debts"] = [{"id": 5, "fund_id": 1, "user_id": 7, "amount": 50, "is_fully_paid": False}]
+    plan = allocation(transaction_id=-1, debt_id=5)
+    plan.entries.append({"transaction_id": -2, "user_id": 7, "amount": 100, "type": "FUND", "period_month": "2026-04", "debt_id": None})
+
+    unit_of_work = LedgerUnitOfWork()
+    unit_of_work.add_transaction(income())
+    unit_of_work.add_allocation(plan, transaction_id=-1)
+    unit_of_work.add_transaction(income(transaction_date="2026-04-05"))
+    unit_of_work.add_allocation(plan, transaction_id=-2)
+    first, second = unit_of_work.commit()
+
+    assert [entry["transaction_id"] for entry in first.entries] == [first.transaction["id"]] * 2
+    assert [entry["period_month"] for entry in second.entries] == ["2026-04"]
+    assert [debt["id"] for debt in first.settled_debts] == [5]
+    assert second.settled_debts == []
+    assert fake_db.rows("debts", id=5)[0]["is_fully_paid"] is True
+    assert (("commit_ledger_payments", "rpc") in fake_db.requests) is not sequential
+
+
+def test_missing_commit_function_is_an_error(fake_db):
+    del fake_db.functions["commit_ledger_payments"]
+
+    unit_of_work = LedgerUnitOfWork()
+    unit_of_work.add_transaction(income())
+    unit_of_work.add_allocation(allocation())
+    with pytest.raises(RuntimeError, match="sql/ledger_unit_of_work.sql"):
+        unit_of_work.commit()
+
+    assert fake_db.rows("transactions") == []
+    assert fake_db.rows("transaction_entries") == []
+
+
+def test_failed_sequential_commit_is_undone(fake_db, monkeypatch):
+    monkeypatch.setattr(settings, "LEDGER_COMMIT_SEQUENTIAL", True)
+    fake_db.tables["transactions"] = [{"id": 1, "fund_id": 1, "type": "INCOME", "amount": 100, "user_id": 7, "status": "PENDING", "transaction_date": None}]
+    fake_db.tables["debts"] = [{"id": 5, "fund_id": 1, "user_id": 7, "amount": 50, "is_fully_paid": False}]
+    fake_db.fail_on = lambda table, operation: (table, operation) == ("debts", "update")
+
+    unit_of_work = LedgerUnitOfWork()
+    unit_of_work.complete_transaction(1, income())
+    unit_of_work.add_allocation(allocation(debt_id=5))
+    unit_of_work.add_transaction(income())
+    with pytest.raises(Exception, match="injected failure"):
+        unit_of_work.commit()
+
+    assert fake_db.rows("transaction_entries") == []
+    assert [(row["id"], row["status"], row["transaction_date"]) for row in fake_db.rows("transactions")] == [(1, "PENDING", None)]
+
+
+@pytest.mark.parametrize("sequential", [False, True])
+def test_completing_an_allocated_transaction_keeps_its_entries(fake_db, monkeypatch, sequential):
+    monkeypatch.setattr(settings, "LEDGER_COMMIT_SEQUENTIAL", sequential)
+    fake_db.tables["transactions"] = [{"id": 1, "fund_id": 1, "type": "INCOME", "amount": 100, "user_id": 7, "status": "PENDING"}]
+    fake_db.tables["transaction_entries"] = [{"id": 9, "fund_id": 1, "transaction_id": 1, "user_id": 7, "amount": 100, "type": "FUND", "period_month": "2026-03"}]
+
+    unit_of_work = LedgerUnitOfWork()
+    unit_of_work.complete_transaction(1, income())
+    unit_of_work.add_allocation(allocation())
+    commit = unit_of_work.commit()[0]
+
+    assert commit.already_allocated
+    assert commit.entries == []
+    assert commit.transaction["status"] == "COMPLETED"
+    assert [entry["id"] for entry in fake_db.rows("transaction_entries")] == [9]
+
+
+def test_webhook_payment_is_allocated_once_and_retried_after_a_crash(fake_db):
+    fake_db.tables["transactions"] = [{"id": 1, "fund_id": 1, "type": "INCOME", "amount": 100, "user_id": 7, "status": "PENDING", "order_code": 42}]
+    fake_db.tables["debts"] = [{"id": 5, "fund_id": 1, "user_id": 7, "amount": 50, "is_fully_paid": False, "created_at": "2026-01-01"}]
+    service = PaymentAllocationService()
+
+    fake_db.fail_on = lambda table, operation: (table, operation) == ("commit_ledger_payments", "rpc")
+    with pytest.raises(Exception, match="injected failure"):
+        service._apply_payment(42, paid_on="2026-03-05")
+    assert fake_db.rows("transaction_entries") == []
+    assert fake_db.rows("transactions", id=1)[0]["status"] == "PENDING"
+
+    fake_db.fail_on = None
+    assert service._apply_payment(42, paid_on="2026-03-05") is True
+    entries = fake_db.rows("transaction_entries", transaction_id=1)
+    assert [entry["type"] for entry in entries] == ["DEBT"]
+    assert fake_db.rows("debts", id=5)[0]["is_fully_paid"] is True
+
+    assert service._apply_payment(42, paid_on="2026-03-05") is False
+    assert len(fake_db.rows("transaction_entries", transaction_id=1)) == len(entries)
+
+
+@pytest.mark.parametrize("sequential", [False, True])
+def test_months_taken_by_a_concurrent_payment_are_rejected(fake_db, monkeypatch, sequential):
+    monkeypatch.setattr(settings, "LEDGER_COMMIT_SEQUENTIAL", sequential)
+    fake_db.tables["transaction_entries"] = [{"id": 9, "fund_id": 1, "transaction_id": 3, "user_id": 7, "amount": 100, "type": "FUND", "period_month": "2026-03"}]
+
+    unit_of_work = LedgerUnitOfWork()
+    unit_of_work.add_transaction(income())
+    unit_of_work.add_allocation(allocation())
+    with pytest.raises(LedgerConflictError):
+        unit_of_work.commit()
+
+    assert fake_db.rows("transactions") == []
+    assert [entry["id"] for entry in fake_db.rows("transaction_entries")] == [9]
+
+
+def test_webhook_plans_again_after_a_conflict(fake_db):
+    fake_db.tables["transactions"] = [{"id": 1, "fund_id": 1, "type": "INCOME", "amount": MONTHLY_FEE, "user_id": 7, "status": "PENDING", "order_code": 42}]
+    fake_db.tables["transaction_entries"] = [{"id": 8, "fund_id": 1, "transaction_id": 2, "user_id": 7, "amount": 100, "type": "FUND", "period_month": "2026-02"}]
+    service = PaymentAllocationService()
+    plan = service._plan
+
+    def plan_then_lose_the_race(*args):
+        result = plan(*args)
+        if not fake_db.rows("transaction_entries", id=9):
+            # An image upload of the same member commits March between this plan and its commit
+            fake_db.tables["transaction_entries"].append(
+                {"id": 9, "fund_id": 1, "transaction_id": 3, "user_id": 7, "amount": 100, "type": "FUND", "period_month": "2026-03"}
+            )
+        return result
+
+    service._plan = plan_then_lose_the_race
+    assert service._apply_payment(42, paid_on="2026-03-05") is True
+
+    assert [entry["period_month"] for entry in fake_db.rows("transaction_entries", transaction_id=1)] == ["2026-04"]
+    assert fake_db.rows("transactions", id=1)[0]["status"] == "COMPLETED"
@@ -0,0 +1,34 @@
+from app.services.member_matcher import MemberMatcher
+
+USERS = [
+    {"id": 1, "name": "Nguyễn Văn An"},
+    {"id": 2, "name": "Trần Thị Bình"},
+    {"id": 3, "name": "An"},
+]
+
+
+def test_exact_name_ignores_case_and_diacritics():
+    assert MemberMatcher(USERS).match("NGUYEN VAN AN") == 1
+
+
+def test_name_inside_a_transfer_note():
+    assert MemberMatcher(USERS).match("tran thi binh chuyen tien quy thang 3") == 2
+
+
+def test_typo_still_matches_above_the_threshold():
+    assert MemberMatcher(USERS, min_score=0.85).match("Nguyen Van Ann") == 1
+
+
+def test_longer_name_wins_on_equal_scores():
+    # "an" and "nguyen van an" both appear as whole words
+    assert MemberMatcher(USERS).match("nguyen van an dong quy") == 1
+
+
+def test_first_matching_text_is_used():
+    assert MemberMatcher(USERS).match("", None, "Tran Thi Binh") == 2
+
+
+def test_ambiguous_or_unknown_text_gives_no_match():
+    twins = [{"id": 1, "name": "Lê Hoa"}, {"id": 2, "name": "Le Hoa"}]
+    assert MemberMatcher(twins).match("le hoa") is None
+    assert MemberMatcher(USERS).match("Pham Minh Chau") is None
@@ -0,0 +1,93 @@
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from app.core.config import settings
+from app.services.model_router import ModelRouter, ModelTier, parse_tiers
+
+
+class Answer(BaseModel):
+    amount: int
+
+
+def make_router():
+    return ModelRouter("test", [ModelTier("cheap", 5), ModelTier("strong", 20)])
+
+
+def scripted(outcomes):
+    """Tier call returning (or raising) the outcome scripted for each model."""
+    calls = []
+
+    def call(model, timeout):
+        calls.append((model, timeout))
+        outcome = outcomes[model]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return call, calls
+
+
+def invalid_output():
+    try:
+        Answer.model_validate({"amount": "many"})
+    except ValidationError as e:
+        return e
+
+
+def test_parse_tiers():
+    assert parse_tiers(" a:1.5, b-c:30 ,") == [ModelTier("a", 1.5), ModelTier("b-c", 30)]
+    with pytest.raises(ValueError):
+        parse_tiers("no-slo")
+
+
+def test_usable_answer_from_the_cheapest_tier_is_served():
+    router = make_router()
+    call, calls = scripted({"cheap": (Answer(amount=1), 0.9), "strong": (Answer(amount=2), 0.9)})
+
+    assert router.generate(call).amount == 1
+    assert calls == [("cheap", 5)]
+
+
+@pytest.mark.parametrize("cheap, check, reason", [
+    ((Answer(amount=1), 0.0), None, "low_confidence"),
+    ((Answer(amount=0), 0.9), lambda answer: None if answer.amount else "missing_amount", "missing_amount"),
+    (invalid_output(), None, "invalid_output"),
+])
+def test_unusable_answer_escalates(cheap, check, reason):
+    router = make_router()
+    call, calls = scripted({"cheap": cheap, "strong": (Answer(amount=2), 0.9)})
+
+    assert router.generate(call, check=check).amount == 2
+    assert [model for model, _ in calls] == ["cheap", "strong"]
+    assert router.stats()[0]["escalation_reasons"] == {reason: 1}
+
+
+def test_failed_call_falls_back_to_the_next_tier():
+    router = make_router()
+    call, _ = scripted({"cheap": RuntimeError("down"), "strong": (Answer(amount=2), None)})
+
+    assert router.generate(call).amount == 2
+    assert router.stats()[0]["errors"] == 1
+
+
+def test_escalated_answer_is_kept_when_stronger_tiers_fail():
+    router = make_router()
+    call, _ = scripted({"cheap": (Answer(amount=1), settings.AI_MIN_CONFIDENCE / 2), "strong": RuntimeError("down")})
+
+    assert router.generate(call).amount == 1
+
+
+def test_last_tier_is_served_whatever_its_quality():
+    router = make_router()
+    call, calls = scripted({"cheap": (Answer(amount=1), 0.0), "strong": (Answer(amount=2), 0.0)})
+
+    assert router.generate(call, start_tier=1).amount == 2
+    assert calls == [("strong", 20)]
+
+
+def test_every_tier_failing_raises_the_last_error():
+    router = make_router()
+    call, _ = scripted({"cheap": RuntimeError("cheap down"), "strong": RuntimeError("strong down")})
+
+    with pytest.raises(RuntimeError, match="strong down"):
+        router.generate(call)
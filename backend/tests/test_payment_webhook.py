@@ -0,0 +1,31 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import payment_router as payment_router_module
+
+
+def webhook_client(monkeypatch, order_code):
+    monkeypatch.setattr(payment_router_module.payos_service, "verify_webhook_data", lambda body: {"orderCode": order_code})
+    app = FastAPI()
+    app.include_router(payment_router_module.router, prefix="/api/payments")
+    return TestClient(app)
+
+
+def test_unknown_order_code_is_recorded_as_failed(fake_db, monkeypatch):
+    response = webhook_client(monkeypatch, 77).post("/api/payments/webhook", content=b"{}")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "FAILED"
+    event = fake_db.rows("payment_events", order_code=77)[0]
+    assert event["status"] == "FAILED"
+    assert "77" in event["last_error"]
+
+
+def test_known_order_code_is_allocated_in_the_background(fake_db, monkeypatch):
+    fake_db.tables["transactions"] = [{"id": 1, "fund_id": 1, "type": "INCOME", "amount": 100, "user_id": 7, "status": "PENDING", "order_code": 42}]
+
+    response = webhook_client(monkeypatch, 42).post("/api/payments/webhook", content=b"{}")
+
+    assert response.json()["status"] == "RECEIVED"
+    assert fake_db.rows("payment_events", order_code=42)[0]["status"] == "APPLIED"
+    assert fake_db.rows("transactions", id=1)[0]["status"] == "COMPLETED"
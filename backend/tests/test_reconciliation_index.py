@@ -0,0 +1,58 @@
+from app.services.reconciliation_service import PendingIndex
+from app.services.statement_parser import StatementLine
+
+
+def line(transaction_date, amount=200_000):
+    return StatementLine(line_no=1, transaction_date=transaction_date, amount=amount)
+
+
+PENDING = [
+    {"id": 1, "amount": 200_000, "transaction_date": "2026-03-01"},
+    {"id": 2, "amount": 200_000, "transaction_date": "2026-03-05"},
+    {"id": 3, "amount": 150_000, "transaction_date": "2026-03-05"},
+    {"id": 4, "amount": 200_000, "transaction_date": None},
+]
+
+
+def ids(transactions):
+    return sorted(transaction["id"] for transaction in transactions)
+
+
+def test_candidates_share_the_amount_within_the_window():
+    index = PendingIndex(PENDING, window_days=3)
+    assert ids(index.candidates(line("2026-03-06"))) == [2]
+    assert ids(index.candidates(line("2026-03-04"))) == [1, 2]
+
+
+def test_bank_date_may_lag_one_day_behind_the_transaction():
+    index = PendingIndex(PENDING, window_days=3)
+    assert ids(index.candidates(line("2026-02-28"))) == [1]
+    assert ids(index.candidates(line("2026-02-27"))) == []
+
+
+def test_other_amounts_and_undated_transactions_are_not_candidates():
+    index = PendingIndex(PENDING, window_days=30)
+    assert ids(index.candidates(line("2026-03-05", amount=150_000))) == [3]
+    assert 4 not in ids(index.candidates(line("2026-03-05")))
+
+
+def test_payments_completed_while_matching_are_skipped(fake_db, monkeypatch):
+    from app.services.reconciliation_service import ReconciliationService
+
+    pending = [
+        {"id": 1, "fund_id": 1, "type": "INCOME", "status": "PENDING", "amount": 200_000, "order_code": 111111, "transaction_date": "2026-03-05"},
+        {"id": 2, "fund_id": 1, "type": "INCOME", "status": "PENDING", "amount": 200_000, "order_code": 222222, "transaction_date": "2026-03-05"},
+    ]
+    fake_db.tables["transactions"] = [pending[0], {**pending[1], "status": "COMPLETED"}]
+    service = ReconciliationService()
+    monkeypatch.setattr(service, "_get_pending_transactions", lambda: pending)
+    completed = []
+    monkeypatch.setattr(service, "_complete", lambda candidate: completed.append(candidate.transaction["id"]) or "applied")
+
+    summary = service.reconcile([
+        StatementLine(line_no=1, transaction_date="2026-03-05", amount=200_000, description="ORDER 111111"),
+        StatementLine(line_no=2, transaction_date="2026-03-05", amount=200_000, description="ORDER 222222"),
+    ])
+
+    assert completed == [1]
+    assert {item["transaction_id"]: item["outcome"] for item in summary["matched"]} == {1: "applied", 2: "skipped"}
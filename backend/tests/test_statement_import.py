@@ -0,0 +1,60 @@
+from app.services.statement_import_service import StatementImportService
+
+HEADER = "Ngày giao dịch;Ghi có;Ghi nợ;Nội dung;Tên người chuyển;Mã GD\n"
+
+
+def statement(tmp_path, *rows):
+    path = tmp_path / "statement.csv"
+    path.write_text(HEADER + "".join(row + "\n" for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def with_member(fake_db, *transactions):
+    fake_db.tables["users"] = [{"id": 7, "fund_id": 1, "name": "Nguyen Van An", "email": "an@example.com"}]
+    fake_db.tables["transactions"] = [{"fund_id": 1, "type": "INCOME", "user_id": 7, "status": "COMPLETED", **row} for row in transactions]
+
+
+def test_line_booked_by_the_webhook_is_not_imported_again(fake_db, tmp_path):
+    with_member(fake_db, {"id": 1, "amount": 200_000, "transaction_date": "2026-03-04", "description": "Đóng quỹ qua PayOS", "order_code": 42})
+    fake_db.tables["transaction_entries"] = [{"id": 2, "fund_id": 1, "transaction_id": 1, "user_id": 7, "amount": 200_000, "type": "FUND", "period_month": "2026-01"}]
+
+    summary = StatementImportService().import_file(statement(tmp_path, "05/03/2026;200.000;;CK quy;NGUYEN VAN AN;FT001"))
+
+    assert summary["duplicates"] == 1
+    assert summary["income_created"] == 0
+    assert [row["id"] for row in fake_db.rows("transactions")] == [1]
+    assert [entry["id"] for entry in fake_db.rows("transaction_entries")] == [2]
+
+
+def test_undated_image_payment_counts_from_its_creation(fake_db, tmp_path):
+    with_member(fake_db, {"id": 1, "amount": 200_000, "transaction_date": None, "created_at": "2026-03-06T09:00:00+00:00", "description": "Ảnh chuyển khoản"})
+
+    summary = StatementImportService().import_file(statement(tmp_path, "05/03/2026;200.000;;CK quy;NGUYEN VAN AN;FT001"))
+
+    assert summary["duplicates"] == 1
+
+
+def test_each_booked_payment_stands_for_one_line(fake_db, tmp_path):
+    with_member(fake_db, {"id": 1, "amount": 200_000, "transaction_date": "2026-03-04", "description": "Đóng quỹ qua PayOS"})
+
+    summary = StatementImportService().import_file(statement(
+        tmp_path,
+        "05/03/2026;200.000;;CK quy thang 3;NGUYEN VAN AN;FT001",
+        "06/03/2026;200.000;;CK quy thang 4;NGUYEN VAN AN;FT002",
+        "20/03/2026;200.000;;CK quy thang 5;NGUYEN VAN AN;FT003",
+    ))
+
+    assert summary["duplicates"] == 1
+    assert summary["income_created"] == 2
+
+
+def test_reimporting_a_statement_is_a_no_op(fake_db, tmp_path):
+    with_member(fake_db)
+    path = statement(tmp_path, "05/03/2026;200.000;;CK quy;NGUYEN VAN AN;FT001", "06/03/2026;;50.000;Mua nuoc;;FT002")
+
+    first = StatementImportService().import_file(path)
+    second = StatementImportService().import_file(path)
+
+    assert (first["income_created"], first["expense_created"]) == (1, 1)
+    assert (second["duplicates"], second["income_created"], second["expense_created"]) == (2, 0, 0)
+    assert len(fake_db.rows("transaction_entries")) == first["fund_entries"]
@@ -0,0 +1,63 @@
+import io
+
+import pytest
+
+from app.services.statement_parser import StatementFormatError, iter_statement_lines, parse_amount, parse_date
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1.000.000", 1_000_000),
+    ("1,000,000", 1_000_000),
+    ("200000.00", 200_000),
+    ("1.234,60", 1235),
+    ("-50,000", -50_000),
+    ("(50.000)", -50_000),
+    ("500.000 VND", 500_000),
+    ("", None),
+    ("abc", None),
+])
+def test_parse_amount(raw, expected):
+    assert parse_amount(raw) == expected
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("05/03/2026", "2026-03-05"),
+    ("2026-03-05T10:11:12", "2026-03-05"),
+    ("05-03-26 08:00", "2026-03-05"),
+    ("not a date", None),
+])
+def test_parse_date(raw, expected):
+    assert parse_date(raw) == expected
+
+
+def test_statement_with_credit_and_debit_columns():
+    csv_text = (
+        "Ngày giao dịch;Ghi có;Ghi nợ;Nội dung;Tên người chuyển;Mã GD\n"
+        "01/03/2026;200.000;;Dong quy thang 3;NGUYEN VAN AN;FT001\n"
+        "02/03/2026;;50.000;Mua nuoc;;FT002\n"
+        "Tổng cộng;200.000;50.000;;;\n"
+    )
+    errors = []
+    lines = list(iter_statement_lines(io.StringIO(csv_text), errors))
+
+    assert [(line.transaction_date, line.amount, line.sender, line.reference) for line in lines] == [
+        ("2026-03-01", 200_000, "NGUYEN VAN AN", "FT001"),
+        ("2026-03-02", -50_000, "", "FT002"),
+    ]
+    assert errors == [(4, "missing date")]
+
+
+def test_statement_without_header_is_rejected():
+    with pytest.raises(StatementFormatError):
+        list(iter_statement_lines(io.StringIO("a,b,c\n1,2,3\n")))
+
+
+def test_semicolon_statement_with_preamble():
+    csv_text = (
+        "SAO KE TAI KHOAN\n"
+        "Tu ngay 01/03/2026 den ngay 31/03/2026\n"
+        "Ngày giao dịch;Ghi có;Ghi nợ;Nội dung;Tên người chuyển;Mã GD\n"
+        "01/03/2026;1.234,60;;Dong quy;NGUYEN VAN AN;FT001\n"
+    )
+    lines = list(iter_statement_lines(io.StringIO(csv_text)))
+    assert [(line.amount, line.reference) for line in lines] == [(1235, "FT001")]
@@ -0,0 +1,54 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from pydantic import ValidationError
+
+from app.models.extraction_model import IncomeExtraction
+from app.services.gemini_service import GeminiService
+
+
+class FakeModels:
+    """Answers generate_content calls (the repair calls) from a list."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    def generate_content(self, model, contents, config):
+        self.calls.append({"model": model, "contents": contents})
+        return SimpleNamespace(text=self.answers.pop(0))
+
+
+def gemini(*repair_answers):
+    service = GeminiService()
+    service.client = SimpleNamespace(models=FakeModels(*repair_answers))
+    return service
+
+
+def test_valid_output_needs_no_repair():
+    service = gemini()
+
+    parsed = service._parse_structured(json.dumps({"amount": 200000, "user_from": "An"}), "INCOME", "cheap")
+
+    assert parsed == IncomeExtraction(amount=200000, user_from="An")
+    assert service.client.models.calls == []
+
+
+def test_invalid_output_is_repaired_once_by_the_same_model():
+    service = gemini(json.dumps([{"bill_name": "Phở", "amount": 50000}]))
+
+    parsed = service._parse_structured('[{"bill_name": "Phở", "amount": "năm mươi', "EXPENSE", "cheap")
+
+    assert [(bill.bill_name, bill.amount) for bill in parsed] == [("Phở", 50000)]
+    [call] = service.client.models.calls
+    assert call["model"] == "cheap"
+    assert '"năm mươi' in call["contents"]
+
+
+def test_output_still_invalid_after_repair_raises():
+    service = gemini('{"amount": "many"}', json.dumps({"amount": 1}))
+
+    with pytest.raises(ValidationError):
+        service._parse_structured('{"amount": "lots"}', "INCOME", "cheap")
+    assert len(service.client.models.calls) == 1
@@ -0,0 +1,115 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.database import fund_client
+from app.core.tenancy import FUND_HEADER, FundLocal, get_current_fund_id, use_fund
+from app.services.fund_service import select_fund
+from app.services.ledger_rebuild_service import LedgerDiff, LedgerRebuildService
+
+
+def user(user_id, fund_id, name):
+    return {"id": user_id, "fund_id": fund_id, "name": name}
+
+
+@pytest.fixture
+def two_funds(fake_db):
+    fake_db.tables["funds"] = [{"id": 1, "name": "One"}, {"id": 2, "name": "Two"}]
+    fake_db.tables["users"] = [user(1, 1, "An"), user(2, 2, "Binh")]
+    return fake_db
+
+
+def test_reads_only_see_the_current_fund(two_funds):
+    with use_fund(2):
+        rows = fund_client.table("users").select("*").execute().data
+        assert [row["id"] for row in rows] == [2]
+        assert fund_client.table("users").select("*").eq("id", 1).execute().data == []
+
+
+def test_updates_and_deletes_leave_other_funds_alone(two_funds):
+    with use_fund(2):
+        assert fund_client.table("users").update({"name": "Moved"}).eq("id", 1).execute().data == []
+        assert fund_client.table("users").delete().eq("id", 1).execute().data == []
+        fund_client.table("users").update({"name": "Renamed"}).in_("id", [1, 2]).execute()
+
+    assert two_funds.rows("users", id=1) == [user(1, 1, "An")]
+    assert two_funds.rows("users", id=2)[0]["name"] == "Renamed"
+
+
+def test_inserts_are_stamped_with_the_current_fund(two_funds):
+    with use_fund(2):
+        created = fund_client.table("users").insert({"name": "Chi", "fund_id": 1}).execute().data
+
+    assert created[0]["fund_id"] == 2
+
+
+def test_upsert_must_match_on_the_fund(two_funds):
+    with use_fund(2):
+        with pytest.raises(ValueError):
+            fund_client.table("users").upsert({"id": 1, "name": "Taken"}, on_conflict="id")
+        with pytest.raises(ValueError):
+            fund_client.table("users").upsert({"id": 1, "name": "Taken"})
+        fund_client.table("users").upsert({"id": 2, "name": "Binh 2"}, on_conflict="fund_id,id").execute()
+
+    assert two_funds.rows("users", id=1) == [user(1, 1, "An")]
+    assert two_funds.rows("users", id=2)[0]["name"] == "Binh 2"
+
+
+def test_rebuild_updates_entries_of_the_current_fund_only(fake_db):
+    entry = {"id": 5, "transaction_id": 1, "user_id": 7, "amount": 1, "type": "FUND", "period_month": "2026-01"}
+    fake_db.tables["transaction_entries"] = [{**entry, "fund_id": 1}]
+
+    with use_fund(2):
+        LedgerRebuildService().apply_diff(LedgerDiff(to_update=[{**entry, "amount": 200_000}]))
+    assert fake_db.rows("transaction_entries", id=5)[0]["amount"] == 1
+
+    with use_fund(1):
+        LedgerRebuildService().apply_diff(LedgerDiff(to_update=[{**entry, "amount": 200_000}]))
+    assert fake_db.rows("transaction_entries", id=5)[0]["amount"] == 200_000
+
+
+def fund_app():
+    app = FastAPI()
+    app.middleware("http")(select_fund)
+
+    @app.get("/fund")
+    async def fund():
+        return {"fund_id": get_current_fund_id()}
+
+    return app
+
+
+def test_fund_header_selects_the_fund(two_funds):
+    client = TestClient(fund_app())
+
+    assert client.get("/fund", headers={FUND_HEADER: "2"}).json() == {"fund_id": 2}
+    assert client.get("/fund?fund_id=2").json() == {"fund_id": 2}
+
+
+def test_fund_header_must_name_an_existing_fund(two_funds):
+    client = TestClient(fund_app())
+
+    assert client.get("/fund", headers={FUND_HEADER: "two"}).status_code == 400
+    assert client.get("/fund", headers={FUND_HEADER: "99"}).status_code == 404
+
+
+def test_fund_local_keeps_one_instance_per_fund():
+    local = FundLocal(dict)
+    with use_fund(1):
+        local.current()["key"] = "one"
+    with use_fund(2):
+        assert "key" not in local.current()
+
+    assert local.for_fund(1) == {"key": "one"}
+
+
+def test_fund_local_evicts_the_least_recently_used_fund():
+    local = FundLocal(dict, max_funds=2)
+    local.for_fund(1)["key"] = "one"
+    local.for_fund(2)
+    local.for_fund(1)
+    local.for_fund(3)
+
+    assert local.peek(2) is None
+    assert local.peek(1) == {"key": "one"}
+    assert local.fund_evictions == 1